@@ -0,0 +1,124 @@
+"""Cold-start budget for the command-line tools.
+
+Every command runs in a fresh interpreter ``--repeat`` times; the best wall
+time is checked against its budget (times ``--scale`` for slow machines) and
+the heavy optional modules it loaded are checked against the ones it must not
+need, so a stray module-level ``import matplotlib.pyplot`` fails even on a
+fast machine. Exit code 1 if any command is over budget or loads a forbidden
+module.
+
+Usage:
+    python scripts/bench_startup.py [--repeat 3] [--scale 1.0] [--json PATH]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("matplotlib", "scipy", "pandas", "pymedphys")
+
+# Runs a script like `python script.py ...` and records which heavy modules it imported
+_RUNNER = (
+    "import atexit, json, os, runpy, sys\n"
+    "def _dump():\n"
+    "    with open(os.environ['BENCH_MODULES_OUT'], 'w') as f:\n"
+    "        json.dump(sorted(m for m in %r if m in sys.modules), f)\n"
+    "atexit.register(_dump)\n"
+    "sys.argv = sys.argv[1:]\n"
+    "sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))\n"
+    "runpy.run_path(sys.argv[0], run_name='__main__')\n"
+) % (HEAVY_MODULES,)
+
+
+def _data(*parts: str) -> str:
+    return os.path.join(REPO_ROOT, "tests", "data", *parts)
+
+
+def default_commands(out_dir: str) -> List[dict]:
+    """``{name, argv, budget_s, forbidden}`` for the CLI entry points (paths relative to the repo)."""
+    true_scaling = os.path.join("src", "ocr_true_scaling.py")
+    comp_v10 = os.path.join("src", "Comp_measured_phits_v10.py")
+    run = [true_scaling,
+           "--ref-pdd-type", "csv", "--ref-pdd-file", _data("measured_csv", "05x05mPDD-zZver.csv"),
+           "--eval-pdd-type", "phits", "--eval-pdd-file", _data("PHITS", "deposit-z-water.out"),
+           "--ref-ocr-type", "csv", "--ref-ocr-file", _data("measured_csv", "05x05m10cm-xXlat.csv"),
+           "--eval-ocr-type", "phits", "--eval-ocr-file", _data("PHITS", "deposit-y-water-100x.out"),
+           "--output-dir", out_dir, "--no-plot"]
+    return [
+        {"name": "ocr_true_scaling -V", "argv": [true_scaling, "-V"], "budget_s": 1.0,
+         "forbidden": list(HEAVY_MODULES)},
+        {"name": "ocr_true_scaling --help", "argv": [true_scaling, "--help"], "budget_s": 1.0,
+         "forbidden": list(HEAVY_MODULES)},
+        {"name": "Comp_measured_phits_v10 --help", "argv": [comp_v10, "--help"], "budget_s": 1.5,
+         "forbidden": ["matplotlib", "scipy", "pymedphys"]},
+        # Default smoothing still needs scipy.signal (~1 s of the budget)
+        {"name": "ocr_true_scaling --no-plot run", "argv": run, "budget_s": 3.0,
+         "forbidden": ["matplotlib", "pandas", "pymedphys"]},
+        # Deferred plots only store their payload: still no matplotlib
+        {"name": "ocr_true_scaling --plots deferred run", "argv": run[:-1] + ["--plots", "deferred"], "budget_s": 3.0,
+         "forbidden": ["matplotlib", "pandas", "pymedphys"]},
+    ]
+
+
+def time_command(argv: List[str], repeat: int = 3) -> dict:
+    """Best wall time of ``python <argv>`` over ``repeat`` cold starts, plus the heavy modules it loaded."""
+    best, proc, loaded = float("inf"), None, []
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "modules.json")
+        env = dict(os.environ, BENCH_MODULES_OUT=out, MPLBACKEND="Agg")
+        for _ in range(max(int(repeat), 1)):
+            t0 = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-c", _RUNNER] + argv, cwd=REPO_ROOT, env=env,
+                                  capture_output=True, text=True)
+            best = min(best, time.perf_counter() - t0)
+        if os.path.exists(out):
+            with open(out, encoding="utf-8") as f:
+                loaded = json.load(f)
+    return {"seconds": best, "returncode": proc.returncode, "modules": loaded, "stderr": proc.stderr}
+
+
+def run_benchmarks(commands: Optional[List[dict]] = None, repeat: int = 3, scale: float = 1.0) -> List[dict]:
+    """Time every command; each row gets ``seconds``, ``budget_s`` (scaled), ``modules`` and ``ok``."""
+    rows = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for cmd in commands or default_commands(out_dir):
+            res = time_command(cmd["argv"], repeat)
+            budget = cmd["budget_s"] * scale
+            bad = sorted(set(res["modules"]) & set(cmd["forbidden"]))
+            rows.append({"name": cmd["name"], "seconds": res["seconds"], "budget_s": budget,
+                         "returncode": res["returncode"], "modules": res["modules"], "forbidden_loaded": bad,
+                         "ok": res["returncode"] == 0 and res["seconds"] <= budget and not bad,
+                         "stderr": res["stderr"]})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Cold-start time budget for the CLI entry points')
+    ap.add_argument('--repeat', type=int, default=3, help='cold starts per command (best time counts)')
+    ap.add_argument('--scale', type=float, default=float(os.environ.get('STARTUP_BUDGET_SCALE', '1.0')),
+                    help='multiply every budget (slow CI machines); default $STARTUP_BUDGET_SCALE or 1')
+    ap.add_argument('--json', type=str, default=None, help='write the results as JSON')
+    args = ap.parse_args()
+
+    rows = run_benchmarks(repeat=args.repeat, scale=args.scale)
+    for r in rows:
+        state = 'ok' if r['ok'] else 'FAIL'
+        extra = f" forbidden imports: {', '.join(r['forbidden_loaded'])}" if r['forbidden_loaded'] else ''
+        if r['returncode'] != 0:
+            extra += f" exit code {r['returncode']}"
+        print(f"{state:4} {r['name']:<34} {r['seconds']:6.2f} s (budget {r['budget_s']:.2f} s) "
+              f"heavy: {', '.join(r['modules']) or '-'}{extra}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump([{k: v for k, v in r.items() if k != 'stderr'} for r in rows], f, indent=2)
+    if not all(r['ok'] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,36 +1,19 @@
 import argparse
+import os
 import sys
 from typing import Tuple, Optional
 
 import numpy as np
-import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+from profile_io import load_csv_profile as _load_csv_profile, load_phits_profile  # noqa: E402
+from profile_metrics import fwhm  # noqa: E402
 
 
 def load_csv_profile(path: str) -> Tuple[np.ndarray, np.ndarray]:
     try:
-        df0 = pd.read_csv(path, encoding='utf-8-sig', header=None)
-        if df0.shape[1] >= 2 and isinstance(df0.iloc[0, 0], str) and '(cm)' in str(df0.iloc[0, 0]):
-            df = pd.read_csv(path, encoding='utf-8-sig')
-            cols = list(df.columns)[:2]
-            df = df[cols]
-            df.columns = ['pos', 'dose']
-        else:
-            df = df0.iloc[:, :2]
-            df.columns = ['pos', 'dose']
-        pos = pd.to_numeric(df['pos'], errors='coerce').to_numpy()
-        dose = pd.to_numeric(df['dose'], errors='coerce').to_numpy()
-        m = np.isfinite(pos) & np.isfinite(dose)
-        pos = pos[m]
-        dose = dose[m]
-        order = np.argsort(pos)
-        pos = pos[order].astype(float)
-        dose = dose[order].astype(float)
-        if dose.size == 0:
-            raise ValueError(f"CSVに有効な数値データがありません: {path}")
-        dmax = float(np.max(dose))
-        if dmax <= 0:
-            raise ValueError(f"CSVの線量最大値が0以下です: {path}")
-        return pos, (dose / dmax)
+        return _load_csv_profile(path)
     except Exception as e:
         print(f"エラー: CSV読み込み中に問題が発生しました: {e}", file=sys.stderr)
         raise
@@ -38,73 +21,15 @@ def load_csv_profile(path: str) -> Tuple[np.ndarray, np.ndarray]:
 
 def parse_phits_out_profile(path: str) -> Tuple[np.ndarray, np.ndarray, str]:
     try:
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        axis = ''
-        for line in lines:
-            s = line.strip().lower().replace(' ', '')
-            if s.startswith('axis='):
-                axis = line.split('=')[1].strip().split('#')[0].strip()
-        data_start = None
-        for i, line in enumerate(lines):
-            t = line.strip().lower()
-            if t.startswith('#  y-lower') or t.startswith('#  z-lower') or t.startswith('#  x-lower'):
-                data_start = i + 1
-                break
-        if data_start is None:
-            raise ValueError('PHITSデータ表の開始位置が見つかりません')
-        pos_centers, vals = [], []
-        for line in lines[data_start:]:
-            s = line.strip()
-            if not s or s.startswith('#'):
-                break
-            parts = s.split()
-            if len(parts) < 3:
-                continue
-            try:
-                lo = float(parts[0]); hi = float(parts[1]); v = float(parts[2])
-            except Exception:
-                continue
-            pos_centers.append(0.5 * (lo + hi))
-            vals.append(v)
-        pos = np.asarray(pos_centers, dtype=float)
-        dose = np.asarray(vals, dtype=float)
-        if dose.size == 0:
-            raise ValueError('PHITSデータが空です')
-        dmax = float(np.max(dose))
-        if dmax <= 0:
-            raise ValueError('PHITS線量最大値が0以下です')
-        return pos, (dose / dmax), axis
+        axis, pos, dose, _ = load_phits_profile(path)
+        return pos, dose, axis
     except Exception as e:
         print(f"エラー: PHITS読み込み中に問題が発生しました: {e}", file=sys.stderr)
         raise
 
 
 def compute_fwhm(pos_cm: np.ndarray, dose_norm: np.ndarray) -> Optional[float]:
-    if pos_cm.size < 3:
-        return None
-    imax = int(np.argmax(dose_norm))
-    peak = float(dose_norm[imax])
-    if peak <= 0:
-        return None
-    half = 0.5 * peak
-    left = None
-    for i in range(imax, 0, -1):
-        y0, y1 = dose_norm[i - 1], dose_norm[i]
-        if (y0 <= half <= y1) or (y1 <= half <= y0):
-            x0, x1 = pos_cm[i - 1], pos_cm[i]
-            left = float(x0 if y1 == y0 else x0 + (half - y0) * (x1 - x0) / (y1 - y0))
-            break
-    right = None
-    for i in range(imax, len(pos_cm) - 1):
-        y0, y1 = dose_norm[i], dose_norm[i + 1]
-        if (y0 <= half <= y1) or (y1 <= half <= y0):
-            x0, x1 = pos_cm[i], pos_cm[i + 1]
-            right = float(x1 if y1 == y0 else x0 + (half - y0) * (x1 - x0) / (y1 - y0))
-            break
-    if left is None or right is None:
-        return None
-    return float(abs(right - left))
+    return fwhm(pos_cm, dose_norm)
 
 
 def main():
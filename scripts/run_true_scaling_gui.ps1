@@ -108,6 +108,7 @@ $form.Controls.Add((New-Label 'FWHM warn (cm)' 320 244)); $numFwhm = New-Num 430
 $cbXSym = New-Object System.Windows.Forms.CheckBox; $cbXSym.Text='Xlim symmetric'; $cbXSym.Location=New-Object System.Drawing.Point(520,244); $cbXSym.AutoSize=$true; $form.Controls.Add($cbXSym)
 $cbCSV = New-Object System.Windows.Forms.CheckBox; $cbCSV.Text='Export True CSV'; $cbCSV.Location=New-Object System.Drawing.Point(540,270); $cbCSV.AutoSize=$true; $form.Controls.Add($cbCSV)
 $cbGAM = New-Object System.Windows.Forms.CheckBox; $cbGAM.Text='Export Gamma CSV'; $cbGAM.Location=New-Object System.Drawing.Point(700,270); $cbGAM.AutoSize=$true; $form.Controls.Add($cbGAM)
+$cbWarm = New-Object System.Windows.Forms.CheckBox; $cbWarm.Text='Warm worker'; $cbWarm.Location=New-Object System.Drawing.Point(870,270); $cbWarm.AutoSize=$true; $cbWarm.Checked=$true; $form.Controls.Add($cbWarm)
 
 $form.Controls.Add((New-Label 'Legend ref' 20 340)); $tbLRef = New-Object System.Windows.Forms.TextBox; $tbLRef.Location=New-Object System.Drawing.Point(100,338); $tbLRef.Size=New-Object System.Drawing.Size(300,22); $form.Controls.Add($tbLRef)
 $form.Controls.Add((New-Label 'Legend eval' 420 340)); $tbLEval = New-Object System.Windows.Forms.TextBox; $tbLEval.Location=New-Object System.Drawing.Point(500,338); $tbLEval.Size=New-Object System.Drawing.Size(300,22); $form.Controls.Add($tbLEval)
@@ -175,6 +176,7 @@ $tt = New-Object System.Windows.Forms.ToolTip
 $tbOut.Add_MouseHover({ $tt.SetToolTip($tbOut, [string]$tbOut.Text) })
 $tt.SetToolTip($cbCSV, 'Export true (OCR) series as CSV')
 $tt.SetToolTip($cbGAM, 'Export gamma array (Gamma 1 criteria) as CSV')
+$tt.SetToolTip($cbWarm, 'Run in one long-lived Python worker (src/worker_daemon.py) instead of a new process per Run')
 $tt.SetToolTip($cbNoPdd, 'When ON, suppress PDD report and plot outputs')
 $tt.SetToolTip($cbGamma, 'Select gamma baseline: global or local')
 $tt.SetToolTip($numFwhm, 'FWHM mismatch warning threshold (cm)')
@@ -279,6 +281,95 @@ function Run-Cmd([string[]]$cmd){
   [void]$p.Start(); $p.BeginOutputReadLine(); $p.BeginErrorReadLine()
 }
 
+# Warm worker: one python process (src/worker_daemon.py) serving JSON-line jobs
+$script:worker = $null
+$script:jobId = 0
+
+function Build-Job(){
+  if([string]::IsNullOrWhiteSpace($tbRefPdd.Text) -or [string]::IsNullOrWhiteSpace($tbEvalPdd.Text) -or [string]::IsNullOrWhiteSpace($tbRefOcr.Text) -or [string]::IsNullOrWhiteSpace($tbEvalOcr.Text) -or [string]::IsNullOrWhiteSpace($tbOut.Text)){
+    [System.Windows.Forms.MessageBox]::Show('Please select all required files and output folder.'); return $null }
+  $script:jobId += 1
+  $job = [ordered]@{
+    id = $script:jobId
+    ref_pdd_type = [string]$cbRefPdd.SelectedItem; ref_pdd_file = $tbRefPdd.Text
+    eval_pdd_type = [string]$cbEvalPdd.SelectedItem; eval_pdd_file = $tbEvalPdd.Text
+    ref_ocr_type = [string]$cbRefOcr.SelectedItem; ref_ocr_file = $tbRefOcr.Text
+    eval_ocr_type = [string]$cbEvalOcr.SelectedItem; eval_ocr_file = $tbEvalOcr.Text
+    output_dir = $tbOut.Text
+    norm_mode = [string]$cbNorm.SelectedItem
+    dd1 = [double]$numDD1.Value; dta1 = [double]$numDTA1.Value
+    dd2 = [double]$numDD2.Value; dta2 = [double]$numDTA2.Value
+    cutoff = [double]$numCut.Value; grid = [double]$numGrid.Value
+    gamma_mode = [string]$cbGamma.SelectedItem
+    smooth_window = [int]$numWin.Value; smooth_order = [int]$numOrd.Value
+    center_tol_cm = [double]$numCTol.Value; fwhm_warn_cm = [double]$numFwhm.Value
+    no_smooth = [bool]$cbNoSmooth.Checked; center_interp = [bool]$cbCInterp.Checked
+    xlim_symmetric = [bool]$cbXSym.Checked; no_pdd_report = [bool]$cbNoPdd.Checked
+    export_csv = [bool]$cbCSV.Checked; export_gamma = [bool]$cbGAM.Checked
+  }
+  if ($cbNorm.SelectedItem -eq 'z_ref') { $job['z_ref'] = [double]$numZref.Value }
+  return $job
+}
+
+function Start-Worker(){
+  if ($script:worker -and -not $script:worker.HasExited) { return $script:worker }
+  $psi = New-Object System.Diagnostics.ProcessStartInfo
+  $psi.FileName = 'python'
+  # --no-defaults: every job carries the full GUI state
+  $psi.Arguments = '-u src/worker_daemon.py --no-defaults'
+  $psi.RedirectStandardInput = $true
+  $psi.RedirectStandardOutput = $true
+  $psi.RedirectStandardError = $true
+  $psi.UseShellExecute = $false
+  $psi.CreateNoWindow = $true
+  $psi.WorkingDirectory = $ROOT
+  $psi.EnvironmentVariables['PYTHONUNBUFFERED'] = '1'
+  $p = New-Object System.Diagnostics.Process
+  $p.StartInfo = $psi
+  $p.EnableRaisingEvents = $true
+  $p.SynchronizingObject = $form
+  $null = $p.add_OutputDataReceived({ param($s,$e)
+      if (-not $e.Data) { return }
+      try { $m = $e.Data | ConvertFrom-Json } catch { $tbLog.AppendText($e.Data+"`r`n"); return }
+      switch ($m.event) {
+        'ready' { $tbLog.AppendText(("[worker] ready (v{0}, {1:0.0} s)" -f $m.version, $m.elapsed_s) + "`r`n") }
+        'log' { $tbLog.AppendText([string]$m.line + "`r`n") }
+        'result' {
+          if ($m.status -eq 'ok') { foreach($o in $m.outputs){ $tbLog.AppendText("[output] " + $o + "`r`n") } }
+          else { $tbLog.AppendText("[error] " + $m.error + "`r`n") }
+          $btnRun.Enabled=$true; $btnRun.Text='Run'; $pb.Visible=$false
+          $lblStatus.Text = ("Status: {0} ({1:0.00} s, warm worker)" -f $(if($m.status -eq 'ok'){ 'Done' } else { 'Error' }), $m.elapsed_s)
+          try { if (-not [string]::IsNullOrWhiteSpace($tbOut.Text)) { $tbLog.Text | Out-File -FilePath (Join-Path $tbOut.Text 'log.txt') -Encoding utf8 } } catch {}
+        }
+      }
+    })
+  $null = $p.add_ErrorDataReceived({ param($s,$e) if ($e.Data){ $tbLog.AppendText($e.Data+"`r`n") } })
+  $null = $p.add_Exited({ param($s,$e)
+      $btnRun.Enabled=$true; $btnRun.Text='Run'; $pb.Visible=$false
+      $lblStatus.Text = ("Status: worker exited ({0})" -f $s.ExitCode)
+    })
+  [void]$p.Start(); $p.BeginOutputReadLine(); $p.BeginErrorReadLine()
+  $script:worker = $p
+  return $p
+}
+
+function Send-Job($job){
+  $p = Start-Worker
+  # ASCII-only JSON so paths survive the console code page of stdin
+  $json = $job | ConvertTo-Json -Compress
+  $json = [regex]::Replace($json, '[^\x00-\x7F]', { param($m) '\u{0:x4}' -f [int][char]$m.Value })
+  Append-Log ("> job " + $job.id + " (warm worker)")
+  $btnRun.Enabled=$false; $btnRun.Text='Running...'; $lblStatus.Text='Status: Running'; $pb.Visible=$true
+  $p.StandardInput.WriteLine($json)
+  $p.StandardInput.Flush()
+}
+
+$form.add_FormClosing({
+  if ($script:worker -and -not $script:worker.HasExited) {
+    try { $script:worker.StandardInput.WriteLine('{"cmd": "shutdown"}'); $script:worker.StandardInput.Close() } catch {}
+  }
+})
+
 # Apply defaults
 try {
   if ($cfg.output_dir) { $tbOut.Text = [string]$cfg.output_dir }
@@ -340,7 +431,10 @@ $btnSave.Add_Click({
   try { ($new | ConvertTo-Json -Depth 3) | Out-File -FilePath $cfgPath -Encoding utf8; [System.Windows.Forms.MessageBox]::Show('Saved.') } catch {}
 })
 
-$btnRun.Add_Click({ $cmd = Build-Command; if($null -ne $cmd){ Run-Cmd $cmd } })
+$btnRun.Add_Click({
+  if ($cbWarm.Checked) { $job = Build-Job; if($null -ne $job){ New-Item -ItemType Directory -Force -Path $tbOut.Text | Out-Null; Send-Job $job }; return }
+  $cmd = Build-Command; if($null -ne $cmd){ Run-Cmd $cmd }
+})
 
 # Enable z_ref input only when norm=z_ref
 $cbNorm.add_SelectedIndexChanged({
@@ -8,43 +8,40 @@ import re
 from textwrap import dedent
 import argparse
 import configparser
+import csv
+import glob
+import importlib
 
-try:
-    import matplotlib.pyplot as plt
-    import pymedphys
-    from scipy.signal import savgol_filter
-except ModuleNotFoundError as e:
-    print(f"エラー: 必要なライブラリがインストールされていません - {e}", file=sys.stderr)
-    print("次のコマンドでインストールしてください: pip install pandas numpy matplotlib scipy pymedphys", file=sys.stderr)
-    sys.exit(1)
+from dose_cube import INTERP_METHODS, extract_profiles, open_cube, print_progress, read_xyz_cube
+from measured_store import TANK_TO_PHITS_AXIS, parse_measured_name
+import plot_render
+from profile_io import find_tally, index_tallies, read_measured_csv, read_tally_block
 
 __version__ = "10.0.AXIS_SELECT"
 
+SUMMARY_FIELDS = ['measured_file', 'field', 'depth_cm', 'axis', 'cx', 'cy', 'cz', 'interp',
+                  'status', 'rmse', 'gamma_pass_percent', 'plot', 'report', 'error']
+
+def _require(module):
+    """重いライブラリ (matplotlib / scipy / pymedphys) は使う段階で読み込む。--help や起動を速くするため。"""
+    try:
+        return importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        print(f"エラー: 必要なライブラリがインストールされていません - {e}", file=sys.stderr)
+        print("次のコマンドでインストールしてください: pip install pandas numpy matplotlib scipy pymedphys", file=sys.stderr)
+        sys.exit(1)
+
 def load_measured_data(file_path):
     """実測データCSVファイルを読み込む"""
     try:
-        header_row_index = 0
+        table = read_measured_csv(file_path)
         axis_from_header = None
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
-            for i, line in enumerate(f):
-                if '(cm)' in line and ',' in line:
-                    header_row_index = i
-                    match = re.match(r'^"?([XYZ])\s*\(', line.strip(), re.IGNORECASE)
-                    if match:
-                        axis_from_header = match.group(1).lower()
-                    break
-        df = pd.read_csv(file_path, encoding='utf-8-sig', skiprows=header_row_index)
-        # 列数が2でない場合のエラーハンドリングを追加
-        if len(df.columns) != 2:
-             print(f"エラー: {file_path} の列数が2ではありません。形式を確認してください。", file=sys.stderr)
-             # 不要な列を削除し、最初の2列のみを使用する試み
-             df = df.iloc[:, :2]
-             print("警告: 最初の2列のみを使用して処理を続行します。")
-        
-        df.columns = ['pos', 'dose']
-        df['pos'] = pd.to_numeric(df['pos'], errors='coerce')
-        df['dose'] = pd.to_numeric(df['dose'], errors='coerce')
-        df.dropna(inplace=True)
+        if table['header']:
+            match = re.match(r'^"?([XYZ])\s*\(', table['header'][0].strip(), re.IGNORECASE)
+            if match:
+                axis_from_header = match.group(1).lower()
+        # 水槽データは降順で記録されることがあるため昇順に並べる (np.interp は昇順が前提)
+        df = pd.DataFrame({'pos': table['pos'], 'dose': table['dose']}).sort_values('pos', ignore_index=True)
         if df.empty:
             print(f"エラー: {file_path} 内に有効な数値データが見つかりませんでした。", file=sys.stderr)
             return None, None
@@ -61,40 +58,45 @@ def load_measured_data(file_path):
 def parse_phits_3d_tally(file_path):
     """PHITSの3Dメッシュタリー(t-deposit)を読み込む"""
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        last_tally_start_index = next((i for i in range(len(lines) - 1, -1, -1) if '[ T-Deposit ]' in lines[i]), -1)
-        if last_tally_start_index == -1:
+        # 全タリーブロックを1回の走査で索引化し、最後の T-Deposit だけを読む
+        block = find_tally(index_tallies(file_path), 'T-Deposit', which=-1)
+        if block is None:
             print(f"エラー: {file_path} 内に [ T-Deposit ] タリーが見つかりません。", file=sys.stderr)
             return None
+        lines = read_tally_block(file_path, block).decode('utf-8', errors='ignore').splitlines(keepends=True)
 
-        header_lines = lines[last_tally_start_index:]
         params = {}
+        bounds = {}
         data_start_index = -1
         
-        for i, line in enumerate(header_lines):
+        for i, line in enumerate(lines):
             sline = line.strip()
             if sline.startswith('nx ='): params['nx'] = int(sline.split('=')[1].split('#')[0].strip())
             if sline.startswith('ny ='): params['ny'] = int(sline.split('=')[1].split('#')[0].strip())
             if sline.startswith('nz ='): params['nz'] = int(sline.split('=')[1].split('#')[0].strip())
-            if sline.startswith('x ='):
-                parts = sline.split('=')[1].split('#')[0].strip().split()
-                params['x'] = np.linspace(float(parts[0]), float(parts[1]), params['nx'])
-            if sline.startswith('y ='):
-                parts = sline.split('=')[1].split('#')[0].strip().split()
-                params['y'] = np.linspace(float(parts[0]), float(parts[1]), params['ny'])
-            if sline.startswith('z ='):
+            if sline.startswith(('x =', 'y =', 'z =')):
                 parts = sline.split('=')[1].split('#')[0].strip().split()
-                params['z'] = np.linspace(float(parts[0]), float(parts[1]), params['nz'])
+                bounds[sline[0]] = (float(parts[0]), float(parts[1]))
             if sline.startswith('#') and 'x' in sline and 'y' in sline and 'z' in sline:
                 # Find the actual start of data, skipping blank lines and comments
-                actual_data_idx = last_tally_start_index + i + 1
+                actual_data_idx = i + 1
                 while actual_data_idx < len(lines) and (lines[actual_data_idx].strip() == "" or lines[actual_data_idx].strip().startswith('#')):
                     actual_data_idx += 1
                 data_start_index = actual_data_idx
                 break
         
+        # ビン端 ("x = lo hi" 行、無ければ索引のメッシュ定義 xmin/xmax) からビン中心を求める (cube/stream 経路と同じ座標)
+        mesh = block['params']
+        for ax in ('x', 'y', 'z'):
+            n_key, lo_key, hi_key = f'n{ax}', f'{ax}min', f'{ax}max'
+            if n_key not in params and isinstance(mesh.get(n_key), int):
+                params[n_key] = mesh[n_key]
+            if ax not in bounds and lo_key in mesh and hi_key in mesh:
+                bounds[ax] = (mesh[lo_key], mesh[hi_key])
+            if ax in bounds and n_key in params:
+                edges = np.linspace(bounds[ax][0], bounds[ax][1], params[n_key] + 1)
+                params[ax] = 0.5 * (edges[:-1] + edges[1:])
+
         if not all(k in params for k in ['nx', 'ny', 'nz', 'x', 'y', 'z']) or data_start_index == -1:
             print("エラー: PHITSファイルのメッシュパラメータが不完全、またはデータ開始行が見つかりません。", file=sys.stderr)
             return None
@@ -118,33 +120,75 @@ def parse_phits_3d_tally(file_path):
         print(f"エラー: PHITSファイルの解析中に予期せぬ問題が発生しました - {e}", file=sys.stderr)
         return None
 
-def extract_1d_profile(phits_data, axis, cx=0.0, cy=0.0, cz=0.0):
-    """3Dデータから指定された軸と座標の1Dプロファイルを抽出する"""
+def extract_1d_profile(phits_data, axis, cx=0.0, cy=0.0, cz=0.0, method='linear'):
+    """3Dデータから指定された軸と座標の1Dプロファイルを抽出する (既定: トリリニア補間)"""
+    profiles = extract_1d_profiles(phits_data, [(axis, (cx, cy, cz))], method)
+    return None if profiles is None else profiles[0]
+
+def extract_1d_profiles(phits_data, lines, method='linear'):
+    """(軸, (cx, cy, cz)) のリストに対する1Dプロファイルを1回のベクトル化ギャザーでまとめて抽出する
+
+    メッシュ範囲外の断面は None になる。抽出自体に失敗した場合は None を返す。
+    """
     try:
-        x_coords, y_coords, z_coords = phits_data['x'], phits_data['y'], phits_data['z']
-        dose_cube = phits_data['dose']
-
-        ix = np.argmin(np.abs(x_coords - cx))
-        iy = np.argmin(np.abs(y_coords - cy))
-        iz = np.argmin(np.abs(z_coords - cz))
-
-        print(f"プロファイル抽出座標: X={x_coords[ix]:.3f}, Y={y_coords[iy]:.3f}, Z={z_coords[iz]:.3f} (cm) で断面を抽出。")
-
-        if axis == 'x':
-            pos, dose = x_coords, dose_cube[:, iy, iz]
-        elif axis == 'y':
-            pos, dose = y_coords, dose_cube[ix, :, iz]
-        elif axis == 'z':
-            pos, dose = z_coords, dose_cube[ix, iy, :]
-        else:
-            return None
-        
-        return pd.DataFrame({'pos': pos, 'dose': dose})
+        profiles = extract_profiles(phits_data, [axis for axis, _ in lines], [c for _, c in lines], method)
+        result = []
+        for p in profiles:
+            cx, cy, cz = p['centre']
+            label = '補間' if method == 'linear' else '最近傍ボクセル'
+            print(f"プロファイル抽出座標: 軸={p['axis']}, X={cx:.3f}, Y={cy:.3f}, Z={cz:.3f} (cm) で断面を抽出 ({label})。")
+            df = pd.DataFrame({'pos': p['pos'], 'dose': p['dose']}).dropna()
+            if df.empty:
+                print(f"エラー: 断面 X={cx:.3f}, Y={cy:.3f}, Z={cz:.3f} (cm) はメッシュの範囲外です。", file=sys.stderr)
+                df = None
+            result.append(df)
+        return result
 
     except Exception as e:
         print(f"エラー: 1Dプロファイルの抽出中に問題が発生しました - {e}", file=sys.stderr)
         return None
 
+def profile_line(measured_file, measured_axis, args):
+    """実測ファイル1件に対応する抽出軸と断面座標を決める。
+
+    --axis 指定時は従来どおり全ファイルで --axis と --cx/--cy/--cz を使う。
+    省略時は CSV ヘッダの水槽軸 (X/Y/Z (cm)) からPHITS軸を決め (TANK_TO_PHITS_AXIS、
+    Z は深さ方向 = PDD)、ヘッダに無ければファイル名 (10x10m10cm-xXlat など) の軸を使う。
+    OCRは --depth-axis 方向の座標をファイル名の測定深さに、PDDは --depth-axis 方向に抽出する。
+    """
+    centre = [args.cx, args.cy, args.cz]
+    if args.axis:
+        return args.axis, tuple(centre)
+    meta = parse_measured_name(measured_file) or {}
+    if measured_axis == 'z' or meta.get('scan') == 'pdd':
+        return args.depth_axis, tuple(centre)
+    axis = TANK_TO_PHITS_AXIS.get(measured_axis) or meta.get('axis')
+    if axis is None or axis == args.depth_axis:
+        raise ValueError(f"{measured_file} の抽出軸を判定できません。--axis を指定してください。")
+    if meta.get('depth_cm') is None:
+        raise ValueError(f"{measured_file} の測定深さをファイル名から判定できません。--axis と断面座標を指定してください。")
+    centre['xyz'.index(args.depth_axis)] = meta['depth_cm']
+    return axis, tuple(centre)
+
+def measured_files(args, measured_dir):
+    """位置引数の実測ファイルと --measured-glob (実測データフォルダ内で展開) を順に並べる"""
+    files = list(args.measured_file)
+    for pattern in args.measured_glob or []:
+        matches = sorted(glob.glob(os.path.join(measured_dir, pattern)))
+        if not matches:
+            print(f"警告: '{pattern}' に一致する実測ファイルがありません。", file=sys.stderr)
+        files += [os.path.relpath(m, measured_dir) for m in matches if os.path.relpath(m, measured_dir) not in files]
+    return files
+
+def save_summary(path, rows):
+    """全実測ファイルの比較結果を1つのCSVにまとめて保存する"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        w.writeheader()
+        for row in rows:
+            w.writerow({k: ('' if row.get(k) is None else row.get(k)) for k in SUMMARY_FIELDS})
+    print(f"✅ 比較結果の一覧を '{path}' に保存しました。")
+
 def calculate_rmse(df_measured, df_phits):
     interp_measured_dose = np.interp(df_phits['pos'], df_measured['pos'], df_measured['dose_normalized'])
     return np.sqrt(np.mean((df_phits['dose_normalized'] - interp_measured_dose)**2))
@@ -155,7 +199,7 @@ def calculate_gamma_index(df_measured, df_phits, dose_ta, dist_ta_mm, dose_thres
     dose_ref = df_measured['dose_normalized'].to_numpy()
     axes_eval_mm = (df_phits['pos'].to_numpy() * 10,)
     dose_eval = df_phits['dose_normalized'].to_numpy()
-    gamma = pymedphys.gamma(axes_ref_mm, dose_ref, axes_eval_mm, dose_eval, dose_ta, dist_ta_mm, lower_percent_dose_cutoff=dose_threshold)
+    gamma = _require('pymedphys').gamma(axes_ref_mm, dose_ref, axes_eval_mm, dose_eval, dose_ta, dist_ta_mm, lower_percent_dose_cutoff=dose_threshold)
     valid_gamma = gamma[~np.isnan(gamma)]
     if len(valid_gamma) == 0:
         print("警告: 有効なガンマ値が一つも計算されませんでした。データ範囲やカットオフ値を確認してください。", file=sys.stderr)
@@ -176,6 +220,7 @@ def save_results_to_text(report_dir, phits_file, measured_file, axis_params, ana
     ## プロファイル抽出パラメータ
     - 抽出軸: {axis_params['axis']}
     - 断面座標: X={axis_params['cx']:.2f}, Y={axis_params['cy']:.2f}, Z={axis_params['cz']:.2f} (cm)
+    - 補間方法: {axis_params.get('interp', 'nearest')}
 
     ## 解析パラメータ
     - スケーリング係数: {analysis_params['scale']:.2f}
@@ -190,8 +235,67 @@ def save_results_to_text(report_dir, phits_file, measured_file, axis_params, ana
         with open(report_filename, 'w', encoding='utf-8') as f:
             f.write(dedent(content))
         print(f"✅ レポートを '{report_filename}' に保存しました。")
+        return report_filename
     except Exception as e:
         print(f"エラー: レポートファイルの保存中に問題が発生しました - {e}", file=sys.stderr)
+        return None
+
+def compare_profile(args, measured_file, df_measured, df_phits_raw, axis_params, plot_dir, report_dir):
+    """抽出済みPHITSプロファイル1本を実測データと比較し、グラフとレポートを保存する。
+
+    戻り値は一覧表用の辞書 (rmse, gamma_pass_percent, plot, report)。
+    """
+    axis = axis_params['axis']
+    df_phits = df_phits_raw.copy()
+    df_phits['dose_normalized'] = (df_phits['dose'] / df_phits['dose'].max()) * 100
+
+    if args.scale != 1.0:
+        df_phits['dose_normalized'] *= args.scale
+        print(f"\n✅ 正規化後のPHITS線量データに係数 {args.scale} を適用しました。")
+
+    if len(df_phits) > args.window:
+        savgol_filter = _require('scipy.signal').savgol_filter
+        df_phits['dose_smoothed'] = savgol_filter(df_phits['dose_normalized'], args.window, args.order)
+        print(f"✅ Savitzky-Golayフィルターを適用しました (window={args.window}, order={args.order})。")
+        df_phits_eval = df_phits.copy()
+        df_phits_eval.rename(columns={'dose_smoothed': 'dose_final'}, inplace=True)
+    else:
+        print(f"警告: データ点数({len(df_phits)})がウィンドウ幅({args.window})以下です。平滑化をスキップしました。")
+        df_phits_eval = df_phits.copy()
+        df_phits_eval.rename(columns={'dose_normalized': 'dose_final'}, inplace=True)
+
+    # 平滑化後は dose_normalized と dose_final が両方あるため、評価用の列だけを渡す
+    df_final = df_phits_eval[['pos', 'dose_final']].rename(columns={'dose_final': 'dose_normalized'})
+    rmse_value = calculate_rmse(df_measured, df_final)
+    print(f"\n✅ 平均二乗平方根誤差 (RMSE): {rmse_value:.4f}")
+    
+    gamma_pass_rate = calculate_gamma_index(df_measured, df_final, args.dd, args.dta, args.cutoff)
+    print(f"✅ ガンマインデックス パス率: {gamma_pass_rate:.2f} %")
+    
+    output_filename = os.path.join(plot_dir, f'Comp_{os.path.splitext(args.phits_file)[0]}_vs_{os.path.splitext(measured_file)[0]}_axis-{axis}.png')
+    _require('matplotlib')
+    plot_render.render({
+        'kind': 'profile', 'path': output_filename, 'figsize': (12, 8),
+        'series': [
+            {'x': df_measured['pos'].to_numpy(), 'y': df_measured['dose_normalized'].to_numpy(), 'type': 'scatter',
+             'label': f'Measured ({measured_file})', 'style': {'color': 'blue', 's': 20, 'alpha': 0.7, 'zorder': 5}},
+            {'x': df_phits['pos'].to_numpy(), 'y': df_phits['dose_normalized'].to_numpy(), 'label': 'PHITS (Original Extracted)',
+             'style': {'color': 'gray', 'linestyle': ':', 'lw': 2, 'alpha': 0.8}},
+            {'x': df_phits_eval['pos'].to_numpy(), 'y': df_phits_eval['dose_final'].to_numpy(), 'label': 'PHITS (Scaled & Smoothed)',
+             'style': {'color': 'red', 'lw': 2.5}},
+        ],
+        'title': f'Comparison: PHITS vs. Measured ({axis}-axis profile)', 'title_style': {'fontsize': 16},
+        'xlabel': f'Position ({axis}-axis, cm)', 'ylabel': 'Normalized Dose (%)', 'label_style': {'fontsize': 12},
+        'legend': {}, 'grid': {'linestyle': '--'}, 'ylim': (0, 110),
+    })
+    print(f"\n✅ グラフを '{output_filename}' に保存しました。")
+
+    analysis_params = {'scale': args.scale, 'window': args.window, 'order': args.order, 'dd': args.dd, 'dta': args.dta, 'cutoff': args.cutoff}
+
+    report_filename = save_results_to_text(report_dir, args.phits_file, measured_file, axis_params, analysis_params, rmse_value, gamma_pass_rate)
+
+    return {'rmse': float(rmse_value), 'gamma_pass_percent': float(gamma_pass_rate),
+            'plot': output_filename, 'report': report_filename}
 
 def main():
     script_path = os.path.abspath(__file__)
@@ -199,28 +303,23 @@ def main():
     project_root = os.path.dirname(script_dir)
     config_path = os.path.join(project_root, 'config.ini')
 
-    config = configparser.ConfigParser()
-    if not os.path.exists(config_path):
-        print(f"エラー: 設定ファイル '{config_path}' が見つかりません。", file=sys.stderr)
-        sys.exit(1)
-            
-    config.read(config_path, encoding='utf-8')
-    try:
-        paths = config['Paths']
-        phits_dir = os.path.join(project_root, paths.get('phits_data_dir', 'data/phits_output/'))
-        measured_dir = os.path.join(project_root, paths.get('measured_data_dir', 'data/measured_csv/'))
-        output_dir = os.path.join(project_root, paths.get('output_dir', 'output/'))
-    except KeyError:
-        print(f"エラー: '{config_path}' に '[Paths]' セクションがありません。", file=sys.stderr)
-        sys.exit(1)
-
     parser = argparse.ArgumentParser(
         description=f'PHITS 3Dメッシュデータから指定軸のプロファイルを抽出し、実測データと比較します。(Ver. {__version__})',
         formatter_class=argparse.RawTextHelpFormatter
     )
+    parser.add_argument('-V', '--version', action='version', version=f'%(prog)s {__version__}')
     parser.add_argument('phits_file', type=str, help='PHITS出力ファイル名 (3Dメッシュ)')
-    parser.add_argument('measured_file', type=str, help='実測データCSVファイル名')
-    parser.add_argument('--axis', type=str, required=True, choices=['x', 'y', 'z'], help='抽出するプロファイルの軸 (x, y, z)')
+    parser.add_argument('measured_file', type=str, nargs='*', help='実測データCSVファイル名 (複数可: 3Dメッシュの読み込みと抽出は1回だけ)')
+    parser.add_argument('--measured-glob', type=str, action='append', default=None,
+                        help='実測データフォルダ内のファイルパターン (例: "10x10*.csv")。繰り返し指定可。')
+    parser.add_argument('--summary', type=str, default=None,
+                        help='比較結果一覧CSVの保存先 (デフォルト: 実測ファイルが複数のとき output/reports/Summary_<PHITSファイル名>.csv)')
+    parser.add_argument('--axis', type=str, default=None, choices=['x', 'y', 'z'],
+                        help='抽出するプロファイルの軸 (x, y, z)。省略時は実測ファイル名から軸と深さを判定します。')
+    parser.add_argument('--depth-axis', type=str, default='y', choices=['x', 'y', 'z'],
+                        help='--axis 省略時の深さ方向のPHITS軸 (デフォルト: y)')
+    parser.add_argument('--interp', type=str, default='linear', choices=list(INTERP_METHODS),
+                        help='プロファイル抽出の補間方法 (linear: トリリニア補間, nearest: 従来の最近傍ボクセル)')
     parser.add_argument('--cx', type=float, default=0.0, help='プロファイル断面のX座標 (cm)')
     parser.add_argument('--cy', type=float, default=0.0, help='プロファイル断面のY座標 (cm)')
     parser.add_argument('--cz', type=float, default=0.0, help='プロファイル断面のZ座標 (cm)')
@@ -230,35 +329,31 @@ def main():
     parser.add_argument('--dd', type=float, default=3.0, help='ガンマ評価の線量差許容値(%%) (デフォルト: 3.0)')
     parser.add_argument('--dta', type=float, default=3.0, help='ガンマ評価の距離許容値(mm) (デフォルト: 3.0)')
     parser.add_argument('--cutoff', type=float, default=10.0, help='ガンマ評価の低線量カットオフ値(%%) (デフォルト: 10.0)')
-    parser.add_argument('--no-plot', action='store_true', help='このフラグを立てるとグラフを画面に表示しません。')
+    parser.add_argument('--no-plot', action='store_true',
+                        help='(互換用) グラフは常に非対話バックエンドで plots/ に PNG 保存され、画面には表示されません。')
+    parser.add_argument('--cube-cache', action='store_true', help='3Dメッシュを output/cache/cubes に .npy 変換して保存し、次回以降はメモリマップで即時に開きます。')
+    parser.add_argument('--float32', action='store_true', help='--cube-cache / --stream の線量キューブを float32 で保存します (メモリ半分)。')
+    parser.add_argument('--stream', action='store_true', help='数GBの3Dタリーを一定メモリのチャンク読み込みで解析し、進捗を表示します。')
     
-    args = parser.parse_args()
+    args = parser.parse_intermixed_args()
 
     print(f"--- Comp_measured_phits.py Version: {__version__} ---")
 
-    phits_filepath = os.path.join(phits_dir, args.phits_file)
-    measured_filepath = os.path.join(measured_dir, args.measured_file)
-
-    df_measured, measured_axis = load_measured_data(measured_filepath)
-    phits_3d_data = parse_phits_3d_tally(phits_filepath)
-    
-    if phits_3d_data is None:
-        print("\nエラー: PHITSデータ読み込みに失敗したため、処理を中断しました。", file=sys.stderr)
+    config = configparser.ConfigParser()
+    if not os.path.exists(config_path):
+        print(f"エラー: 設定ファイル '{config_path}' が見つかりません。", file=sys.stderr)
         sys.exit(1)
-
-    df_phits_raw = extract_1d_profile(phits_3d_data, args.axis, args.cx, args.cy, args.cz)
-
-    if df_measured is None or df_phits_raw is None:
-        print("\nエラー: データ読み込みまたはプロファイル抽出に失敗したため、処理を中断しました。", file=sys.stderr)
+            
+    config.read(config_path, encoding='utf-8')
+    try:
+        paths = config['Paths']
+        phits_dir = os.path.join(project_root, paths.get('phits_data_dir', 'data/phits_output/'))
+        measured_dir = os.path.join(project_root, paths.get('measured_data_dir', 'data/measured_csv/'))
+        output_dir = os.path.join(project_root, paths.get('output_dir', 'output/'))
+    except KeyError:
+        print(f"エラー: '{config_path}' に '[Paths]' セクションがありません。", file=sys.stderr)
         sys.exit(1)
 
-    df_phits = df_phits_raw.copy()
-    df_phits['dose_normalized'] = (df_phits['dose'] / df_phits['dose'].max()) * 100
-
-    if args.scale != 1.0:
-        df_phits['dose_normalized'] *= args.scale
-        print(f"\n✅ 正規化後のPHITS線量データに係数 {args.scale} を適用しました。")
-
     if args.window % 2 == 0:
         print(f"エラー: 平滑化のウィンドウ幅は奇数である必要があります。指定値: {args.window}", file=sys.stderr)
         sys.exit(1)
@@ -266,50 +361,94 @@ def main():
         print(f"エラー: 多項式次数はウィンドウ幅より小さくする必要があります。指定値: window={args.window}, order={args.order}", file=sys.stderr)
         sys.exit(1)
 
-    if len(df_phits) > args.window:
-        df_phits['dose_smoothed'] = savgol_filter(df_phits['dose_normalized'], args.window, args.order)
-        print(f"✅ Savitzky-Golayフィルターを適用しました (window={args.window}, order={args.order})。")
-        df_phits_eval = df_phits.copy()
-        df_phits_eval.rename(columns={'dose_smoothed': 'dose_final'}, inplace=True)
-    else:
-        print(f"警告: データ点数({len(df_phits)})がウィンドウ幅({args.window})以下です。平滑化をスキップしました。")
-        df_phits_eval = df_phits.copy()
-        df_phits_eval.rename(columns={'dose_normalized': 'dose_final'}, inplace=True)
+    files = measured_files(args, measured_dir)
+    if not files:
+        print("エラー: 実測データファイルが指定されていません (位置引数または --measured-glob)。", file=sys.stderr)
+        sys.exit(1)
 
-    rmse_value = calculate_rmse(df_measured, df_phits_eval.rename(columns={'dose_final': 'dose_normalized'}))
-    print(f"\n✅ 平均二乗平方根誤差 (RMSE): {rmse_value:.4f}")
-    
-    gamma_pass_rate = calculate_gamma_index(df_measured, df_phits_eval.rename(columns={'dose_final': 'dose_normalized'}), args.dd, args.dta, args.cutoff)
-    print(f"✅ ガンマインデックス パス率: {gamma_pass_rate:.2f} %")
-    
-    plt.figure(figsize=(12, 8))
-    plt.scatter(df_measured['pos'], df_measured['dose_normalized'], label=f'Measured ({args.measured_file})', color='blue', s=20, alpha=0.7, zorder=5)
-    plt.plot(df_phits['pos'], df_phits['dose_normalized'], label=f'PHITS (Original Extracted)', color='gray', linestyle=':', lw=2, alpha=0.8)
-    plt.plot(df_phits_eval['pos'], df_phits_eval['dose_final'], label=f'PHITS (Scaled & Smoothed)', color='red', lw=2.5)
-    
-    plt.title(f'Comparison: PHITS vs. Measured ({args.axis}-axis profile)', fontsize=16)
-    plt.xlabel(f'Position ({args.axis}-axis, cm)', fontsize=12)
-    plt.ylabel('Normalized Dose (%)', fontsize=12)
-    plt.legend()
-    plt.grid(True, linestyle='--')
-    plt.ylim(0, 110)
+    phits_filepath = os.path.join(phits_dir, args.phits_file)
+    measured = [load_measured_data(os.path.join(measured_dir, f)) for f in files]
+    if args.cube_cache:
+        try:
+            phits_3d_data = open_cube(phits_filepath, os.path.join(output_dir, 'cache', 'cubes'),
+                                      dtype='float32' if args.float32 else 'float64',
+                                      progress=print_progress if args.stream else None)
+            print(f"✅ PHITS 3Dメッシュデータをキューブキャッシュから開きました (サイズ: {'x'.join(str(n) for n in phits_3d_data['dose'].shape)})。")
+        except (OSError, ValueError) as e:
+            print(f"エラー: キューブキャッシュの作成/読み込みに失敗しました - {e}", file=sys.stderr)
+            phits_3d_data = None
+    elif args.stream:
+        try:
+            phits_3d_data = read_xyz_cube(phits_filepath, dtype='float32' if args.float32 else 'float64',
+                                          progress=print_progress)
+            print(f"✅ PHITS 3Dメッシュデータをストリーミング読み込みしました (サイズ: {'x'.join(str(n) for n in phits_3d_data['dose'].shape)})。")
+        except (OSError, ValueError) as e:
+            print(f"エラー: PHITSファイルのストリーミング読み込みに失敗しました - {e}", file=sys.stderr)
+            phits_3d_data = None
+    else:
+        phits_3d_data = parse_phits_3d_tally(phits_filepath)
     
+    if phits_3d_data is None:
+        print("\nエラー: PHITSデータ読み込みに失敗したため、処理を中断しました。", file=sys.stderr)
+        sys.exit(1)
+
+    # 実測ファイルごとに抽出軸・断面座標を決め、全ファイル分を1回のギャザーで抽出する
+    rows, jobs = [], []
+    for measured_file, (df_measured, measured_axis) in zip(files, measured):
+        meta = parse_measured_name(measured_file) or {}
+        row = {'measured_file': measured_file, 'field': meta.get('field'), 'depth_cm': meta.get('depth_cm'),
+               'interp': args.interp, 'status': 'error'}
+        rows.append(row)
+        if df_measured is None:
+            row['error'] = '実測データの読み込みに失敗'
+            continue
+        try:
+            axis, centre = profile_line(measured_file, measured_axis, args)
+        except ValueError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            row['error'] = str(e)
+            continue
+        row.update(axis=axis, cx=centre[0], cy=centre[1], cz=centre[2])
+        jobs.append((row, df_measured, (axis, centre)))
+
+    phits_profiles = extract_1d_profiles(phits_3d_data, [line for _, _, line in jobs], args.interp)
+    if phits_profiles is None:
+        print("\nエラー: プロファイル抽出に失敗したため、処理を中断しました。", file=sys.stderr)
+        sys.exit(1)
+
     plot_dir = os.path.join(output_dir, "plots")
     report_dir = os.path.join(output_dir, "reports")
     os.makedirs(plot_dir, exist_ok=True)
     os.makedirs(report_dir, exist_ok=True)
-        
-    output_filename = os.path.join(plot_dir, f'Comp_{os.path.splitext(args.phits_file)[0]}_vs_{os.path.splitext(args.measured_file)[0]}_axis-{args.axis}.png')
-    plt.savefig(output_filename)
-    print(f"\n✅ グラフを '{output_filename}' に保存しました。")
 
-    axis_params = {'axis': args.axis, 'cx': args.cx, 'cy': args.cy, 'cz': args.cz}
-    analysis_params = {'scale': args.scale, 'window': args.window, 'order': args.order, 'dd': args.dd, 'dta': args.dta, 'cutoff': args.cutoff}
-
-    save_results_to_text(report_dir, args.phits_file, args.measured_file, axis_params, analysis_params, rmse_value, gamma_pass_rate)
-    
-    if not args.no_plot:
-        plt.show()
+    for (row, df_measured, (axis, (cx, cy, cz))), df_phits_raw in zip(jobs, phits_profiles):
+        if df_phits_raw is None:
+            row['error'] = '断面がメッシュの範囲外'
+            continue
+        if len(files) > 1:
+            print(f"\n=== {row['measured_file']} (軸: {axis}) ===")
+        axis_params = {'axis': axis, 'cx': cx, 'cy': cy, 'cz': cz, 'interp': args.interp}
+        row.update(compare_profile(args, row['measured_file'], df_measured, df_phits_raw, axis_params, plot_dir, report_dir),
+                   status='ok')
+
+    if args.summary or len(files) > 1:
+        summary_path = args.summary or os.path.join(
+            report_dir, f"Summary_{os.path.splitext(os.path.basename(args.phits_file))[0]}.csv")
+        print(f"\n--- 比較結果一覧 ({len(files)} ファイル, 3Dメッシュ読み込み 1 回) ---")
+        for row in rows:
+            if row['status'] == 'ok':
+                print(f"  {row['measured_file']:<28} 軸={row['axis']} RMSE={row['rmse']:.4f} γ={row['gamma_pass_percent']:.2f} %")
+            else:
+                print(f"  {row['measured_file']:<28} エラー: {row['error']}")
+        save_summary(summary_path, rows)
+
+    failed = [row for row in rows if row['status'] != 'ok']
+    if failed:
+        print(f"\nエラー: {len(failed)} 件の実測ファイルを比較できませんでした。", file=sys.stderr)
+
+    plot_render.close_all()
+    if failed:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,372 @@
+"""In-process parallel batch runner for `ocr_true_scaling.py` campaigns.
+
+A manifest lists beam-model folders (scenarios) and the depths/axes to
+compare. Every case is expanded into an explicit argument list for
+`ocr_true_scaling` (output directory, grid and all gamma parameters are
+passed per job, `config.ini` is not touched). The cases of one scenario share
+their PDD pair and run as one `ocr_true_scaling.run_pairs` job, so the PDD
+stage, report and plot are produced once per scenario and no two workers write
+the same files. Jobs run in a process pool, so heavy imports are paid once per
+worker. One summary (CSV + JSON) is written for the whole campaign.
+
+Manifest (JSON or YAML; YAML needs PyYAML):
+
+    {
+      "measured_dir": "data/measured_csv",
+      "output_root": "output",
+      "depths": [5, 10, 20],
+      "axes": ["x", "z"],
+      "params": {"cutoff": 10, "grid": 0.1, "export_csv": true},
+      "scenarios": [
+        {"folder": "C:/phits/work/Rev47", "size": "10x10"},
+        {"folder": "C:/phits/work/Rev50", "size": "30x30", "depths": [10], "params": {"dd1": 3}}
+      ]
+    }
+
+CSV manifests hold one scenario per row (``folder,size[,depths][,axes][,name]``
+plus any parameter columns; depths/axes are ``;``-separated).
+
+With ``--campaign name|size`` the cases store their plots instead of writing
+one PNG each (``--plots deferred``) and `campaign_figure` lays them out after
+the run: one multi-panel figure per scenario or per field size.
+
+Usage:
+    python src/batch_engine.py <manifest.json|yaml|csv> [--workers N] [--summary PATH] [--dry-run] [--incremental]
+        [--campaign name|size] [--campaign-format png|pdf]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from measured_store import MeasuredStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PARAMS = {
+    'norm_mode': 'dmax',
+    'cutoff': 10.0,
+    'grid': 0.1,
+    'smooth_window': 5,
+    'smooth_order': 2,
+    'xlim_symmetric': True,
+    'export_csv': True,
+    'export_gamma': True,
+    'cache': True,
+}
+# Manifest keys that are not ocr_true_scaling options
+_CASE_KEYS = ('folder', 'size', 'depths', 'axes', 'name', 'params')
+SUMMARY_FIELDS = [
+    'name', 'size', 'depth_cm', 'axis', 'status', 'elapsed_s', 'rmse',
+    'gamma1_gpr_percent', 'gamma2_gpr_percent', 'pdd_rmse', 'pdd_gamma1_gpr_percent', 'pdd_gamma2_gpr_percent',
+    'fwhm_ref_cm', 'fwhm_eval_cm', 'fwhm_delta_cm', 'ref_ocr_file', 'eval_ocr_file', 'report_path', 'error',
+]
+# Plot artifacts kept in the rows (and the JSON summary) for campaign_figure
+PLOT_FIELDS = ['plot_path', 'plot_spec_path', 'pdd_plot_path', 'pdd_plot_spec_path']
+
+
+def _resolve(path: str, base: str) -> str:
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base, path))
+
+
+def _split_list(value, cast=str) -> list:
+    if isinstance(value, (list, tuple)):
+        return [cast(v) for v in value]
+    return [cast(v.strip()) for v in str(value).replace(',', ';').split(';') if v.strip()]
+
+
+def _csv_value(v: str):
+    low = v.strip().lower()
+    if low in ('true', 'yes'):
+        return True
+    if low in ('false', 'no'):
+        return False
+    try:
+        return float(v) if any(ch in v for ch in '.eE') else int(v)
+    except ValueError:
+        return v.strip()
+
+
+def load_manifest(path: str) -> dict:
+    """Read a JSON/YAML/CSV manifest; relative paths are resolved against its directory."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.yaml', '.yml'):
+        try:
+            import yaml  # type: ignore
+        except ModuleNotFoundError:
+            raise ValueError("YAML manifests need PyYAML (pip install pyyaml); use JSON or CSV instead")
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            manifest = yaml.safe_load(f) or {}
+    elif ext == '.csv':
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = [r for r in csv.DictReader(f) if any((v or '').strip() for v in r.values())]
+        scenarios = []
+        for r in rows:
+            sc = {k: r[k] for k in ('folder', 'size', 'name') if r.get(k)}
+            for k in ('depths', 'axes'):
+                if r.get(k):
+                    sc[k] = r[k]
+            params = {k: _csv_value(v) for k, v in r.items() if k not in _CASE_KEYS and v not in (None, '')}
+            if params:
+                sc['params'] = params
+            scenarios.append(sc)
+        manifest = {'scenarios': scenarios}
+    else:
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            manifest = json.load(f)
+    if not manifest.get('scenarios'):
+        raise ValueError(f"manifest has no scenarios: {path}")
+    manifest['base_dir'] = os.path.dirname(os.path.abspath(path))
+    return manifest
+
+
+def _depth_tag(depth_cm: float) -> str:
+    # 5 -> 050, 10 -> 100, 20 -> 200 (PHITS OCR file naming, depth in mm)
+    return f"{int(round(depth_cm * 10)):03d}"
+
+
+def _args_from_params(params: dict) -> List[str]:
+    argv = []
+    for key, value in params.items():
+        flag = '--' + key.replace('_', '-')
+        if isinstance(value, bool):
+            if value:
+                argv.append(flag)
+        elif isinstance(value, (list, tuple)):
+            argv.append(flag)
+            argv.extend(str(v) for v in value)
+        elif value is not None:
+            argv.extend([flag, str(value)])
+    return argv
+
+
+def expand_cases(manifest: dict, store: Optional[MeasuredStore] = None,
+                 log: Callable[[str], None] = print) -> List[dict]:
+    """One job per scenario x depth x axis with its full ocr_true_scaling argument list."""
+    base = manifest.get('base_dir', REPO_ROOT)
+    meas_dir = _resolve(manifest.get('measured_dir', os.path.join(REPO_ROOT, 'data', 'measured_csv')), base)
+    out_root = _resolve(manifest.get('output_root', os.path.join(REPO_ROOT, 'output')), base)
+    if store is None:
+        store = MeasuredStore.open(os.path.join(out_root, 'cache', 'measured_store.npz'), meas_dir)
+    ocr_pattern = manifest.get('phits_ocr_pattern', 'deposit-y-water-{depth_tag}{axis}.out')
+    pdd_name = manifest.get('phits_pdd_file', 'deposit-z-water.out')
+    cases = []
+    for sc in manifest['scenarios']:
+        folder = _resolve(sc['folder'], base)
+        size = str(sc['size']).rstrip('m')
+        name = sc.get('name') or os.path.basename(os.path.normpath(folder))
+        params = dict(DEFAULT_PARAMS, **manifest.get('params', {}), **sc.get('params', {}))
+        depths = _split_list(sc.get('depths', manifest.get('depths', [5, 10, 20])), float)
+        axes = _split_list(sc.get('axes', manifest.get('axes', ['x', 'z'])))
+        pdd_rec = store.get(size, 'pdd')
+        phits_pdd = os.path.join(folder, pdd_name)
+        for depth in depths:
+            for axis in axes:
+                ocr_rec = store.get(size, 'ocr', depth, axis)
+                phits_ocr = os.path.join(folder, ocr_pattern.format(depth_tag=_depth_tag(depth), depth=depth,
+                                                                     depth_mm=int(round(depth * 10)), axis=axis))
+                missing = [label for label, ok in (('measured PDD', pdd_rec is not None),
+                                                   ('measured OCR', ocr_rec is not None),
+                                                   ('PHITS PDD', os.path.exists(phits_pdd)),
+                                                   ('PHITS OCR', os.path.exists(phits_ocr))) if not ok]
+                case = {'name': name, 'size': size, 'depth_cm': depth, 'axis': axis}
+                if missing:
+                    log(f"[SKIP] {name} {size} d={depth:g} ax={axis}: missing {', '.join(missing)}")
+                    continue
+                argv = [
+                    '--ref-pdd-type', 'csv', '--ref-pdd-file', pdd_rec['path'],
+                    '--eval-pdd-type', 'phits', '--eval-pdd-file', phits_pdd,
+                    '--ref-ocr-type', 'csv', '--ref-ocr-file', ocr_rec['path'],
+                    '--eval-ocr-type', 'phits', '--eval-ocr-file', phits_ocr,
+                    '--output-dir', os.path.join(out_root, name),
+                ] + _args_from_params(params)
+                if params.get('cache') and 'cache_dir' not in params:
+                    # One profile cache per campaign: the shared PDDs are parsed once
+                    argv += ['--cache-dir', os.path.join(out_root, 'cache', 'profiles')]
+                case['argv'] = argv
+                cases.append(case)
+    return cases
+
+
+def _init_worker() -> None:
+    # Headless plotting in workers; import the pipeline once per process
+    import plot_render
+    plot_render.use_agg()
+    import ocr_true_scaling  # noqa: F401
+
+
+# Per-pair options of an expanded argument list; the rest is shared by a scenario
+_PAIR_FLAGS = ('--ref-ocr-file', '--eval-ocr-file')
+
+
+def _split_pair(argv: List[str]) -> Tuple[List[str], List[str]]:
+    common, pair = [], []
+    i = 0
+    while i < len(argv):
+        if argv[i] in _PAIR_FLAGS:
+            pair += argv[i:i + 2]
+            i += 2
+        else:
+            common.append(argv[i])
+            i += 1
+    return common, pair
+
+
+def group_cases(cases: List[dict]) -> List[dict]:
+    """Jobs of cases that differ only in their OCR pair (one scenario: same PDD pair, output and parameters).
+
+    Each job runs as one ``ocr_true_scaling.run_pairs`` call, so the PDD stage,
+    the PDD report and plot of a scenario are computed and written once.
+    """
+    jobs: Dict[tuple, dict] = {}
+    for case in cases:
+        common, pair = _split_pair(case['argv'])
+        job = jobs.setdefault(tuple(common), {'argv': list(common), 'cases': []})
+        job['argv'] += pair
+        job['cases'].append(case)
+    return list(jobs.values())
+
+
+def run_job(job: dict) -> List[dict]:
+    """Execute one job of `group_cases` in this process; one row per case, never raises.
+
+    When the job raises, its cases are re-run on their own so that only the
+    failing pairs get an ``error`` row.
+    """
+    import contextlib
+    import io
+    import ocr_true_scaling
+
+    rows = [{k: case.get(k) for k in ('name', 'size', 'depth_cm', 'axis')} for case in job['cases']]
+    t0 = time.perf_counter()
+    log = io.StringIO()
+    try:
+        args = ocr_true_scaling.build_parser().parse_args(job['argv'])
+        with contextlib.redirect_stdout(log):
+            results = ocr_true_scaling.run_pairs(args)
+        for row, result in zip(rows, results):
+            row.update({k: result.get(k) for k in SUMMARY_FIELDS + PLOT_FIELDS if k in result})
+            row['status'] = 'skipped' if result.get('skipped') else 'ok'
+    except SystemExit as e:  # argparse errors
+        for row in rows:
+            row.update(status='error', error=f"invalid arguments (exit {e.code})")
+    except Exception as e:
+        if len(rows) > 1:
+            # One failing pair must not take the others down: re-run the cases one by one
+            return [run_case(case) for case in job['cases']]
+        for row in rows:
+            row.update(status='error', error=f"{type(e).__name__}: {e}")
+    # The shared PDD stage is not attributable to one pair: the job time is split evenly
+    elapsed = round((time.perf_counter() - t0) / len(rows), 3)
+    for row in rows:
+        row['elapsed_s'] = elapsed
+    return rows
+
+
+def run_case(case: dict) -> dict:
+    """Execute one expanded case on its own in this process; never raises."""
+    return run_job(group_cases([case])[0])[0]
+
+
+def run_batch(cases: List[dict], workers: Optional[int] = None,
+              log: Callable[[str], None] = print) -> List[dict]:
+    """Run cases grouped per scenario (`group_cases`) on ``workers`` processes (default: CPU count; 1 = here).
+
+    Returns one row per case, in the order of ``cases``.
+    """
+    jobs = group_cases(cases)
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs) or 1))
+    index = {id(case): i for i, case in enumerate(cases)}
+    rows = [None] * len(cases)
+    done = 0
+
+    def collect(job, job_rows):
+        nonlocal done
+        for case, row in zip(job['cases'], job_rows):
+            rows[index[id(case)]] = row
+            done += 1
+            log(_progress_line(row, done, len(cases)))
+
+    if workers == 1:
+        _init_worker()
+        for job in jobs:
+            collect(job, run_job(job))
+        return rows
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for fut in as_completed(futures):
+            collect(futures[fut], fut.result())
+    return rows
+
+
+def _progress_line(row: dict, done: int, total: int) -> str:
+    head = f"[{done}/{total}] {row['name']} {row['size']} d={row['depth_cm']:g} ax={row['axis']}"
+    if row['status'] == 'error':
+        return f"{head}: ERROR {row.get('error')}"
+    if row['status'] == 'skipped':
+        return f"{head}: up to date"
+    return f"{head}: RMSE={row['rmse']:.6f} G1={row['gamma1_gpr_percent']:.2f}% G2={row['gamma2_gpr_percent']:.2f}% ({row['elapsed_s']:.2f}s)"
+
+
+def write_summary(rows: List[dict], path: str) -> str:
+    """Write the consolidated summary as CSV (``path``) and JSON (same stem)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        w.writeheader()
+        for row in rows:
+            w.writerow({k: ('' if row.get(k) is None else row.get(k)) for k in SUMMARY_FIELDS})
+    with open(os.path.splitext(path)[0] + '.json', 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Run an ocr_true_scaling campaign from a manifest in a process pool')
+    ap.add_argument('manifest', help='JSON, YAML or CSV manifest')
+    ap.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    ap.add_argument('--summary', type=str, default=None, help='summary CSV (default: <output_root>/batch_summary.csv)')
+    ap.add_argument('--dry-run', action='store_true', help='list the expanded cases and exit')
+    ap.add_argument('--incremental', action='store_true', help='skip cases whose inputs and parameters are unchanged')
+    ap.add_argument('--campaign', choices=['name', 'size'], default=None,
+                    help='defer the per-case plots and draw one figure per scenario (name) or field size (size)')
+    ap.add_argument('--campaign-format', choices=['png', 'pdf'], default='png',
+                    help='campaign figures as PNGs or as one multi-page PDF (default: png)')
+    args = ap.parse_args()
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.incremental:
+        manifest.setdefault('params', {})['incremental'] = True
+    if args.campaign:
+        manifest.setdefault('params', {}).setdefault('plots', 'deferred')
+    cases = expand_cases(manifest)
+    if args.dry_run:
+        for c in cases:
+            print(f"{c['name']} {c['size']} d={c['depth_cm']:g} ax={c['axis']}: {' '.join(c['argv'])}")
+        return
+    t0 = time.perf_counter()
+    rows = run_batch(cases, args.workers)
+    out_root = _resolve(manifest.get('output_root', os.path.join(REPO_ROOT, 'output')), manifest['base_dir'])
+    summary = write_summary(rows, args.summary or os.path.join(out_root, 'batch_summary.csv'))
+    if args.campaign:
+        import campaign_figure
+        for p in campaign_figure.render_campaign(rows, os.path.join(out_root, 'plots'), args.campaign,
+                                                 args.campaign_format):
+            print("Campaign figure saved: " + p)
+    failed = sum(r['status'] == 'error' for r in rows)
+    skipped = sum(r['status'] == 'skipped' for r in rows)
+    print(f"\n{len(rows)} cases ({skipped} up to date, {failed} failed) in {time.perf_counter() - t0:.1f}s. Summary: {summary}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""One multi-panel figure per field (or per field size) for a whole campaign.
+
+Instead of one PNG per case plus one PDD plot per case, the plot payloads
+stored by ``ocr_true_scaling.py --plots deferred`` (``<output>/cache/plots``,
+see `plot_render`) of every case row of a `batch_engine` campaign are laid out
+in a single pass:
+
+    --by name   one figure per scenario (field of one beam model): a PDD panel
+                spanning the left column, one OCR panel per depth (rows) x
+                axis (columns)
+    --by size   one figure per field size with the revisions (scenarios) of
+                that size overlaid on the same panels against one reference;
+                only the first ``--max-overlays`` of them in row order (the
+                best ones for a ranked campaign) are drawn
+
+OCR panels share their y axis, panels of one scan axis share their x axis, and
+one legend serves the whole figure; every panel is annotated with its gamma
+pass rates. Figures are written as ``Campaign_<key>.png`` or as the pages of
+one ``Campaign_by-<by>.pdf``.
+
+Usage:
+    python src/campaign_figure.py <batch_summary.json> [--by name|size] [--format png|pdf] [--out-dir DIR]
+        [--max-overlays N]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+import plot_render
+
+# Panel size (inches) of one depth x axis cell
+PANEL_SIZE = (4.5, 3.2)
+# Revisions overlaid per figure by default: one colour of the default cycle each
+MAX_OVERLAYS = 10
+_LINESTYLES = ('-', '--', ':', '-.')
+
+
+def _key(value) -> str:
+    return re.sub(r'[^\w.+-]+', '_', str(value)).strip('_') or 'campaign'
+
+
+def group_rows(rows: List[dict], by: str = 'name') -> Dict[str, List[dict]]:
+    """Case rows with a stored OCR plot grouped by ``by`` (``name`` or ``size``), in first-seen order."""
+    if by not in ('name', 'size'):
+        raise ValueError(f"cannot group by {by!r} (name or size)")
+    groups: Dict[str, List[dict]] = {}
+    for row in rows:
+        spec = row.get('plot_spec_path')
+        if row.get('status') == 'error' or not spec or not os.path.exists(spec):
+            continue
+        groups.setdefault(str(row[by]), []).append(row)
+    return groups
+
+
+def _gamma_note(row: dict, label: Optional[str]) -> str:
+    g1, g2 = row.get('gamma1_gpr_percent'), row.get('gamma2_gpr_percent')
+    text = ', '.join(f"G{i} {g:.1f}%" for i, g in ((1, g1), (2, g2)) if g is not None)
+    return f"{label}: {text}" if label else text
+
+
+def _styles(names: List[str]) -> Dict[str, dict]:
+    """One evaluation line style per scenario name, fixed for every panel of a figure."""
+    styles = {}
+    for j, name in enumerate(names):
+        # 10 colours, then the same colours with another line style
+        styles[name] = {'color': f"C{j % 10}"}
+        if j >= 10:
+            styles[name]['linestyle'] = _LINESTYLES[(j // 10) % len(_LINESTYLES)]
+    return styles
+
+
+def _overlay(specs: List[dict], names: List[str], styles: Dict[str, dict], labelled: bool = True) -> dict:
+    """Reference of the first spec plus the evaluation series of every spec, styled by scenario ``names``."""
+    ref, series = specs[0]['series'][0], []
+    series.append(dict(ref, style=dict(ref.get('style') or {}, color='k')))
+    for spec, name in zip(specs, names):
+        ev = spec['series'][1]
+        style = dict(ev.get('style') or {}, color=styles[name]['color'])
+        if 'linestyle' in styles[name] and ev.get('type') != 'scatter':
+            style['linestyle'] = styles[name]['linestyle']
+        series.append(dict(ev, label=name if labelled else ev.get('label'), style=style))
+    panel = {k: specs[0].get(k) for k in ('xlabel', 'ylabel', 'grid', 'ylim')}
+    xlims = [s['xlim'] for s in specs if s.get('xlim') is not None]
+    if xlims:
+        panel['xlim'] = (min(x[0] for x in xlims), max(x[1] for x in xlims))
+    panel['series'] = series
+    return panel
+
+
+def draw_group(fig, rows: List[dict], by: str = 'name', max_overlays: Optional[int] = MAX_OVERLAYS) -> None:
+    """Lay the stored plots of one group out on ``fig`` (PDD column + depth x axis grid, shared legend).
+
+    Only the first ``max_overlays`` scenarios of ``rows`` are drawn (``None``/0: all).
+    """
+    names = list(dict.fromkeys(r['name'] for r in rows))
+    total = len(names)
+    if max_overlays and total > max_overlays:
+        names = names[:max_overlays]
+        rows = [r for r in rows if r['name'] in names]
+    labelled = total > 1
+    styles = _styles(names)
+    cells: Dict[tuple, List[dict]] = {}
+    for r in rows:
+        cells.setdefault((float(r['depth_cm']), str(r['axis'])), []).append(r)
+    depths = sorted({d for d, _ in cells})
+    axes = sorted({a for _, a in cells})
+    pdd = {}  # one PDD per scenario (the same for every depth/axis of it)
+    for r in rows:
+        p = r.get('pdd_plot_spec_path')
+        if p and os.path.exists(p) and r['name'] not in pdd:
+            pdd[r['name']] = p
+
+    grid = fig.add_gridspec(len(depths), len(axes) + bool(pdd))
+    first = 1 if pdd else 0
+    handles = {}
+    shared_y, shared_x = None, {}
+    for (depth, axis), members in sorted(cells.items()):
+        i, j = depths.index(depth), axes.index(axis)
+        ax = fig.add_subplot(grid[i, j + first], sharex=shared_x.get(axis), sharey=shared_y)
+        shared_x.setdefault(axis, ax)
+        shared_y = shared_y or ax
+        specs = [plot_render.load_spec(m['plot_spec_path']) for m in members]
+        overlay = _overlay(specs, [m['name'] for m in members], styles, labelled)
+        plot_render.draw(ax, dict(overlay, title=f"d = {depth:g} cm, {axis}"))
+        ax.text(0.02, 0.97, '\n'.join(_gamma_note(m, m['name'] if labelled else None) for m in members),
+                transform=ax.transAxes, fontsize=7, va='top',
+                bbox={'boxstyle': 'round', 'facecolor': 'white', 'alpha': 0.7, 'linewidth': 0})
+        if i < len(depths) - 1 and (depths[i + 1], axis) in cells:
+            ax.tick_params(labelbottom=False)
+            ax.set_xlabel('')
+        if j > 0:
+            ax.tick_params(labelleft=False)
+            ax.set_ylabel('')
+        for h, lab in zip(*ax.get_legend_handles_labels()):
+            handles.setdefault(lab, h)
+    if pdd:
+        ax = fig.add_subplot(grid[:, 0])
+        specs = [plot_render.load_spec(p) for p in pdd.values()]
+        plot_render.draw(ax, dict(_overlay(specs, list(pdd), styles, labelled), title='PDD'))
+
+    first_spec = next(iter(cells.values()))[0]
+    sizes = sorted({str(r['size']) for r in rows})
+    shown = f"first {len(names)} of {total}" if len(names) < total else str(total)
+    title = f"{names[0]} ({', '.join(sizes)})" if by == 'name' else f"{', '.join(sizes)}: {shown} revision(s)"
+    mode = plot_render.load_spec(first_spec['plot_spec_path']).get('legend') or {}
+    fig.suptitle(title + (f" [{mode['title']}]" if mode.get('title') else ''))
+    fig.legend(list(handles.values()), list(handles), loc='lower center', ncol=min(len(handles), 6), frameon=False)
+    fig.tight_layout(rect=(0, 0.05, 1, 0.97))
+
+
+def render_campaign(rows: List[dict], out_dir: str, by: str = 'name', fmt: str = 'png',
+                    max_overlays: Optional[int] = MAX_OVERLAYS) -> List[str]:
+    """Write one figure per group of ``rows`` (PNG each, or pages of one PDF); returns the written paths.
+
+    ``max_overlays`` caps the scenarios drawn per figure (see `draw_group`).
+    """
+    if fmt not in ('png', 'pdf'):
+        raise ValueError(f"unknown figure format: {fmt} (png or pdf)")
+    groups = group_rows(rows, by)
+    if not groups:
+        return []
+    import matplotlib
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    os.makedirs(out_dir, exist_ok=True)
+    first = plot_render.load_spec(next(iter(groups.values()))[0]['plot_spec_path'])
+    paths, pdf = [], None
+    if fmt == 'pdf':
+        from matplotlib.backends.backend_pdf import PdfPages
+        paths.append(os.path.join(out_dir, f"Campaign_by-{by}.pdf"))
+        pdf = PdfPages(paths[0])
+    try:
+        with matplotlib.rc_context(first.get('rc') or {}):
+            for key, members in groups.items():
+                n_depths = len({r['depth_cm'] for r in members})
+                n_cols = len({r['axis'] for r in members}) + 1
+                fig = Figure(figsize=(PANEL_SIZE[0] * n_cols, PANEL_SIZE[1] * n_depths + 1.0))
+                FigureCanvasAgg(fig)
+                draw_group(fig, members, by, max_overlays)
+                if pdf is not None:
+                    pdf.savefig(fig)
+                else:
+                    paths.append(os.path.join(out_dir, f"Campaign_{_key(key)}.png"))
+                    fig.savefig(paths[-1])
+                fig.clear()
+    finally:
+        if pdf is not None:
+            pdf.close()
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Multi-panel campaign figures from stored (deferred) plots')
+    ap.add_argument('summary', help='batch_summary.json of a campaign run with --plots deferred')
+    ap.add_argument('--by', choices=['name', 'size'], default='name',
+                    help='one figure per scenario (name) or per field size with revisions overlaid (size)')
+    ap.add_argument('--format', choices=['png', 'pdf'], default='png', help='PNG per figure or one multi-page PDF')
+    ap.add_argument('--out-dir', type=str, default=None, help='default: plots/ next to the summary')
+    ap.add_argument('--max-overlays', type=int, default=MAX_OVERLAYS,
+                    help=f'scenarios drawn per figure, first ones in the summary (default: {MAX_OVERLAYS}; 0 = all)')
+    args = ap.parse_args()
+
+    try:
+        with open(args.summary, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: cannot read {args.summary}: {e}", file=sys.stderr)
+        sys.exit(1)
+    out_dir = args.out_dir or os.path.join(os.path.dirname(os.path.abspath(args.summary)), 'plots')
+    plot_render.use_agg()
+    paths = render_campaign(rows, out_dir, args.by, args.format, args.max_overlays)
+    if not paths:
+        print("No stored plots in the summary (run the campaign with --plots deferred)")
+        return
+    for p in paths:
+        print("Campaign figure saved: " + p)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,414 @@
+"""3D T-Deposit dose cubes stored as memory-mappable `.npy` files.
+
+A PHITS xyz mesh tally is converted once into a directory holding
+``dose.npy`` and ``err.npy`` (shape ``(nz, ny, nx)``, as written by PHITS),
+the bin-centre axes ``x.npy``/``y.npy``/``z.npy`` and ``meta.json``. Later
+runs open the cube with ``np.load(..., mmap_mode='r')`` instead of reparsing.
+`extract_profiles`/`extract_lines` interpolate any number of profiles from an
+opened cube in one vectorised gather; `sample_grid` resamples onto a
+rectilinear grid.
+
+Usage:
+    python src/dose_cube.py <phits_3d.out> [--out-dir DIR] [--float32] [--chunk-mb MB]
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+from typing import Callable, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from profile_io import find_tally, index_tallies
+
+# Bump when the on-disk layout changes
+CUBE_VERSION = 1
+INTERP_METHODS = ("linear", "nearest")
+# First line that cannot be part of the numeric table (comment, ANGEL text ...)
+_NON_NUMERIC_LINE_RE = re.compile(rb"^[ \t]*[^ \t\r\n0-9+\-.]", re.MULTILINE)
+
+
+def _mesh_axes(params: dict) -> dict:
+    axes = {}
+    for ax in ("x", "y", "z"):
+        n = params.get(f"n{ax}")
+        lo, hi = params.get(f"{ax}min"), params.get(f"{ax}max")
+        if not isinstance(n, int) or lo is None or hi is None:
+            raise ValueError(f"mesh definition for {ax} is incomplete (n{ax}/{ax}min/{ax}max)")
+        edges = np.linspace(lo, hi, n + 1)
+        axes[ax] = 0.5 * (edges[:-1] + edges[1:])
+    return axes
+
+
+_COMMENT_LINE_RE = re.compile(rb"^[ \t]*#[^\n]*\n", re.MULTILINE)
+_SKIP_LINES_RE = re.compile(rb"(?:[ \t]*(?:#[^\n]*)?\r?\n)*")
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def _find_xyz_data_start(buf, start: int, end: int) -> int:
+    # Same rule as Comp_measured_phits_v10: first comment line naming x, y and z
+    # (after the #newpage marker) heads the data; skip following blanks/comments.
+    page = buf.find(b"#newpage:", start, end)
+    pos = start if page < 0 else page
+    for m in _COMMENT_LINE_RE.finditer(buf, pos, end):
+        line = m.group(0).lower()
+        if b"x" in line and b"y" in line and b"z" in line:
+            return _SKIP_LINES_RE.match(buf, m.end(), end).end()
+    raise ValueError("could not find the start of the xyz data table")
+
+
+def _chunk_rows(chunk: bytes, ncol: int) -> np.ndarray:
+    # Fast path only when every non-empty row has ``ncol`` values: a total that is
+    # merely a multiple of ``ncol`` (ragged rows) would shift the columns.
+    if {len(line.split()) for line in chunk.splitlines()} - {0} == {ncol}:
+        try:
+            return np.array(chunk.split(), dtype=float).reshape(-1, ncol)
+        except ValueError:
+            pass
+    rows = []
+    for line in chunk.splitlines():
+        parts = line.split()
+        if len(parts) != ncol:
+            continue
+        try:
+            rows.append([float(p) for p in parts])
+        except ValueError:
+            continue
+    return np.asarray(rows, float).reshape(-1, ncol)
+
+
+def stream_xyz_block(path: str, block: dict, dose_out: np.ndarray, err_out: Optional[np.ndarray] = None,
+                     chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                     progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """Stream the xyz table of ``block`` into preallocated flat outputs.
+
+    ``dose_out``/``err_out`` are 1D views (e.g. ``open_memmap(...).reshape(-1)``)
+    of length ``nx*ny*nz`` filled in file order (x fastest). The file is read in
+    ``chunk_bytes`` pieces, so peak memory is the outputs plus one chunk.
+    ``progress(done, total)`` is called after every chunk. Returns voxels read.
+    """
+    total = dose_out.size
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            pos = _find_xyz_data_start(buf, block["start"], block["end"])
+        finally:
+            buf.close()
+        f.seek(pos)
+        remaining = block["end"] - pos
+        done = 0
+        ncol = 0
+        carry = b""
+        while remaining > 0 or carry:
+            raw = f.read(min(chunk_bytes, remaining)) if remaining > 0 else b""
+            remaining -= len(raw)
+            data = carry + raw
+            if remaining > 0:
+                cut = data.rfind(b"\n") + 1
+                if cut == 0:
+                    carry = data
+                    continue
+                data, carry = data[:cut], data[cut:]
+            else:
+                carry = b""
+            stop = _NON_NUMERIC_LINE_RE.search(data)
+            if stop is not None:
+                data, remaining, carry = data[:stop.start()], 0, b""
+            if not ncol:
+                first = data.lstrip().split(b"\n", 1)[0].split()
+                ncol = len(first)
+                if ncol and ncol < 2:
+                    raise ValueError("xyz data table has fewer than two columns")
+            if not ncol:
+                continue
+            table = _chunk_rows(data, ncol)
+            n = len(table)
+            if done + n > total:
+                raise ValueError(f"data points exceed mesh definition ({total})")
+            dose_out[done:done + n] = table[:, -2]
+            if err_out is not None:
+                err_out[done:done + n] = table[:, -1]
+            done += n
+            if progress is not None:
+                progress(done, total)
+    if done != total:
+        raise ValueError(f"data points ({done}) do not match mesh definition ({total})")
+    return done
+
+
+def read_xyz_cube(path: str, dtype: str = "float64", chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                  progress: Optional[Callable[[int, int], None]] = None, which: int = -1) -> dict:
+    """Stream the T-Deposit xyz block into an in-memory cube (no memmap, no cache)."""
+    block = find_tally(index_tallies(path), "T-Deposit", which=which)
+    if block is None:
+        raise ValueError(f"no [ T-Deposit ] tally in {path}")
+    axes = _mesh_axes(block["params"])
+    shape = (len(axes["z"]), len(axes["y"]), len(axes["x"]))
+    dose = np.empty(shape, dtype=dtype)
+    err = np.empty(shape, dtype=dtype)
+    stream_xyz_block(path, block, dose.reshape(-1), err.reshape(-1), chunk_bytes, progress)
+    return {"x": axes["x"], "y": axes["y"], "z": axes["z"],
+            "dose": dose.transpose(2, 1, 0), "err": err.transpose(2, 1, 0)}
+
+
+def print_progress(done: int, total: int) -> None:
+    """Progress callback for CLIs: one stderr line per ~10 %."""
+    step = max(total // 10, 1)
+    if done == total or done // step != getattr(print_progress, "_last", -1):
+        print_progress._last = done // step
+        print(f"  ... {done}/{total} voxels ({100.0 * done / max(total, 1):.0f}%)", file=sys.stderr)
+
+
+def _source_stamp(path: str, block: dict) -> dict:
+    st = os.stat(path)
+    return {
+        "source": os.path.abspath(path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "block_start": block["start"],
+        "version": CUBE_VERSION,
+    }
+
+
+def convert_tally_to_cube(path: str, out_dir: str, dtype: str = "float64", which: int = -1,
+                          chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                          progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """Convert the T-Deposit xyz block of ``path`` into a cube directory ``out_dir``."""
+    block = find_tally(index_tallies(path), "T-Deposit", which=which)
+    if block is None:
+        raise ValueError(f"no [ T-Deposit ] tally in {path}")
+    params = block["params"]
+    axes = _mesh_axes(params)
+    shape = (len(axes["z"]), len(axes["y"]), len(axes["x"]))
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    # Voxels are streamed straight into the on-disk arrays
+    dose = open_memmap(os.path.join(out_dir, "dose.npy"), mode="w+", dtype=dtype, shape=shape)
+    err = open_memmap(os.path.join(out_dir, "err.npy"), mode="w+", dtype=dtype, shape=shape)
+    try:
+        stream_xyz_block(path, block, dose.reshape(-1), err.reshape(-1), chunk_bytes, progress)
+        dose.flush()
+        err.flush()
+    finally:
+        del dose, err
+    for ax in ("x", "y", "z"):
+        np.save(os.path.join(out_dir, f"{ax}.npy"), axes[ax])
+    meta = dict(_source_stamp(path, block), dtype=str(np.dtype(dtype)), shape=list(shape),
+                unit=params.get("unit"), part=params.get("part"), axis=params.get("axis"))
+    tmp = os.path.join(out_dir, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(out_dir, "meta.json"))  # written last: marks the cube complete
+    return out_dir
+
+
+def load_cube(cube_dir: str, mmap: bool = True) -> dict:
+    """Open a cube directory; ``dose``/``err`` are ``[x, y, z]`` views of the stored arrays.
+
+    The returned dict matches `parse_phits_3d_tally` (``x``, ``y``, ``z``, ``dose``)
+    plus ``err`` and ``meta``.
+    """
+    mode = "r" if mmap else None
+    dose = np.load(os.path.join(cube_dir, "dose.npy"), mmap_mode=mode)
+    err = np.load(os.path.join(cube_dir, "err.npy"), mmap_mode=mode)
+    with open(os.path.join(cube_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return {
+        "x": np.load(os.path.join(cube_dir, "x.npy")),
+        "y": np.load(os.path.join(cube_dir, "y.npy")),
+        "z": np.load(os.path.join(cube_dir, "z.npy")),
+        "dose": dose.transpose(2, 1, 0),
+        "err": err.transpose(2, 1, 0),
+        "meta": meta,
+    }
+
+
+def default_cube_dir(path: str, cache_root: str) -> str:
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_root, f"{os.path.basename(path)}-{key}.cube")
+
+
+def open_cube(path: str, cache_root: str, dtype: str = "float64", out_dir: Optional[str] = None,
+              progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Memory-map the cube for ``path``, converting it first if missing or stale."""
+    out_dir = out_dir or default_cube_dir(path, cache_root)
+    meta_path = os.path.join(out_dir, "meta.json")
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            st = os.stat(path)
+            if (meta.get("version") == CUBE_VERSION and meta.get("size") == st.st_size
+                    and meta.get("mtime_ns") == st.st_mtime_ns and meta.get("dtype") == str(np.dtype(dtype))):
+                return load_cube(out_dir)
+        except (OSError, ValueError):
+            pass
+        os.remove(meta_path)
+    convert_tally_to_cube(path, out_dir, dtype=dtype, progress=progress)
+    return load_cube(out_dir)
+
+
+def _axis_index(centres: np.ndarray, q: np.ndarray, method: str):
+    # Lower/upper neighbour indices, weight of the upper one and in-range mask
+    n = centres.size
+    if n == 1:
+        zeros = np.zeros(q.shape, dtype=np.intp)
+        return zeros, zeros, np.zeros(q.shape), np.ones(q.shape, dtype=bool)
+    j = np.clip(np.searchsorted(centres, q, side="right") - 1, 0, n - 2)
+    lo = centres[j]
+    w = (q - lo) / (centres[j + 1] - lo)
+    if method == "nearest":
+        # Same voxel as argmin(|centres - q|), clamped to the mesh; ties go to the lower bin
+        j = j + (w > 0.5)
+        return j, j, np.zeros(q.shape), np.ones(q.shape, dtype=bool)
+    inside = (w >= -1e-9) & (w <= 1.0 + 1e-9)
+    return j, j + 1, np.clip(w, 0.0, 1.0), inside
+
+
+def sample_cube(cube: dict, points, method: str = "linear") -> np.ndarray:
+    """Dose of ``cube`` at ``points`` (``(..., 3)`` x/y/z in cm), all in one gather.
+
+    ``method='linear'`` interpolates trilinearly between bin centres (NaN outside
+    them); ``'nearest'`` snaps to the closest voxel like the legacy ``argmin``.
+    Works on in-memory and memory-mapped cubes alike.
+    """
+    if method not in INTERP_METHODS:
+        raise ValueError(f"unknown interpolation method: {method} (expected one of {', '.join(INTERP_METHODS)})")
+    pts = np.asarray(points, dtype=float)
+    if pts.shape[-1:] != (3,):
+        raise ValueError(f"points must have shape (..., 3), got {pts.shape}")
+    parts = []
+    for k, ax in enumerate("xyz"):
+        centres = np.asarray(cube[ax], dtype=float)
+        if np.any(np.diff(centres) <= 0):
+            raise ValueError(f"{ax} bin centres must be strictly increasing")
+        parts.append(_axis_index(centres, pts[..., k], method))
+    (x0, x1, wx, inx), (y0, y1, wy, iny), (z0, z1, wz, inz) = parts
+    dose = cube["dose"]
+    if method == "nearest":
+        return np.asarray(dose[x0, y0, z0], dtype=float)
+    out = np.zeros(pts.shape[:-1])
+    for ix, fx in ((x0, 1.0 - wx), (x1, wx)):
+        for iy, fy in ((y0, 1.0 - wy), (y1, wy)):
+            for iz, fz in ((z0, 1.0 - wz), (z1, wz)):
+                w = fx * fy * fz
+                if np.any(w):
+                    out += w * dose[ix, iy, iz]
+    out[~(inx & iny & inz)] = np.nan
+    return out
+
+
+def sample_grid(cube: dict, x, y, z, method: str = "linear") -> np.ndarray:
+    """Dose of ``cube`` on the rectilinear grid ``x`` × ``y`` × ``z`` (cm), shape ``(len(x), len(y), len(z))``.
+
+    Same values as `sample_cube` on the meshgrid, computed separably: only the
+    covering block of the cube is read and interpolated one axis at a time.
+    """
+    if method not in INTERP_METHODS:
+        raise ValueError(f"unknown interpolation method: {method} (expected one of {', '.join(INTERP_METHODS)})")
+    parts = []
+    for ax, q in zip("xyz", (x, y, z)):
+        centres = np.asarray(cube[ax], dtype=float)
+        if np.any(np.diff(centres) <= 0):
+            raise ValueError(f"{ax} bin centres must be strictly increasing")
+        parts.append(_axis_index(centres, np.atleast_1d(np.asarray(q, dtype=float)), method))
+    lo = [int(min(p[0].min(), p[1].min())) if p[0].size else 0 for p in parts]
+    hi = [int(max(p[0].max(), p[1].max())) + 1 if p[0].size else 0 for p in parts]
+    out = np.asarray(cube["dose"][lo[0]:hi[0], lo[1]:hi[1], lo[2]:hi[2]], dtype=float)
+    for k, (i0, i1, w, _) in enumerate(parts):
+        a = np.take(out, i0 - lo[k], axis=k)
+        if method == "linear":
+            shape = [1, 1, 1]
+            shape[k] = w.size
+            w = w.reshape(shape)
+            a = a * (1.0 - w) + np.take(out, i1 - lo[k], axis=k) * w
+        out = a
+    if method == "linear":
+        inside = parts[0][3][:, None, None] & parts[1][3][None, :, None] & parts[2][3][None, None, :]
+        out[~inside] = np.nan
+    return out
+
+
+def extract_profiles(cube: dict, axes, centres, method: str = "linear") -> list:
+    """Axis-aligned profiles through ``centres`` (``(L, 3)`` x/y/z in cm), one per entry of ``axes``.
+
+    ``axes`` is one of ``'x'``/``'y'``/``'z'`` per line (or a single letter for all).
+    Each profile is sampled at the bin centres of its own axis, so the centre's
+    coordinate along that axis is ignored; e.g. a PDD along y and OCRs along x/z
+    at every measured depth come out of one `sample_cube` call.
+    Returns ``[{'axis', 'centre', 'pos', 'dose'}, ...]`` in request order.
+    """
+    centres = np.atleast_2d(np.asarray(centres, dtype=float))
+    if centres.shape[-1] != 3:
+        raise ValueError(f"centres must have shape (L, 3), got {centres.shape}")
+    axes = [axes] * len(centres) if isinstance(axes, str) else list(axes)
+    if len(axes) != len(centres):
+        raise ValueError(f"got {len(axes)} axes for {len(centres)} centres")
+    lines = []
+    for ax, c in zip(axes, centres):
+        if ax not in ("x", "y", "z"):
+            raise ValueError(f"unknown profile axis: {ax}")
+        pts = np.repeat(c[None, :], len(cube[ax]), axis=0)
+        pts[:, "xyz".index(ax)] = cube[ax]
+        lines.append(pts)
+    dose = sample_cube(cube, np.concatenate(lines) if lines else np.empty((0, 3)), method)
+    out, start = [], 0
+    for ax, c, pts in zip(axes, centres, lines):
+        out.append({"axis": ax, "centre": tuple(float(v) for v in c),
+                    "pos": pts[:, "xyz".index(ax)], "dose": dose[start:start + len(pts)]})
+        start += len(pts)
+    return out
+
+
+def extract_lines(cube: dict, starts, ends, num: Optional[int] = None, method: str = "linear") -> dict:
+    """Profiles along arbitrary segments ``starts[i] -> ends[i]`` (``(L, 3)`` in cm) in one gather.
+
+    Every segment is sampled at ``num`` evenly spaced points (default: the finest
+    voxel pitch over the longest segment). Returns ``pos`` (``(L, num)``, cm from
+    the start), ``points`` (``(L, num, 3)``) and ``dose`` (``(L, num)``).
+    """
+    starts = np.atleast_2d(np.asarray(starts, dtype=float))
+    ends = np.atleast_2d(np.asarray(ends, dtype=float))
+    if starts.shape != ends.shape or starts.shape[-1] != 3:
+        raise ValueError(f"starts/ends must both have shape (L, 3), got {starts.shape} and {ends.shape}")
+    lengths = np.linalg.norm(ends - starts, axis=-1)
+    if num is None:
+        pitches = [np.min(np.diff(cube[ax])) for ax in "xyz" if len(cube[ax]) > 1]
+        longest = float(lengths.max()) if lengths.size else 0.0
+        num = int(np.ceil(longest / min(pitches))) + 1 if pitches else 2
+    if num < 2:
+        raise ValueError("num must be at least 2")
+    t = np.linspace(0.0, 1.0, num)
+    points = starts[:, None, :] + t[None, :, None] * (ends - starts)[:, None, :]
+    return {"pos": lengths[:, None] * t, "points": points, "dose": sample_cube(cube, points, method)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Convert a PHITS T-Deposit xyz tally into a memory-mappable cube')
+    ap.add_argument('phits_file')
+    ap.add_argument('--out-dir', type=str, default=None, help='cube directory (default: <phits_file>.cube)')
+    ap.add_argument('--float32', action='store_true', help='store dose/err as float32 (half the size)')
+    ap.add_argument('--chunk-mb', type=float, default=DEFAULT_CHUNK_BYTES / (1024 * 1024), help='read buffer size')
+    args = ap.parse_args()
+
+    out_dir = args.out_dir or (args.phits_file + '.cube')
+    try:
+        convert_tally_to_cube(args.phits_file, out_dir, dtype='float32' if args.float32 else 'float64',
+                              chunk_bytes=int(args.chunk_mb * 1024 * 1024), progress=print_progress)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    cube = load_cube(out_dir)
+    nx, ny, nz = cube['dose'].shape
+    print(f"Cube saved: {out_dir} ({nx}x{ny}x{nz}, {cube['meta']['dtype']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+"""2D PHITS mesh tallies (``axis = xz``/``yz``/``xy``) and whole-plane comparisons.
+
+PHITS writes a 2D map of an xyz mesh as ANGEL ``hc:`` blocks, one per page
+(slab of the third axis): ``x:``/``y:`` name the plotted PHITS axes and the
+values follow row by row, rows running down the plot's vertical axis. The
+matching ``*_err.out`` file has the same layout with relative errors.
+`read_plane_tally` returns such a map as a cube dict (bin-centre axes ``x``,
+``y``, ``z`` in cm, increasing, and ``dose[x, y, z]``) whose slab axis holds
+one bin per page, so planes go straight into `dose_cube.sample_grid`,
+`dose_cube.extract_profiles` and `gamma3d.gamma_3d`.
+
+`compare_planes` computes the 2D gamma and dose difference of two maps (the
+evaluated map may have any grid; it is sampled bilinearly) and
+`compare_plane_profiles` checks measured profiles lying in the plane against
+lines extracted from it, all in one gather.
+
+Usage:
+    python src/dose_plane.py <ref_plane.out> [<eval_plane.out>] [--measured CSV ...] [--dd 3] [--dta 3]
+        [--cutoff 10] [--local] [--norm max|none] [--max-err R] [--depth-axis y] [--interp linear|nearest]
+        [--out gamma.npz] [--summary summary.csv]
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+from typing import Optional, Sequence
+
+import numpy as np
+
+from dose_cube import INTERP_METHODS, extract_profiles, sample_grid
+from gamma1d import gamma_1d, pass_rate
+from gamma3d import gamma_3d
+from measured_store import TANK_TO_PHITS_AXIS, parse_measured_name
+from profile_io import index_tallies, read_measured_csv, read_tally_block
+
+_F = rb"([\-\+]?\d+(?:\.\d*)?(?:[Ee][\-\+]?\d+)?)"
+# `hc:  y =   9.875     to  -9.875     by  0.25     ; x =  -9.875     to   9.875     by  0.25     ;`
+_HC_RE = re.compile(rb"^hc:[ \t]*y[ \t]*=[ \t]*" + _F + rb"[ \t]+to[ \t]+" + _F + rb"[ \t]+by[ \t]+" + _F +
+                    rb"[ \t]*;[ \t]*x[ \t]*=[ \t]*" + _F + rb"[ \t]+to[ \t]+" + _F + rb"[ \t]+by[ \t]+" + _F,
+                    re.MULTILINE)
+# ANGEL axis titles: `x: z [cm]`, `y: x [cm]`
+_LABEL_RE = re.compile(rb"^([xy]):[ \t]*([xyz])[ \t]*\[", re.MULTILINE)
+# `#   y = (  -1.0000E-01  -   1.0000E-01  )` slab of the page
+_SLAB_RE = re.compile(rb"^#[ \t]*([xyz])[ \t]*=[ \t]*\([ \t]*" + _F + rb"[ \t]*-[ \t]*" + _F, re.MULTILINE)
+_DATA_END_RE = re.compile(rb"^[ \t]*(?:[^ \t\r\n0-9+\-.]|\r?$)", re.MULTILINE)
+SUMMARY_FIELDS = ["measured_file", "axis", "cx", "cy", "cz", "points", "gamma_pass_percent", "gamma_mean",
+                  "rmse_percent", "error"]
+
+
+def _hc_axis(start: bytes, stop: bytes, step: bytes) -> np.ndarray:
+    a, b, d = float(start), float(stop), abs(float(step))
+    n = int(round(abs(b - a) / d)) + 1 if d > 0 else 1
+    return np.linspace(a, b, n)
+
+
+def _is_plane(block: dict) -> bool:
+    axis = str(block["params"].get("axis", "")).split()
+    return (str(block["params"].get("mesh", "")).split()[:1] == ["xyz"] and len(axis) == 1
+            and len(axis[0]) == 2 and set(axis[0]) <= set("xyz") and axis[0][0] != axis[0][1])
+
+
+def _read_page(buf: bytes, start: int, end: int, source: str) -> dict:
+    labels = {m.group(1).decode(): m.group(2).decode() for m in _LABEL_RE.finditer(buf, start, end)}
+    hc = _HC_RE.search(buf, start, end)
+    if hc is None or len(labels) != 2 or labels["x"] == labels["y"]:
+        raise ValueError(f"{source}: no 2D map (hc: block with x:/y: axis titles) on page")
+    rows = _hc_axis(*hc.group(1, 2, 3))
+    cols = _hc_axis(*hc.group(4, 5, 6))
+    line_end = buf.find(b"\n", hc.end(), end)
+    stop = _DATA_END_RE.search(buf, line_end + 1, end) if line_end >= 0 else None
+    values = buf[line_end + 1: stop.start() if stop else end].split() if line_end >= 0 else []
+    if len(values) < rows.size * cols.size:
+        raise ValueError(f"{source}: map has {len(values)} values, expected {rows.size}x{cols.size}")
+    data = np.array(values[:rows.size * cols.size], dtype=float).reshape(rows.size, cols.size)
+    slab = {}
+    for m in _SLAB_RE.finditer(buf, start, hc.start()):
+        slab.setdefault(m.group(1).decode(), (float(m.group(2)), float(m.group(3))))
+    return {"row": labels["y"], "col": labels["x"], "rows": rows, "cols": cols, "data": data, "slab": slab}
+
+
+def _read_plane_file(path: str, which: int) -> dict:
+    blocks = [b for b in index_tallies(path) if _is_plane(b)]
+    try:
+        block = blocks[which]
+    except IndexError:
+        raise ValueError(f"{path}: no 2D xyz mesh tally (axis = xz/yz/xy) found")
+    buf = read_tally_block(path, block)
+    pages = [p - block["start"] for p in block["pages"]] + [len(buf)]
+    if len(pages) < 2:
+        raise ValueError(f"{path}: 2D tally has no pages")
+    maps = [_read_page(buf, a, b, path) for a, b in zip(pages[:-1], pages[1:])]
+    row, col = maps[0]["row"], maps[0]["col"]
+    slab_axis = ({"x", "y", "z"} - {row, col}).pop()
+    for m in maps[1:]:
+        if (m["row"], m["col"]) != (row, col) or m["data"].shape != maps[0]["data"].shape:
+            raise ValueError(f"{path}: pages of the 2D tally have different layouts")
+    params = block["params"]
+    if len(maps) != params.get(f"n{slab_axis}", len(maps)):
+        raise ValueError(f"{path}: {len(maps)} pages for n{slab_axis} = {params[f'n{slab_axis}']} "
+                         "(energy/particle-resolved 2D tallies are not supported)")
+    bounds = []
+    for k, m in enumerate(maps):
+        if slab_axis in m["slab"]:
+            bounds.append(m["slab"][slab_axis])
+        else:
+            lo, hi = params.get(f"{slab_axis}min"), params.get(f"{slab_axis}max")
+            if lo is None or hi is None:
+                raise ValueError(f"{path}: cannot determine the {slab_axis} slab of page {k + 1}")
+            n = len(maps)
+            bounds.append((lo + (hi - lo) * k / n, lo + (hi - lo) * (k + 1) / n))
+    bounds = np.array(bounds, dtype=float).reshape(-1, 2)
+
+    # (pages, rows, cols) -> dose[x, y, z], every axis increasing
+    stack = np.stack([m["data"] for m in maps])
+    centres = {slab_axis: bounds.mean(axis=1), row: maps[0]["rows"], col: maps[0]["cols"]}
+    order = [slab_axis, row, col]
+    for k, ax in enumerate(order):
+        if centres[ax].size > 1 and centres[ax][-1] < centres[ax][0]:
+            centres[ax] = centres[ax][::-1]
+            stack = np.flip(stack, axis=k)
+            if ax == slab_axis:
+                bounds = bounds[::-1]
+    dose = np.ascontiguousarray(np.transpose(stack, [order.index(ax) for ax in "xyz"]))
+    return {"x": centres["x"], "y": centres["y"], "z": centres["z"], "dose": dose,
+            "plane": (row, col), "slab_axis": slab_axis, "slab": bounds,
+            "unit": str(params.get("unit", "")), "source": path}
+
+
+def error_file(path: str) -> str:
+    """``track-xz-water.out`` -> ``track-xz-water_err.out`` (PHITS relative-error map)."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_err{ext}"
+
+
+def read_plane_tally(path: str, err_path: Optional[str] = None, which: int = -1) -> dict:
+    """Read a 2D mesh tally (last matching block by default) as a cube dict.
+
+    Keys: ``x``, ``y``, ``z`` (bin centres, cm, increasing), ``dose[x, y, z]``
+    (one bin per page along ``slab_axis``), ``plane`` (PHITS axes of the map's
+    rows and columns, e.g. ``('x', 'z')``), ``slab`` (``(pages, 2)`` slab
+    bounds), ``unit``, ``source`` and ``err`` (relative errors, same shape, or
+    ``None``). ``err_path`` defaults to the ``*_err`` sibling when it exists.
+    """
+    plane = _read_plane_file(path, which)
+    if err_path is None and os.path.isfile(error_file(path)):
+        err_path = error_file(path)
+    plane["err"] = None
+    if err_path:
+        err = _read_plane_file(err_path, which)
+        if err["dose"].shape != plane["dose"].shape or not all(np.allclose(err[ax], plane[ax]) for ax in "xyz"):
+            raise ValueError(f"{err_path}: error map grid does not match {path}")
+        plane["err"] = err["dose"]
+    return plane
+
+
+def plane_map(plane: dict, values: Optional[np.ndarray] = None) -> np.ndarray:
+    """2D view ``[row, col]`` (axes ``plane['plane']``) of a single-slab plane or of ``values`` on its grid."""
+    a = plane["dose"] if values is None else values
+    k = "xyz".index(plane["slab_axis"])
+    if a.shape[k] != 1:
+        raise ValueError(f"{plane['source']}: map has {a.shape[k]} slabs")
+    row, col = plane["plane"]
+    m = np.squeeze(a, axis=k)
+    return m if "xyz".index(row) < "xyz".index(col) else m.T
+
+
+def compare_planes(ref: dict, evl: dict, dd_percent: float, dta_mm: float, cutoff_percent: float = 10.0,
+                   local: bool = False, norm: str = "max", max_err: Optional[float] = None,
+                   max_gamma: float = 2.0, upsample: Optional[int] = None, workers: Optional[int] = None) -> dict:
+    """2D gamma and dose difference of ``evl`` against ``ref`` on the reference grid.
+
+    Both maps must lie in the same plane (the slab positions may differ).
+    ``norm='max'`` scales ``evl`` to the reference maximum, ``'none'`` compares
+    absolute values. With ``max_err``, reference bins whose relative error
+    (or the evaluated map's error at that point) exceeds it are not evaluated.
+    Returns ``gamma`` and ``diff`` (evaluated minus reference, % of the
+    reference maximum; NaN outside the evaluated map) on the cube grid of
+    ``ref``, plus ``pass_rate``, ``gamma_mean``, ``evaluated`` and ``max_abs_diff``.
+    """
+    if set(ref["plane"]) != set(evl["plane"]):
+        raise ValueError(f"cannot compare a {''.join(ref['plane'])} map with a {''.join(evl['plane'])} map")
+    if norm not in ("max", "none"):
+        raise ValueError(f"unknown normalisation: {norm}")
+    dose = np.asarray(ref["dose"], dtype=float)
+    global_norm = float(np.nanmax(dose))
+    scale = global_norm / float(np.nanmax(evl["dose"])) if norm == "max" else 1.0
+    grid = [ref[ax] for ax in "xyz"]
+    e = sample_grid(evl, *grid) * scale
+    mask = np.zeros(dose.shape, dtype=bool)
+    if max_err is not None:
+        if ref.get("err") is not None:
+            mask |= np.asarray(ref["err"]) > max_err
+        if evl.get("err") is not None:
+            mask |= sample_grid(dict(evl, dose=evl["err"]), *grid, method="nearest") > max_err
+    masked = dict(ref, dose=np.where(mask, np.nan, dose))
+    gamma = gamma_3d(masked, evl, dd_percent, dta_mm, cutoff_percent, local=local, global_norm=global_norm,
+                     eval_scale=scale, max_gamma=max_gamma, upsample=upsample, workers=workers)
+    with np.errstate(invalid="ignore"):
+        diff = (e - dose) / global_norm * 100.0
+    evaluated = int(np.count_nonzero(~np.isnan(gamma)))
+    return {"gamma": gamma, "diff": diff, "pass_rate": pass_rate(gamma), "evaluated": evaluated,
+            "gamma_mean": float(np.nanmean(gamma)) if evaluated else float("nan"),
+            "max_abs_diff": float(np.nanmax(np.abs(diff))) if np.isfinite(diff).any() else float("nan")}
+
+
+def measured_line(path: str, header: Sequence[str], depth_axis: str = "y") -> tuple:
+    """PHITS axis and line centre of a measured profile (header tank axis first, then the file name).
+
+    Tank X/Y map to PHITS x/z and tank Z (PDD) to ``depth_axis``; OCRs sit at
+    the depth from the file name, PDDs on the central axis.
+    """
+    m = re.match(r'^"?([XYZ])\s*\(', header[0].strip(), re.IGNORECASE) if header else None
+    tank = m.group(1).lower() if m else None
+    meta = parse_measured_name(path) or {}
+    centre = [0.0, 0.0, 0.0]
+    if tank == "z" or meta.get("scan") == "pdd":
+        return depth_axis, tuple(centre)
+    axis = TANK_TO_PHITS_AXIS.get(tank) or meta.get("axis")
+    if axis is None or axis == depth_axis:
+        raise ValueError(f"{path}: cannot determine the profile axis")
+    if meta.get("depth_cm") is None:
+        raise ValueError(f"{path}: cannot determine the measurement depth from the file name")
+    centre["xyz".index(depth_axis)] = meta["depth_cm"]
+    return axis, tuple(centre)
+
+
+def compare_plane_profiles(plane: dict, profiles: Sequence[dict], dd_percent: float, dta_mm: float,
+                           cutoff_percent: float = 10.0, local: bool = False, method: str = "linear") -> list:
+    """Gamma/RMSE of measured profiles against lines of ``plane``, extracted in one gather.
+
+    Each profile is ``{'axis', 'centre' (x, y, z cm), 'pos' (cm), 'dose'}``; the
+    line must run along an axis of the plane and its slab coordinate must lie
+    inside the tallied slabs. Both profiles are normalised to their maximum.
+    Returns one dict per profile (``axis``, ``centre``, ``points``,
+    ``gamma_pass_percent``, ``gamma_mean``, ``rmse_percent``, ``gamma``) or
+    ``{'error': ...}`` for lines outside the plane.
+    """
+    if method not in INTERP_METHODS:
+        raise ValueError(f"unknown interpolation method: {method}")
+    slab = plane["slab_axis"]
+    lo, hi = float(np.min(plane["slab"])), float(np.max(plane["slab"]))
+    ok = []
+    for p in profiles:
+        c = p["centre"]["xyz".index(slab)]
+        if p["axis"] not in plane["plane"]:
+            ok.append(f"profile along {p['axis']} does not lie in the {''.join(plane['plane'])} plane")
+        elif not lo - 1e-9 <= c <= hi + 1e-9:
+            ok.append(f"{slab} = {c:g} cm is outside the tallied slab {lo:g} to {hi:g} cm")
+        else:
+            ok.append(None)
+    inside = [p for p, err in zip(profiles, ok) if err is None]
+    lines = iter(extract_profiles(plane, [p["axis"] for p in inside], [p["centre"] for p in inside], method)
+                 if inside else [])
+    out = []
+    for p, err in zip(profiles, ok):
+        row = {"axis": p["axis"], "centre": tuple(p["centre"])}
+        if err is not None:
+            out.append(dict(row, error=err))
+            continue
+        line = next(lines)
+        keep = np.isfinite(line["dose"])
+        pos_e, dose_e = line["pos"][keep], line["dose"][keep]
+        order = np.argsort(p["pos"])
+        pos_r, dose_r = np.asarray(p["pos"], float)[order], np.asarray(p["dose"], float)[order]
+        if not dose_e.size:
+            out.append(dict(row, error="line lies outside the map"))
+            continue
+        if np.max(dose_e) <= 0 or np.max(dose_r) <= 0:
+            out.append(dict(row, error="no dose along the line"))
+            continue
+        dose_r, dose_e = dose_r / np.max(dose_r), dose_e / np.max(dose_e)
+        g = gamma_1d(pos_r * 10.0, dose_r, pos_e * 10.0, dose_e, dd_percent, dta_mm, cutoff_percent, local)
+        within = (pos_r >= pos_e[0]) & (pos_r <= pos_e[-1])
+        rmse = float(np.sqrt(np.mean((np.interp(pos_r[within], pos_e, dose_e) - dose_r[within]) ** 2)) * 100.0) \
+            if within.any() else float("nan")
+        out.append(dict(row, points=int(np.count_nonzero(~np.isnan(g))), gamma=g,
+                        gamma_pass_percent=pass_rate(g),
+                        gamma_mean=float(np.nanmean(g)) if np.isfinite(g).any() else float("nan"),
+                        rmse_percent=rmse))
+    return out
+
+
+def _describe(plane: dict) -> str:
+    row, col = plane["plane"]
+    slab = plane["slab_axis"]
+    lo, hi = float(np.min(plane["slab"])), float(np.max(plane["slab"]))
+    return (f"{row}{col} map {len(plane[row])}x{len(plane[col])} ({row} {plane[row][0]:g}..{plane[row][-1]:g}, "
+            f"{col} {plane[col][0]:g}..{plane[col][-1]:g} cm; {slab} {lo:g}..{hi:g} cm, {len(plane[slab])} slab(s))"
+            f"{', with error map' if plane['err'] is not None else ''}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='2D gamma / dose difference for PHITS xz/yz/xy mesh maps')
+    ap.add_argument('ref', help='reference 2D tally (e.g. track-xz-water.out)')
+    ap.add_argument('eval', nargs='?', default=None, help='evaluated 2D tally in the same plane')
+    ap.add_argument('--measured', action='append', default=[], help='measured profile CSV in the plane (repeatable)')
+    ap.add_argument('--dd', type=float, default=3.0, help='dose difference (%%)')
+    ap.add_argument('--dta', type=float, default=3.0, help='distance to agreement (mm)')
+    ap.add_argument('--cutoff', type=float, default=10.0, help='lower dose cutoff (%% of the reference maximum)')
+    ap.add_argument('--local', action='store_true', help='local instead of global dose difference')
+    ap.add_argument('--norm', choices=('max', 'none'), default='max',
+                    help='max: scale the evaluated map to the reference maximum; none: compare absolute values')
+    ap.add_argument('--max-err', type=float, default=None,
+                    help='skip bins whose relative error (from the *_err maps) exceeds this value')
+    ap.add_argument('--max-gamma', type=float, default=2.0, help='search radius in units of DTA')
+    ap.add_argument('--depth-axis', choices=('x', 'y', 'z'), default='y', help='PHITS beam (depth) axis')
+    ap.add_argument('--interp', choices=INTERP_METHODS, default='linear', help='profile extraction from the map')
+    ap.add_argument('--out', type=str, default=None, help='save gamma and dose-difference maps (.npz)')
+    ap.add_argument('--summary', type=str, default=None, help='save the measured-profile results (.csv)')
+    args = ap.parse_args()
+    if args.eval is None and not args.measured:
+        ap.error('give an evaluated map and/or --measured profiles')
+
+    try:
+        ref = read_plane_tally(args.ref)
+        evl = read_plane_tally(args.eval) if args.eval else None
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Reference: {_describe(ref)}")
+    mode = 'local' if args.local else 'global'
+    failed = False
+
+    if evl is not None:
+        print(f"Evaluated: {_describe(evl)}")
+        try:
+            res = compare_planes(ref, evl, args.dd, args.dta, args.cutoff, local=args.local, norm=args.norm,
+                                 max_err=args.max_err, max_gamma=args.max_gamma)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Gamma {args.dd:g}%/{args.dta:g}mm {mode}: pass rate {res['pass_rate']:.2f} % "
+              f"({res['evaluated']} bins, cutoff {args.cutoff:g}%), mean {res['gamma_mean']:.3f}, "
+              f"max |dose diff| {res['max_abs_diff']:.2f} %")
+        if args.out:
+            os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+            np.savez_compressed(args.out, x=ref['x'], y=ref['y'], z=ref['z'], gamma=res['gamma'], diff=res['diff'])
+            print(f"Gamma/difference maps saved: {args.out}")
+
+    profiles, rows = [], []
+    for path in args.measured:
+        try:
+            table = read_measured_csv(path)
+            axis, centre = measured_line(path, table['header'], args.depth_axis)
+        except (OSError, ValueError) as e:
+            rows.append({'measured_file': path, 'error': str(e)})
+            continue
+        profiles.append({'axis': axis, 'centre': centre, 'pos': table['pos'], 'dose': table['dose']})
+        rows.append({'measured_file': path})
+    results = iter(compare_plane_profiles(ref, profiles, args.dd, args.dta, args.cutoff, args.local, args.interp)
+                   if profiles else [])
+    for row in rows:
+        if 'error' not in row:
+            r = next(results)
+            row.update({k: v for k, v in r.items() if k in SUMMARY_FIELDS})
+            row.update(zip(('cx', 'cy', 'cz'), r['centre']))
+        if row.get('error'):
+            failed = True
+            print(f"{row['measured_file']}: Error: {row['error']}", file=sys.stderr)
+        else:
+            print(f"{row['measured_file']}: {row['axis']} profile, gamma {args.dd:g}%/{args.dta:g}mm {mode} "
+                  f"pass rate {row['gamma_pass_percent']:.2f} % ({row['points']} points), "
+                  f"RMSE {row['rmse_percent']:.2f} %")
+    if args.summary and rows:
+        os.makedirs(os.path.dirname(os.path.abspath(args.summary)), exist_ok=True)
+        with open(args.summary, 'w', encoding='utf-8', newline='') as f:
+            w = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+            w.writeheader()
+            for row in rows:
+                w.writerow({k: ('' if row.get(k) is None else row.get(k)) for k in SUMMARY_FIELDS})
+        print(f"Profile summary saved: {args.summary}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Tiled 3D gamma between dose cubes (PHITS xyz tallies, cached cubes, RTDOSE-like grids).
+
+The reference grid is split into tiles of ``tile**3`` voxels. For every tile
+the evaluation grid is sampled trilinearly (`dose_cube.sample_grid`) on the
+tile's lattice upsampled ``upsample`` times (default: spacing <= DTA/3) and padded by the search radius
+``max_gamma * dta``, so memory is bounded by one padded tile per worker and
+the evaluation grid may have any spacing/extent. The regular lattice is the
+spatial index: candidate evaluation points of a reference voxel are the grid
+offsets inside the search sphere, visited nearest first, and a tile stops as
+soon as no voxel in it can improve. Tiles run on a thread pool (NumPy releases
+the GIL in the per-offset array operations) and tiles below the dose cutoff
+are skipped.
+
+Dose grids are dicts with bin-centre axes ``x``, ``y``, ``z`` (cm, increasing)
+and ``dose[x, y, z]`` as returned by `dose_cube.read_xyz_cube`/`open_cube` or
+`Comp_measured_phits_v10.parse_phits_3d_tally`. `load_dose_grid` also reads
+``.npz`` grids (same keys) and DICOM RTDOSE files (needs pydicom).
+
+Usage:
+    python src/gamma3d.py <ref> <eval> [--dd 3] [--dta 3] [--cutoff 10] [--local] [--norm max|none]
+        [--upsample K] [--tile 32] [--workers N] [--eval-offset DX DY DZ] [--cube-cache DIR] [--out gamma.npz]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from dose_cube import load_cube, open_cube, print_progress, read_xyz_cube, sample_grid
+from gamma1d import pass_rate
+
+
+def _load_rtdose(path: str) -> dict:
+    try:
+        import pydicom  # type: ignore
+    except ModuleNotFoundError:
+        raise ValueError("RTDOSE files need pydicom (pip install pydicom); convert the grid to .npz instead")
+    ds = pydicom.dcmread(path)
+    orient = [float(v) for v in getattr(ds, "ImageOrientationPatient", [1, 0, 0, 0, 1, 0])]
+    if not np.allclose(orient, [1, 0, 0, 0, 1, 0]):
+        raise ValueError(f"{path}: only axis-aligned RTDOSE grids are supported (ImageOrientationPatient={orient})")
+    frames = np.asarray(ds.pixel_array, dtype=float) * float(getattr(ds, "DoseGridScaling", 1.0))
+    if frames.ndim == 2:
+        frames = frames[None]
+    x0, y0, z0 = (float(v) for v in ds.ImagePositionPatient)
+    dy, dx = (float(v) for v in ds.PixelSpacing)
+    offsets = [float(v) for v in getattr(ds, "GridFrameOffsetVector", [0.0] * frames.shape[0])]
+    # mm -> cm; pixel_array is (frames, rows, cols) = (z, y, x)
+    return {"x": (x0 + dx * np.arange(frames.shape[2])) / 10.0,
+            "y": (y0 + dy * np.arange(frames.shape[1])) / 10.0,
+            "z": (z0 + np.asarray(offsets)) / 10.0,
+            "dose": frames.transpose(2, 1, 0)}
+
+
+def _increasing(grid: dict) -> dict:
+    # Flip axes stored in decreasing order (RTDOSE frame offsets, exported arrays)
+    dose = grid["dose"]
+    out = dict(grid)
+    for k, ax in enumerate("xyz"):
+        c = np.asarray(grid[ax], dtype=float)
+        if c.size > 1 and c[-1] < c[0]:
+            c = c[::-1]
+            dose = np.flip(dose, axis=k)
+        out[ax] = c
+    out["dose"] = dose
+    return out
+
+
+def load_dose_grid(path: str, cache_root: Optional[str] = None, dtype: str = "float64",
+                   progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Open a dose grid: cube directory, ``.npz`` (``x``/``y``/``z``/``dose``), RTDOSE ``.dcm`` or PHITS xyz tally.
+
+    PHITS tallies are memory-mapped through the cube cache when ``cache_root``
+    is given and streamed into memory otherwise.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if os.path.isdir(path):
+        grid = load_cube(path)
+    elif ext == ".npz":
+        with np.load(path) as z:
+            missing = [k for k in ("x", "y", "z", "dose") if k not in z]
+            if missing:
+                raise ValueError(f"{path}: missing arrays {', '.join(missing)}")
+            grid = {k: z[k] for k in ("x", "y", "z", "dose")}
+    elif ext == ".dcm":
+        grid = _load_rtdose(path)
+    elif cache_root:
+        grid = open_cube(path, cache_root, dtype=dtype, progress=progress)
+    else:
+        grid = read_xyz_cube(path, dtype=dtype, progress=progress)
+    shape = tuple(len(grid[ax]) for ax in "xyz")
+    if tuple(grid["dose"].shape) != shape:
+        raise ValueError(f"{path}: dose shape {tuple(grid['dose'].shape)} does not match axes {shape}")
+    return _increasing(grid)
+
+
+def _spacing(c: np.ndarray, ax: str) -> float:
+    if c.size < 2:
+        return np.inf
+    d = np.diff(c)
+    if np.any(d <= 0) or not np.allclose(d, d[0], rtol=1e-6, atol=1e-9):
+        raise ValueError(f"gamma_3d: reference {ax} axis must be uniform and increasing")
+    return float(d[0]) * 10.0  # mm
+
+
+def _tiles(shape: Sequence[int], tile: int):
+    for i in range(0, shape[0], tile):
+        for j in range(0, shape[1], tile):
+            for k in range(0, shape[2], tile):
+                yield (slice(i, min(i + tile, shape[0])), slice(j, min(j + tile, shape[1])),
+                       slice(k, min(k + tile, shape[2])))
+
+
+def gamma_3d(ref: dict, evl: dict, dd_percent: float, dta_mm: float, cutoff_percent: float = 10.0,
+             local: bool = False, global_norm: Optional[float] = None, eval_scale: float = 1.0,
+             max_gamma: float = 2.0, upsample: Optional[int] = None, tile: int = 32, workers: Optional[int] = None,
+             progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+    """3D gamma of ``ref`` against ``evl`` on the reference grid, shape ``ref['dose'].shape`` (float32).
+
+    ``ref`` needs uniform axes; ``evl`` may have any increasing axes (sampled
+    trilinearly, scaled by ``eval_scale``; points outside it do not match).
+    Reference voxels below ``cutoff % * global_norm`` (default: reference
+    maximum) are NaN; values above ``max_gamma`` are reported as ``max_gamma``.
+    ``upsample`` defaults to the smallest factor giving a search lattice of at
+    most ``dta / 3``. ``progress(done, total)`` is called once per tile.
+    """
+    if dd_percent <= 0 or dta_mm <= 0:
+        raise ValueError("gamma_3d: dose and distance criteria must be > 0")
+    axes = [np.asarray(ref[ax], dtype=float) for ax in "xyz"]
+    steps = [_spacing(c, ax) for c, ax in zip(axes, "xyz")]
+    dose = ref["dose"]
+    if tuple(dose.shape) != tuple(c.size for c in axes):
+        raise ValueError("gamma_3d: reference dose shape does not match its axes")
+    if global_norm is None:
+        global_norm = float(np.nanmax(dose))
+    threshold = cutoff_percent / 100.0 * global_norm
+
+    # Grid offsets (fine-lattice units) inside the search sphere, nearest first
+    if upsample is None:
+        coarsest = max([s for s in steps if np.isfinite(s)], default=0.0)
+        upsample = int(np.ceil(coarsest / (dta_mm / 3.0) - 1e-9))
+    k = max(int(upsample), 1)
+    radius_mm = max_gamma * dta_mm
+    reach = [int(np.floor(radius_mm / (s / k))) if np.isfinite(s) else 0 for s in steps]
+    grids = np.meshgrid(*[np.arange(-r, r + 1) for r in reach], indexing="ij")
+    dist2 = sum((g * (s / k)) ** 2 if r else 0.0 * g for g, s, r in zip(grids, steps, reach))
+    keep = dist2 <= radius_mm ** 2
+    order = np.argsort(dist2[keep], kind="stable")
+    offsets = np.stack([g[keep][order] for g in grids], axis=1)
+    dists = dist2[keep][order] / dta_mm ** 2
+
+    out = np.full(dose.shape, np.nan, dtype=np.float32)
+
+    def run_tile(sl):
+        r = np.asarray(dose[sl], dtype=float)
+        D = (np.abs(r) if local else np.full(r.shape, global_norm)) * (dd_percent / 100.0)
+        calc = np.isfinite(r) & (r >= threshold) & (D > 0)
+        if not calc.any():
+            return
+        # Evaluation dose on the upsampled tile lattice plus the search halo
+        fine = [c[s.start] + np.arange(-re, (s.stop - s.start - 1) * k + re + 1) * (st / 10.0 / k if np.isfinite(st) else 0.0)
+                for c, s, re, st in zip(axes, sl, reach, steps)]
+        e_fine = sample_grid(evl, *fine) * eval_scale
+        e_flat = e_fine.ravel()
+        F = e_fine.shape
+        # Flat lattice index of every evaluated voxel; offsets become index deltas
+        ii, jj, ll = np.nonzero(calc)
+        base = ((reach[0] + ii * k) * F[1] + reach[1] + jj * k) * F[2] + reach[2] + ll * k
+        deltas = (offsets[:, 0] * F[1] + offsets[:, 1]) * F[2] + offsets[:, 2]
+        rv, dv = r[calc], D[calc]
+        best = np.full(rv.size, max_gamma ** 2)
+        result = np.empty(rv.size)
+        pos = np.arange(rv.size)
+        shell = -1.0
+        with np.errstate(invalid="ignore"):
+            for delta, d2 in zip(deltas, dists):
+                if d2 > shell:
+                    # New distance shell: voxels already at or below it are final
+                    done = best <= d2
+                    if done.any():
+                        result[pos[done]] = best[done]
+                        keep = ~done
+                        pos, base, rv, dv, best = pos[keep], base[keep], rv[keep], dv[keep], best[keep]
+                        if not pos.size:
+                            break
+                    shell = d2
+                g2 = ((e_flat[base + delta] - rv) / dv) ** 2 + d2
+                np.fmin(best, g2, out=best)
+        result[pos] = best
+        g = np.full(r.shape, np.nan)
+        g[calc] = np.sqrt(result)
+        out[sl] = g
+
+    tiles = list(_tiles(dose.shape, max(int(tile), 1)))
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_tile, sl) for sl in tiles]
+        for done, fut in enumerate(as_completed(futures), 1):
+            fut.result()
+            if progress is not None:
+                progress(done, len(tiles))
+    return out
+
+
+def _print_tiles(done: int, total: int) -> None:
+    step = max(total // 10, 1)
+    if done == total or done % step == 0:
+        print(f"  ... {done}/{total} tiles ({100.0 * done / max(total, 1):.0f}%)", file=sys.stderr)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='3D gamma between two dose grids (PHITS xyz tally, cube dir, .npz, RTDOSE)')
+    ap.add_argument('ref', help='reference dose grid')
+    ap.add_argument('eval', help='evaluated dose grid')
+    ap.add_argument('--dd', type=float, default=3.0, help='dose difference (%%)')
+    ap.add_argument('--dta', type=float, default=3.0, help='distance to agreement (mm)')
+    ap.add_argument('--cutoff', type=float, default=10.0, help='lower dose cutoff (%% of the reference maximum)')
+    ap.add_argument('--local', action='store_true', help='local instead of global dose difference')
+    ap.add_argument('--norm', choices=('max', 'none'), default='max',
+                    help='max: scale the evaluated grid to the reference maximum; none: compare absolute doses')
+    ap.add_argument('--max-gamma', type=float, default=2.0, help='search radius in units of DTA')
+    ap.add_argument('--upsample', type=int, default=None,
+                    help='evaluation lattice refinement per reference voxel (default: lattice <= DTA/3)')
+    ap.add_argument('--tile', type=int, default=32, help='tile edge in reference voxels')
+    ap.add_argument('--workers', type=int, default=None, help='threads (default: CPU count)')
+    ap.add_argument('--eval-offset', type=float, nargs=3, default=None, metavar=('DX', 'DY', 'DZ'),
+                    help='shift added to the evaluated grid coordinates (cm)')
+    ap.add_argument('--cube-cache', type=str, default=None, help='memory-map PHITS tallies through this cube cache')
+    ap.add_argument('--float32', action='store_true', help='read PHITS tallies as float32')
+    ap.add_argument('--out', type=str, default=None, help='save the gamma volume (.npz: x, y, z, gamma)')
+    args = ap.parse_args()
+
+    dtype = 'float32' if args.float32 else 'float64'
+    try:
+        ref = load_dose_grid(args.ref, args.cube_cache, dtype, progress=print_progress)
+        evl = load_dose_grid(args.eval, args.cube_cache, dtype, progress=print_progress)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.eval_offset:
+        evl = dict(evl, **{ax: evl[ax] + d for ax, d in zip("xyz", args.eval_offset)})
+    scale = 1.0
+    if args.norm == 'max':
+        scale = float(np.nanmax(ref['dose'])) / float(np.nanmax(evl['dose']))
+
+    t0 = time.perf_counter()
+    try:
+        g = gamma_3d(ref, evl, args.dd, args.dta, args.cutoff, local=args.local, eval_scale=scale,
+                     max_gamma=args.max_gamma, upsample=args.upsample, tile=args.tile, workers=args.workers,
+                     progress=_print_tiles)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - t0
+    evaluated = int(np.count_nonzero(~np.isnan(g)))
+    mode = 'local' if args.local else 'global'
+    print(f"Grid: {'x'.join(str(n) for n in g.shape)} voxels, evaluated {evaluated} (cutoff {args.cutoff:g}%)")
+    print(f"Gamma {args.dd:g}%/{args.dta:g}mm {mode}: pass rate {pass_rate(g):.2f} %, "
+          f"mean {np.nanmean(g) if evaluated else float('nan'):.3f} ({elapsed:.1f} s)")
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        np.savez_compressed(args.out, x=ref['x'], y=ref['y'], z=ref['z'], gamma=g)
+        print(f"Gamma volume saved: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
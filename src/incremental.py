@@ -0,0 +1,74 @@
+"""Make-like up-to-date checks for comparison runs.
+
+A run is identified by its input paths. Its key is the SHA-256 of the input
+file contents plus the effective parameter set; the key, the per-input
+(size, mtime, sha256) memo and the run results are written to a stamp file in
+``<out>/reports/.stamps``. A later run with the same key whose recorded
+artifacts still exist is skipped and reuses the stored results. Unchanged
+inputs (size and mtime) are not rehashed.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Sequence
+
+from profile_cache import sha256_file
+
+# Bump when the comparison pipeline changes its results for identical inputs
+STAMP_VERSION = 1
+
+
+def stamp_path(out_root: str, inputs: Sequence[str]) -> str:
+    ident = "\n".join(os.path.abspath(p) for p in inputs)
+    return os.path.join(out_root, "reports", ".stamps", hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16] + ".json")
+
+
+def read_stamp(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def input_digests(inputs: Sequence[str], previous: Optional[dict] = None) -> Dict[str, dict]:
+    """``{abs_path: {size, mtime_ns, sha256}}``; hashes from ``previous`` are reused while size/mtime match."""
+    memo = (previous or {}).get("inputs", {})
+    out = {}
+    for p in inputs:
+        path = os.path.abspath(p)
+        st = os.stat(path)
+        old = memo.get(path)
+        if old and old.get("size") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            digest = old["sha256"]
+        else:
+            digest = sha256_file(path)
+        out[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+    return out
+
+
+def case_key(digests: Dict[str, dict], params: dict) -> str:
+    """Hash of the input contents (in argument order) and the effective parameters."""
+    payload = {
+        "version": STAMP_VERSION,
+        "inputs": [d["sha256"] for d in digests.values()],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def up_to_date(stamp: Optional[dict], key: str) -> bool:
+    """True if ``stamp`` was written for ``key`` and every recorded artifact still exists."""
+    if not stamp or stamp.get("key") != key:
+        return False
+    return all(os.path.exists(p) for p in stamp.get("outputs", []))
+
+
+def write_stamp(path: str, key: str, digests: Dict[str, dict], result: dict, outputs: Sequence[str]) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stamp = {"key": key, "inputs": digests, "outputs": [p for p in outputs if p], "result": result}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stamp, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return path
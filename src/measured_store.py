@@ -0,0 +1,261 @@
+"""Indexed store of measured water-tank profiles.
+
+A measured directory is ingested once into a single `.npz` file holding every
+profile (sorted position, peak-normalised dose) plus a JSON index of the
+metadata encoded in the file names:
+
+    05x05m10cm-xXlat.csv  -> field 05x05, OCR at 10 cm, PHITS axis x (tank X, lateral)
+    30x30mPDD-zZver.csv   -> field 30x30, PDD along z
+    I150-10.0.csv         -> series I150, OCR at 10.0 cm (PHITS axis from the tank axis in the CSV header)
+    I600-PDD.csv          -> series I600, PDD
+
+Queries are dictionary lookups on the loaded index; no globbing or CSV parsing
+happens per case.
+
+Usage:
+    python src/measured_store.py ingest data/measured_csv [--store PATH]
+    python src/measured_store.py query [--store PATH] [--field 10x10] [--scan ocr] [--depth 10] [--axis x]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from profile_cache import sha256_file
+from profile_io import csv_profile, read_measured_csv
+
+# Bump when the stored layout changes
+STORE_VERSION = 2
+_INDEX_KEY = "__index__"
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "output", "cache", "measured_store.npz")
+
+# 10x10m10cm-xXlat / 10x10mPDD-zZver
+_FIELD_NAME_RE = re.compile(
+    r"^(?P<field>\d+x\d+)m(?:(?P<depth>\d+(?:\.\d+)?)cm|(?P<pdd>PDD))-(?P<axis>[xyz])(?P<tank>[XYZ])(?P<dir>[A-Za-z]+)$")
+# I150-10.0 / I600-PDD
+_SERIES_NAME_RE = re.compile(r"^(?P<field>[A-Za-z]+\d+)-(?:(?P<depth>\d+(?:\.\d+)?)|(?P<pdd>PDD))$", re.IGNORECASE)
+_HEADER_AXIS_RE = re.compile(r"^([XYZ])\s*\(", re.IGNORECASE)
+# Measured tank axis (CSV header) -> PHITS axis (X: lateral -> x, Y: longitudinal -> z; tank Z is the depth)
+TANK_TO_PHITS_AXIS = {"x": "x", "y": "z"}
+
+
+def parse_measured_name(filename: str) -> Optional[dict]:
+    """Metadata encoded in a measured file name, or ``None`` if it follows no known scheme.
+
+    Keys: ``field`` (``'10x10'``/``'I150'``), ``field_cm`` (side length or ``None``),
+    ``scan`` (``'ocr'``/``'pdd'``), ``depth_cm`` (``None`` for PDD), ``axis`` (PHITS axis or ``None``).
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    m = _FIELD_NAME_RE.match(stem)
+    if m:
+        a, b = (float(v) for v in m.group("field").split("x"))
+        return {
+            "field": m.group("field"),
+            "field_cm": a if a == b else None,
+            "scan": "pdd" if m.group("pdd") else "ocr",
+            "depth_cm": None if m.group("pdd") else float(m.group("depth")),
+            "axis": m.group("axis"),
+            "tank_axis": m.group("tank"),
+        }
+    m = _SERIES_NAME_RE.match(stem)
+    if m:
+        return {
+            "field": m.group("field").upper(),
+            "field_cm": None,
+            "scan": "pdd" if m.group("pdd") else "ocr",
+            "depth_cm": None if m.group("pdd") else float(m.group("depth")),
+            "axis": "z" if m.group("pdd") else None,
+            "tank_axis": None,
+        }
+    return None
+
+
+def _key(field: str, scan: str, depth_cm: Optional[float], axis: Optional[str]) -> Tuple:
+    return (field.lower(), scan, None if depth_cm is None else round(float(depth_cm), 3), axis)
+
+
+class MeasuredStore:
+    def __init__(self):
+        self._reset()
+
+    def _reset(self) -> None:
+        self.records: List[dict] = []
+        self._arrays: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._by_key: Dict[Tuple, int] = {}
+        self._by_name: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _add(self, rec: dict, pos: np.ndarray, dose: np.ndarray) -> None:
+        i = len(self.records)
+        self.records.append(rec)
+        self._arrays.append((pos, dose))
+        self._by_key.setdefault(_key(rec["field"], rec["scan"], rec["depth_cm"], rec["axis"]), i)
+        self._by_name[rec["file"]] = i
+
+    # --- ingest / persistence ---------------------------------------------
+    def ingest(self, directory: str, pattern: str = "*.csv", verbose: bool = False) -> int:
+        """(Re)build the store from ``directory``; unchanged files (size, mtime) are not reparsed.
+
+        Returns the number of files parsed.
+        """
+        old = {rec["path"]: (rec, arr) for rec, arr in zip(self.records, self._arrays)}
+        self._reset()
+        parsed = 0
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            meta = parse_measured_name(path)
+            if meta is None:
+                if verbose:
+                    print(f"Warning: skipping unrecognised file name: {os.path.basename(path)}", file=sys.stderr)
+                continue
+            path = os.path.abspath(path)
+            st = os.stat(path)
+            prev = old.get(path)
+            if prev and prev[0]["size"] == st.st_size and prev[0]["mtime_ns"] == st.st_mtime_ns:
+                self._add(prev[0], *prev[1])
+                continue
+            try:
+                table = read_measured_csv(path)  # one read for both the header and the columns
+                if meta["axis"] is None:
+                    header = table["header"]
+                    m = _HEADER_AXIS_RE.match(header[0]) if header else None
+                    meta["axis"] = TANK_TO_PHITS_AXIS.get(m.group(1).lower()) if m else None
+                pos, dose = csv_profile(table, path)
+            except (OSError, ValueError) as e:
+                print(f"Warning: skipping {os.path.basename(path)}: {e}", file=sys.stderr)
+                continue
+            rec = dict(meta, file=os.path.basename(path), path=path, size=st.st_size,
+                       mtime_ns=st.st_mtime_ns, sha256=sha256_file(path), n=int(pos.size))
+            self._add(rec, pos, dose)
+            parsed += 1
+        self._warn_duplicates()
+        return parsed
+
+    def duplicates(self) -> List[Tuple[dict, dict]]:
+        """``(kept, shadowed)`` record pairs sharing one (field, scan, depth, axis) key; `get` returns ``kept``."""
+        out = []
+        for i, rec in enumerate(self.records):
+            kept = self._by_key[_key(rec["field"], rec["scan"], rec["depth_cm"], rec["axis"])]
+            if kept != i:
+                out.append((self.records[kept], rec))
+        return out
+
+    def _warn_duplicates(self) -> None:
+        for kept, other in self.duplicates():
+            depth = "PDD" if kept["depth_cm"] is None else f"{kept['depth_cm']:g} cm"
+            print(f"Warning: {other['file']} has the same field/depth/axis as {kept['file']} "
+                  f"({kept['field']} {depth} axis={kept['axis']}); using {kept['file']}", file=sys.stderr)
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        payload = {}
+        for i, (pos, dose) in enumerate(self._arrays):
+            payload[f"pos_{i}"] = pos
+            payload[f"dose_{i}"] = dose
+        payload[_INDEX_KEY] = np.array(json.dumps({"version": STORE_VERSION, "records": self.records}))
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **payload)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "MeasuredStore":
+        store = cls()
+        with np.load(path, allow_pickle=False) as z:
+            index = json.loads(str(z[_INDEX_KEY]))
+            if index.get("version") != STORE_VERSION:
+                raise ValueError(f"measured store version mismatch: {path}")
+            for i, rec in enumerate(index["records"]):
+                store._add(rec, z[f"pos_{i}"], z[f"dose_{i}"])
+        return store
+
+    @classmethod
+    def open(cls, path: str, directory: Optional[str] = None) -> "MeasuredStore":
+        """Load ``path`` (if readable) and, when ``directory`` is given, refresh and save it."""
+        try:
+            store = cls.load(path)
+        except (OSError, ValueError, KeyError):
+            store = cls()
+        if directory is not None:
+            before = [rec["path"] for rec in store.records]
+            if store.ingest(directory) or before != [rec["path"] for rec in store.records]:
+                store.save(path)
+        return store
+
+    # --- queries ----------------------------------------------------------
+    def get(self, field: str, scan: str = "ocr", depth_cm: Optional[float] = None,
+            axis: Optional[str] = None) -> Optional[dict]:
+        """O(1) lookup of one record (``axis='z'`` for PDDs); ``None`` if absent."""
+        if scan == "pdd" and axis is None:
+            axis = "z"
+        i = self._by_key.get(_key(field, scan, depth_cm, axis))
+        return None if i is None else self.records[i]
+
+    def find(self, filename: str) -> Optional[dict]:
+        i = self._by_name.get(os.path.basename(filename))
+        return None if i is None else self.records[i]
+
+    def query(self, field: Optional[str] = None, scan: Optional[str] = None,
+              depth_cm: Optional[float] = None, axis: Optional[str] = None) -> List[dict]:
+        """All records matching the given fields (``None`` = any), e.g. every 10 cm OCR of 10x10."""
+        depth = None if depth_cm is None else round(float(depth_cm), 3)
+        out = []
+        for rec in self.records:
+            if field is not None and rec["field"].lower() != field.lower():
+                continue
+            if scan is not None and rec["scan"] != scan:
+                continue
+            if depth is not None and (rec["depth_cm"] is None or round(rec["depth_cm"], 3) != depth):
+                continue
+            if axis is not None and rec["axis"] != axis:
+                continue
+            out.append(rec)
+        return out
+
+    def arrays(self, rec: dict) -> Tuple[np.ndarray, np.ndarray]:
+        """``(pos_cm, dose_norm)`` of a record returned by `get`/`query`/`find`."""
+        return self._arrays[self._by_name[rec["file"]]]
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Ingest and query the measured-profile store')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    ing = sub.add_parser('ingest', help='(re)build the store from a measured CSV directory')
+    ing.add_argument('directory')
+    ing.add_argument('--store', default=DEFAULT_STORE)
+    q = sub.add_parser('query', help='list records matching the filters')
+    q.add_argument('--store', default=DEFAULT_STORE)
+    q.add_argument('--field', default=None, help='e.g. 10x10 or I150')
+    q.add_argument('--scan', choices=['ocr', 'pdd'], default=None)
+    q.add_argument('--depth', type=float, default=None, help='depth in cm')
+    q.add_argument('--axis', choices=['x', 'y', 'z'], default=None)
+    args = ap.parse_args()
+
+    if args.cmd == 'ingest':
+        try:
+            store = MeasuredStore.load(args.store)
+        except (OSError, ValueError, KeyError):
+            store = MeasuredStore()
+        parsed = store.ingest(args.directory, verbose=True)
+        store.save(args.store)
+        print(f"{len(store)} profiles ({parsed} parsed): {args.store}")
+        return
+    try:
+        store = MeasuredStore.load(args.store)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: cannot open store {args.store}: {e}", file=sys.stderr)
+        sys.exit(1)
+    for rec in store.query(args.field, args.scan, args.depth, args.axis):
+        depth = 'PDD' if rec['depth_cm'] is None else f"{rec['depth_cm']:g} cm"
+        print(f"{rec['field']:>6} {rec['scan']:>3} {depth:>8} axis={rec['axis'] or '?'} n={rec['n']:<5} {rec['file']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
 import argparse
+import contextlib
+import importlib
 import json
 import os
 import re
@@ -7,107 +9,71 @@ import configparser
 from typing import Tuple, Optional
 
 import numpy as np
-import pandas as pd
+
+import incremental
+import plot_render
+from dose_map import build_dose_map, dose_at, gamma_map, uniform_grid
+from gamma1d import format_criterion, gamma_1d_multi, parse_criterion, pass_rate, pass_rate_surface
+from measured_store import parse_measured_name
+from profile_cache import DEFAULT_MAX_BYTES, ProfileCache
+from profile_io import load_csv_profile as _load_csv_profile, load_phits_profile
+from profile_metrics import fwhm
+from shift_registration import METRICS as REGISTER_METRICS, register_shift, shift_landscape
 
 __version__ = "0.2.2"
 
-# Allow skipping heavy optional imports for fast version/help checks
-_SKIP_IMPORTS = os.environ.get("OCR_TS_SKIP_IMPORTS") == "1"
-if not _SKIP_IMPORTS:
+
+def _optional(module: str, needed_for: str):
+    # matplotlib, scipy, pandas and pymedphys are imported by the stage that uses them, so
+    # -V/--help and runs without plots/smoothing/CSV exports do not pay for them at startup
     try:
-        import matplotlib.pyplot as plt  # type: ignore
-        from scipy.signal import savgol_filter  # type: ignore
-        import pymedphys  # type: ignore
+        return importlib.import_module(module)
     except ModuleNotFoundError as e:
-        print(
-            "Missing dependencies: "
-            + str(e)
-            + ". Please install: pip install pandas numpy matplotlib scipy pymedphys",
-            file=sys.stderr,
-        )
-        sys.exit(1)
+        raise RuntimeError(f"{needed_for} requires {module.split('.')[0]} (pip install {module.split('.')[0]}): {e}")
 
 
 def load_csv_profile(path: str) -> Tuple[np.ndarray, np.ndarray]:
-    # Robust CSV loader: try standard CSV, then fallback to whitespace-delimited
-    try:
-        df0 = pd.read_csv(path, encoding="utf-8-sig", header=None)
-    except Exception:
-        df0 = pd.read_csv(path, encoding="utf-8-sig", header=None, delim_whitespace=True)
-    if df0.shape[1] >= 2 and isinstance(df0.iloc[0, 0], str) and "(cm)" in str(df0.iloc[0, 0]):
-        df = pd.read_csv(path, encoding="utf-8-sig")
-        cols = list(df.columns)[:2]
-        df = df[cols]
-        df.columns = ["pos", "dose"]
-    else:
-        df = df0.iloc[:, :2]
-        df.columns = ["pos", "dose"]
-    pos = pd.to_numeric(df["pos"], errors="coerce").to_numpy()
-    dose = pd.to_numeric(df["dose"], errors="coerce").to_numpy()
-    m = np.isfinite(pos) & np.isfinite(dose)
-    pos = pos[m]
-    dose = dose[m]
-    order = np.argsort(pos)
-    pos = pos[order]
-    dose = dose[order]
-    if dose.size == 0:
-        raise ValueError(f"CSV has no valid numeric data: {path}")
-    dmax = float(np.max(dose))
-    if dmax <= 0:
-        raise ValueError(f"CSV dose max <= 0: {path}")
-    return pos.astype(float), (dose / dmax).astype(float)
+    # Single read with sniffed header/delimiter (see profile_io.read_measured_csv)
+    return _load_csv_profile(path)
 
 
 def parse_phits_out_profile(path: str) -> Tuple[str, np.ndarray, np.ndarray, dict]:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        lines = f.readlines()
-    axis = None
-    y_center = None
-    for line in lines:
-        s = line.strip().lower().replace(" ", "")
-        if s.startswith("axis="):
-            axis = line.split("=")[1].strip().split("#")[0].strip()
-        if re.search(r"^\s*#\s*y\s*=\s*\(", line, flags=re.IGNORECASE):
-            nums = re.findall(r"([\-\+\d\.Ee]+)", line)
-            if len(nums) >= 2:
-                try:
-                    y0 = float(nums[0]); y1 = float(nums[1])
-                    y_center = 0.5 * (y0 + y1)
-                except Exception:
-                    pass
-    data_start = None
-    for i, line in enumerate(lines):
-        t = line.strip().lower()
-        if t.startswith("#  y-lower") or t.startswith("#  z-lower") or t.startswith("#  x-lower"):
-            data_start = i + 1
-            break
-    if data_start is None:
-        raise ValueError(f"Could not find PHITS data table header: {path}")
-    pos_centers, vals = [], []
-    for line in lines[data_start:]:
-        s = line.strip()
-        if not s or s.startswith("#"):
-            break
-        parts = s.split()
-        if len(parts) < 3:
-            continue
-        try:
-            lo = float(parts[0]); hi = float(parts[1]); v = float(parts[2])
-        except Exception:
-            continue
-        pos_centers.append(0.5 * (lo + hi))
-        vals.append(v)
-    pos = np.asarray(pos_centers, float)
-    dose = np.asarray(vals, float)
-    if dose.size == 0:
-        raise ValueError(f"PHITS data is empty: {path}")
-    dmax = float(np.max(dose))
-    if dmax <= 0:
-        raise ValueError(f"PHITS dose max <= 0: {path}")
-    meta = {}
-    if y_center is not None:
-        meta["y_center_cm"] = y_center
-    return axis or "", pos, (dose / dmax), meta
+    return load_phits_profile(path)
+
+
+def load_profile(ftype: str, path: str, cache: Optional[ProfileCache] = None) -> Tuple[str, np.ndarray, np.ndarray, dict]:
+    # Returns (axis, pos_cm, dose_norm, meta) for either input type; meta arrays (e.g. rel_err) are cached too
+    if cache is None:
+        if ftype == 'csv':
+            pos, dose = load_csv_profile(path)
+            return '', pos, dose, {}
+        return parse_phits_out_profile(path)
+
+    def _loader(p):
+        axis, pos, dose, meta = load_profile(ftype, p)
+        arrays = {'pos': pos, 'dose': dose}
+        scalars = {'axis': axis}
+        for k, v in meta.items():
+            if isinstance(v, np.ndarray):
+                arrays[k] = v
+            else:
+                scalars[k] = v
+        return arrays, scalars
+
+    arrays, scalars = cache.load(path, ftype, _loader)
+    meta = dict(scalars)
+    axis = meta.pop('axis', '')
+    meta.update({k: v for k, v in arrays.items() if k not in ('pos', 'dose')})
+    return axis, arrays['pos'], arrays['dose'], meta
+
+
+def _extract_depth_cm_from_csv_filename(path: str, default: float) -> float:
+    # Known naming schemes first (10x10m10cm-xXlat, I150-10.0), then any "<num>cm"
+    meta = parse_measured_name(path)
+    if meta is not None and meta['depth_cm'] is not None:
+        return meta['depth_cm']
+    m = re.search(r"([0-9]+(?:\.[0-9]+)?)\s*cm", os.path.basename(path), re.IGNORECASE)
+    return float(m.group(1)) if m else default
 
 
 def _extract_depth_cm_from_phits_filename(path: str) -> Optional[float]:
@@ -157,23 +123,74 @@ def center_normalise(pos_cm: np.ndarray, dose: np.ndarray, tol_cm: float, interp
     return pos, (dose / c)
 
 
-def compute_gamma(x_ref_cm, y_ref, x_eval_cm, y_eval, dd, dta, cutoff, mode: str):
+def gamma_arrays(x_ref_cm, y_ref, x_eval_cm, y_eval, criteria, backend: str = 'native'):
+    # Per-point gamma (rows follow `criteria`, NaN below cutoff); positions in cm, DTA in mm
+    global_norm = float(np.max(y_ref))
+    if backend == 'pymedphys':
+        pymedphys = _optional('pymedphys', '--gamma-backend pymedphys')
+        return np.array([
+            pymedphys.gamma(
+                axes_reference=(x_ref_cm * 10.0,), dose_reference=y_ref,
+                axes_evaluation=(x_eval_cm * 10.0,), dose_evaluation=y_eval,
+                dose_percent_threshold=dd, distance_mm_threshold=dta,
+                lower_percent_dose_cutoff=cutoff,
+                local_gamma=local,
+                global_normalisation=global_norm,
+            )
+            for dd, dta, cutoff, local in criteria
+        ]).reshape(len(criteria), -1)
+    return gamma_1d_multi(x_ref_cm * 10.0, y_ref, x_eval_cm * 10.0, y_eval, criteria, global_norm=global_norm)
+
+
+def gamma_array(x_ref_cm, y_ref, x_eval_cm, y_eval, dd, dta, cutoff, mode: str, backend: str = 'native'):
+    return gamma_arrays(x_ref_cm, y_ref, x_eval_cm, y_eval, [(dd, dta, cutoff, mode == 'local')], backend)[0]
+
+
+def compute_gamma(x_ref_cm, y_ref, x_eval_cm, y_eval, dd, dta, cutoff, mode: str, backend: str = 'native'):
     if np.max(y_ref) <= 0:
         return 0.0
-    global_norm = float(np.max(y_ref))
-    g = pymedphys.gamma(
-        axes_reference=(x_ref_cm * 10.0,), dose_reference=y_ref,
-        axes_evaluation=(x_eval_cm * 10.0,), dose_evaluation=y_eval,
-        dose_percent_threshold=dd, distance_mm_threshold=dta,
-        lower_percent_dose_cutoff=cutoff,
-        local_gamma=(mode == 'local'),
-        global_normalisation=global_norm,
-    )
-    v = g[~np.isnan(g)]
-    return float(np.sum(v <= 1.0) / v.size * 100.0) if v.size else 0.0
+    return pass_rate(gamma_array(x_ref_cm, y_ref, x_eval_cm, y_eval, dd, dta, cutoff, mode, backend))
+
+
+def compute_gamma_rates(x_ref_cm, y_ref, x_eval_cm, y_eval, criteria, backend: str = 'native'):
+    # -> (pass rates in %, gamma arrays) for every criterion from one search
+    if np.max(y_ref) <= 0:
+        return [0.0] * len(criteria), None
+    g = gamma_arrays(x_ref_cm, y_ref, x_eval_cm, y_eval, criteria, backend)
+    return [pass_rate(row) for row in g], g
 
 
-def main():
+def write_gamma_surface(path, x_ref_cm, y_ref, x_eval_cm, y_eval, dd_values, dta_values, cutoff, mode: str):
+    # Pass-rate table: one row per DD, one column per DTA
+    rates = pass_rate_surface(x_ref_cm * 10.0, y_ref, x_eval_cm * 10.0, y_eval, dd_values, dta_values,
+                              cutoff, local=(mode == 'local'), global_norm=float(np.max(y_ref)))
+    pd = _optional('pandas', '--gamma-surface')
+    df = pd.DataFrame(rates, columns=[f"dta_{v:g}mm" for v in dta_values])
+    df.insert(0, 'dd_percent', list(dd_values))
+    df.to_csv(path, index=False, encoding='utf-8')
+    return path
+
+
+def register_curves(args, x_ref, y_ref, x_eval, y_eval) -> dict:
+    # Shift (and scale) of the evaluation curve per --register-* options
+    return register_shift(x_ref, y_ref, x_eval, y_eval, metric=args.register_metric,
+                          criterion=gamma_criteria(args)[0], scale=args.register_scale,
+                          step_cm=args.register_step, max_shift_cm=args.register_max_shift)
+
+
+def write_registration(path: str, reg: dict) -> dict:
+    # Metric landscape CSV; returns the JSON-friendly summary (no arrays)
+    pd = _optional('pandas', '--register')
+    df = pd.DataFrame({'shift_cm': reg['shifts_cm'], 'rmse': reg['landscape_rmse'], 'scale': reg['landscape_scale']})
+    if reg['landscape_gamma_percent'] is not None:
+        df['gamma_percent'] = reg['landscape_gamma_percent']
+    df.to_csv(path, index=False, encoding='utf-8')
+    summary = {k: reg[k] for k in ('metric', 'shift_cm', 'scale', 'rmse', 'gamma_percent', 'coarse_shift_cm')}
+    summary['landscape_path'] = path
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser(description='True-scaling OCR comparison (PDD-weighted)')
     ap.add_argument('-V', '--version', action='version', version=f'%(prog)s {__version__}')
     ap.add_argument('--ref-pdd-type', choices=['csv', 'phits'], required=True)
@@ -181,9 +198,12 @@ def main():
     ap.add_argument('--eval-pdd-type', choices=['csv', 'phits'], required=True)
     ap.add_argument('--eval-pdd-file', required=True)
     ap.add_argument('--ref-ocr-type', choices=['csv', 'phits'], required=True)
-    ap.add_argument('--ref-ocr-file', required=True)
+    ap.add_argument('--ref-ocr-file', action='append', default=None,
+                    help='reference OCR; repeat together with --eval-ocr-file to compare several pairs against one PDD pair')
     ap.add_argument('--eval-ocr-type', choices=['csv', 'phits'], required=True)
-    ap.add_argument('--eval-ocr-file', required=True)
+    ap.add_argument('--eval-ocr-file', action='append', default=None)
+    ap.add_argument('--pairs', type=str, default=None, metavar='FILE',
+                    help='file with one "ref_ocr,eval_ocr" pair per line (added to the --*-ocr-file pairs)')
     ap.add_argument('--norm-mode', choices=['dmax', 'z_ref'], default='dmax')
     ap.add_argument('--z-ref', type=float, default=10.0)
     ap.add_argument('--dd1', type=float, default=2.0)
@@ -191,10 +211,23 @@ def main():
     ap.add_argument('--dd2', type=float, default=3.0)
     ap.add_argument('--dta2', type=float, default=3.0)
     ap.add_argument('--gamma-mode', choices=['global', 'local'], default='global')
+    ap.add_argument('--gamma-backend', choices=['native', 'pymedphys'], default='native',
+                    help='native: exact 1D gamma (gamma1d.py); pymedphys: pymedphys.gamma')
+    ap.add_argument('--criteria', nargs='+', default=None, metavar='DD/DTA[/CUT][/MODE]',
+                    help='extra gamma criteria evaluated with criteria 1/2 in one pass, e.g. 1/1 2/3/20/local')
+    ap.add_argument('--gamma-surface', action='store_true', help='export pass rates over a DD x DTA grid (data/*GammaSurface_*.csv)')
+    ap.add_argument('--surface-dd', type=float, nargs='+', default=[1.0, 2.0, 3.0, 4.0, 5.0], help='DD values (%%) for --gamma-surface')
+    ap.add_argument('--surface-dta', type=float, nargs='+', default=[1.0, 2.0, 3.0, 4.0, 5.0], help='DTA values (mm) for --gamma-surface')
     ap.add_argument('--cutoff', type=float, default=10.0)
     ap.add_argument('--smooth-window', type=int, default=5)
     ap.add_argument('--smooth-order', type=int, default=2)
     ap.add_argument('--no-smooth', action='store_true')
+    ap.add_argument('--plots', choices=['none', 'deferred', 'eager'], default='eager',
+                    help='eager: write the PDD/OCR PNGs; deferred: store the plot payload under <output>/cache/plots '
+                         'for `python src/plot_render.py <output>`; none: numbers only (matplotlib is not imported)')
+    ap.add_argument('--no-plot', dest='plots', action='store_const', const='none', help='same as --plots none')
+    ap.add_argument('--render-workers', type=int, default=0, metavar='N',
+                    help='encode the plots on N worker processes while the next pair is computed (0: inline)')
     ap.add_argument('--grid', type=float, default=None)
     ap.add_argument('--ymin', type=float, default=None)
     ap.add_argument('--ymax', type=float, default=None)
@@ -209,10 +242,189 @@ def main():
     ap.add_argument('--fwhm-warn-cm', type=float, default=1.0)
     ap.add_argument('--eval-z-shift', type=float, default=0.0)
     ap.add_argument('--eval-pdd-z-shift', type=float, default=0.0)
+    ap.add_argument('--register', choices=['pdd', 'ocr', 'both'], default=None,
+                    help='find the evaluation shift automatically: PDD depth shift (added to --eval-pdd-z-shift) '
+                         'and/or lateral OCR shift; the metric landscape is written to data/*Registration_*.csv')
+    ap.add_argument('--register-metric', choices=list(REGISTER_METRICS), default='rmse',
+                    help='minimise RMSE or maximise the gamma pass rate of criteria 1')
+    ap.add_argument('--register-scale', action='store_true', help='also fit a scale factor on the evaluation curve')
+    ap.add_argument('--register-max-shift', type=float, default=1.0, help='largest shift searched, cm')
+    ap.add_argument('--register-step', type=float, default=0.01, help='registration grid step, cm')
     ap.add_argument('--output-dir', type=str, default=None)
     ap.add_argument('--no-pdd-report', action='store_true')
-    args = ap.parse_args()
+    ap.add_argument('--cache', action='store_true', help='cache parsed profiles under <output>/cache/profiles')
+    ap.add_argument('--cache-dir', type=str, default=None, help='profile cache directory (implies --cache)')
+    ap.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+    ap.add_argument('--clear-cache', action='store_true', help='drop all cached profiles before running')
+    ap.add_argument('--dose-map', action='store_true',
+                    help='build 2D true-dose maps D(z, x) per scan axis from all OCR pairs and report their 2D gamma')
+    ap.add_argument('--map-dz', type=float, default=None, help='depth step of the dose map in cm (default: --grid)')
+    ap.add_argument('--map-depths', type=float, nargs='+', default=None,
+                    help='export profiles interpolated from the dose map at these depths (cm)')
+    ap.add_argument('--ssd', type=float, default=None,
+                    help='source-surface distance in cm; interpolate between depths in divergence-corrected coordinates')
+    ap.add_argument('--incremental', action='store_true',
+                    help='skip the run if input contents and parameters match the stamp of the last run (<out>/reports/.stamps)')
+    return ap
+
+
+def gamma_criteria(args) -> list:
+    # Criteria 1 and 2 first, then --criteria; all share one gamma search per profile pair
+    local = args.gamma_mode == 'local'
+    criteria = [(args.dd1, args.dta1, args.cutoff, local), (args.dd2, args.dta2, args.cutoff, local)]
+    return criteria + [parse_criterion(c, args.cutoff, local) for c in (args.criteria or [])]
+
 
+def resolve_grid_step(args) -> float:
+    # --grid, else Processing.resample_grid_cm from config.ini, else 0.1 cm
+    if args.grid is not None:
+        return args.grid
+    cfg = configparser.ConfigParser()
+    prj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cfg_path = os.path.join(prj_root, 'config.ini')
+    if not os.path.exists(cfg_path):
+        return 0.1
+    try:
+        cfg.read(cfg_path, encoding='utf-8')
+        return float(cfg.get('Processing', 'resample_grid_cm', fallback='0.1'))
+    except Exception:
+        return 0.1
+
+
+# Options that do not change any result or artifact
+_NON_RESULT_OPTIONS = ('incremental', 'cache', 'cache_dir', 'cache_max_mb', 'clear_cache', 'render_workers',
+                       # dose-map options: no per-pair result depends on them and the map is rebuilt on every
+                       # --dose-map run, so toggling them must not mark the pairs stale
+                       'dose_map', 'map_dz', 'map_depths', 'ssd')
+
+
+def effective_params(args, grid_step: float) -> dict:
+    params = {k: v for k, v in vars(args).items() if k not in _NON_RESULT_OPTIONS}
+    params['grid'] = grid_step
+    params['output_dir'] = os.path.abspath(args.output_dir) if args.output_dir else None
+    params['tool_version'] = __version__
+    return params
+
+
+def rerun_command(args, pairs=None) -> str:
+    """Command line reproducing a run (written to the reports); ``pairs`` lists every OCR pair."""
+    prj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def _q(v: str) -> str:
+        v = str(v)
+        return '"' + v.replace('"', '\\"') + '"' if (' ' in v or '\\' in v) else v
+
+    pairs = pairs or [(args.ref_ocr_file, args.eval_ocr_file)]
+    argv = [
+        sys.executable,
+        os.path.join(prj_root, 'src', 'ocr_true_scaling.py'),
+        '--ref-pdd-type', args.ref_pdd_type,
+        '--ref-pdd-file', args.ref_pdd_file,
+        '--eval-pdd-type', args.eval_pdd_type,
+        '--eval-pdd-file', args.eval_pdd_file,
+        '--ref-ocr-type', args.ref_ocr_type,
+        '--ref-ocr-file', pairs[0][0],
+        '--eval-ocr-type', args.eval_ocr_type,
+        '--eval-ocr-file', pairs[0][1],
+        '--norm-mode', args.norm_mode,
+        '--z-ref', str(args.z_ref),
+        '--dd1', str(args.dd1), '--dta1', str(args.dta1),
+        '--dd2', str(args.dd2), '--dta2', str(args.dta2),
+        '--gamma-mode', args.gamma_mode, '--gamma-backend', args.gamma_backend,
+        '--cutoff', str(args.cutoff),
+        '--smooth-window', str(args.smooth_window),
+        '--smooth-order', str(args.smooth_order),
+        '--center-tol-cm', str(args.center_tol_cm),
+        '--eval-z-shift', str(args.eval_z_shift),
+        '--eval-pdd-z-shift', str(args.eval_pdd_z_shift),
+    ]
+    if args.center_interp:
+        argv.append('--center-interp')
+    if args.no_smooth:
+        argv.append('--no-smooth')
+    if args.plots != 'eager':
+        argv.extend(['--plots', args.plots])
+    if args.grid is not None:
+        argv.extend(['--grid', str(args.grid)])
+    if args.ymin is not None:
+        argv.extend(['--ymin', str(args.ymin)])
+    if args.ymax is not None:
+        argv.extend(['--ymax', str(args.ymax)])
+    if args.xlim_symmetric:
+        argv.append('--xlim-symmetric')
+    if args.legend_ref:
+        argv.extend(['--legend-ref', args.legend_ref])
+    if args.legend_eval:
+        argv.extend(['--legend-eval', args.legend_eval])
+    if args.fwhm_warn_cm is not None:
+        argv.extend(['--fwhm-warn-cm', str(args.fwhm_warn_cm)])
+    if args.output_dir:
+        argv.extend(['--output-dir', args.output_dir])
+    if args.export_csv:
+        argv.append('--export-csv')
+    if args.export_gamma:
+        argv.append('--export-gamma')
+    if args.criteria:
+        argv.extend(['--criteria'] + list(args.criteria))
+    if args.gamma_surface:
+        argv.append('--gamma-surface')
+        argv.extend(['--surface-dd'] + [f'{v:g}' for v in args.surface_dd])
+        argv.extend(['--surface-dta'] + [f'{v:g}' for v in args.surface_dta])
+    if args.register:
+        argv.extend(['--register', args.register, '--register-metric', args.register_metric,
+                     '--register-max-shift', f'{args.register_max_shift:g}', '--register-step', f'{args.register_step:g}'])
+        if args.register_scale:
+            argv.append('--register-scale')
+    if args.dose_map:
+        argv.append('--dose-map')
+        if args.map_dz is not None:
+            argv.extend(['--map-dz', f'{args.map_dz:g}'])
+        if args.map_depths:
+            argv.extend(['--map-depths'] + [f'{v:g}' for v in args.map_depths])
+        if args.ssd is not None:
+            argv.extend(['--ssd', f'{args.ssd:g}'])
+    for ref_file, eval_file in pairs[1:]:
+        argv.extend(['--ref-ocr-file', ref_file, '--eval-ocr-file', eval_file])
+    cmd_line = ' '.join(_q(a) for a in argv)
+    prefix = '& ' if os.name == 'nt' else ''
+    return prefix + cmd_line
+
+
+def ocr_pairs(args) -> list:
+    """(ref, eval) OCR files from repeated --ref-ocr-file/--eval-ocr-file and --pairs."""
+    refs, evals = list(args.ref_ocr_file or []), list(args.eval_ocr_file or [])
+    if len(refs) != len(evals):
+        raise ValueError(f"--ref-ocr-file given {len(refs)} times but --eval-ocr-file {len(evals)} times")
+    pairs = list(zip(refs, evals))
+    if args.pairs:
+        pairs += read_pairs_file(args.pairs)
+    if not pairs:
+        raise ValueError("no OCR pair given (--ref-ocr-file/--eval-ocr-file or --pairs)")
+    return pairs
+
+
+def read_pairs_file(path: str) -> list:
+    """One ``ref_ocr,eval_ocr`` pair per line (comma, tab or spaces; ``#`` comments).
+
+    Relative paths are resolved against the directory of the pairs file.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    pairs = []
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = [p.strip().strip('"') for p in (line.split(',') if ',' in line else line.split())]
+            parts = [p for p in parts if p]
+            if len(parts) != 2:
+                raise ValueError(f"{path}:{lineno}: expected 'ref_ocr,eval_ocr'")
+            pairs.append(tuple(p if os.path.isabs(p) else os.path.join(base, p) for p in parts))
+    return pairs
+
+
+def load_pdd_stage(args, cache: Optional[ProfileCache] = None) -> dict:
+    """Load and normalise the reference/evaluation PDDs once; shared by every OCR pair."""
     # PDD load & normalise (auto-correct types for convenience)
     ref_pdd_type = args.ref_pdd_type
     if ref_pdd_type == 'csv' and os.path.basename(args.ref_pdd_file).lower().endswith('.out'):
@@ -221,10 +433,7 @@ def main():
         except Exception:
             pass
         ref_pdd_type = 'phits'
-    if ref_pdd_type == 'csv':
-        z_ref_pos, z_ref_dose = load_csv_profile(args.ref_pdd_file)
-    else:
-        _, z_ref_pos, z_ref_dose, _ = parse_phits_out_profile(args.ref_pdd_file)
+    _, z_ref_pos, z_ref_dose, _ = load_profile(ref_pdd_type, args.ref_pdd_file, cache)
     z_ref_pos, z_ref_norm = normalize_pdd(z_ref_pos, z_ref_dose, args.norm_mode, args.z_ref)
 
     eval_pdd_type = args.eval_pdd_type
@@ -234,13 +443,156 @@ def main():
         except Exception:
             pass
         eval_pdd_type = 'phits'
-    if eval_pdd_type == 'csv':
-        z_eval_pos, z_eval_dose = load_csv_profile(args.eval_pdd_file)
+    _, z_eval_raw, z_eval_dose, _ = load_profile(eval_pdd_type, args.eval_pdd_file, cache)
+    z_eval_pos, z_eval_norm = normalize_pdd(z_eval_raw + args.eval_pdd_z_shift, z_eval_dose, args.norm_mode, args.z_ref)
+    reg = None
+    if args.register in ('pdd', 'both'):
+        # Depth shift on top of --eval-pdd-z-shift; re-normalised because z_ref normalisation depends on it
+        reg = register_curves(args, z_ref_pos, z_ref_norm, z_eval_pos, z_eval_norm)
+        z_eval_pos, z_eval_norm = normalize_pdd(z_eval_raw + args.eval_pdd_z_shift + reg['shift_cm'], z_eval_dose,
+                                                args.norm_mode, args.z_ref)
+        if args.register_scale:
+            # The scale was fitted to the curve normalised at the old shift: refit it on the re-normalised one
+            rmse, k = shift_landscape(z_ref_pos, z_ref_norm, z_eval_pos, z_eval_norm, [0.0], scale=True)
+            reg = dict(reg, scale=float(k[0]), rmse=float(rmse[0]))
+        z_eval_norm = z_eval_norm * reg['scale']
+    return {'ref_pos': z_ref_pos, 'ref_norm': z_ref_norm, 'eval_pos': z_eval_pos, 'eval_norm': z_eval_norm,
+            'registration': reg}
+
+
+def report_pdd_registration(args, pdd: dict, out_root: str) -> dict:
+    """Landscape CSV and console line for a registered PDD pair; returns ``{'pdd_registration': summary or None}``."""
+    reg = pdd.get('registration')
+    if reg is None:
+        return {'pdd_registration': None}
+    ref_pdd_base = os.path.splitext(os.path.basename(args.ref_pdd_file))[0]
+    eval_pdd_base = os.path.splitext(os.path.basename(args.eval_pdd_file))[0]
+    summary = write_registration(
+        os.path.join(out_root, 'data', f"PDDRegistration_{ref_pdd_base}_vs_{eval_pdd_base}_{reg['metric']}.csv"), reg)
+    summary['eval_pdd_z_shift_total_cm'] = float(args.eval_pdd_z_shift + reg['shift_cm'])
+    print("PDD registration ({}): shift={:+.4f} cm (eval-pdd-z-shift total {:+.4f} cm), scale={:.4f}, RMSE={:.6f}".format(
+        reg['metric'], reg['shift_cm'], summary['eval_pdd_z_shift_total_cm'], reg['scale'], reg['rmse']))
+    print("PDD registration landscape saved: " + summary['landscape_path'])
+    return {'pdd_registration': summary}
+
+
+def emit_plot(args, spec: dict, out_root: str, render=None) -> Tuple[Optional[str], Optional[str]]:
+    """``(plot_path, plot_spec_path)`` of a plot spec under ``--plots``.
+
+    eager renders it (``render``, default ``plot_render.render``), deferred
+    stores the payload under ``<out_root>/cache/plots`` for a later render, none
+    does neither.
+    """
+    if args.plots == 'deferred':
+        return None, plot_render.save_spec(spec, plot_render.spec_dir(out_root))
+    if args.plots == 'eager':
+        return (render or plot_render.render)(spec), None
+    return None, None
+
+
+def write_pdd_report(args, pdd: dict, criteria, grid_step: float, out_root: str, pairs=None, render=None) -> dict:
+    """PDD RMSE/gamma, report and plot for the shared PDD pair; returns the ``pdd_*`` result fields.
+
+    ``render`` writes a plot spec (default ``plot_render.render``; ``RenderPool.submit`` defers it).
+    """
+    z_ref_pos, z_ref_norm = pdd['ref_pos'], pdd['ref_norm']
+    z_eval_pos, z_eval_norm = pdd['eval_pos'], pdd['eval_norm']
+    plot_dir = os.path.join(out_root, 'plots')
+    report_dir = os.path.join(out_root, 'reports')
+    data_dir = os.path.join(out_root, 'data')
+    pdd_plot_path = None
+
+    # Resample on common grid for RMSE
+    def resample_1d(x1, y1, x2, y2, step):
+        if not step or step <= 0:
+            return None, None, None
+        xmin = max(np.min(x1), np.min(x2)); xmax = min(np.max(x1), np.max(x2))
+        if xmax - xmin <= step * 2:
+            return None, None, None
+        n = int(np.floor((xmax - xmin) / step)) + 1
+        grid = xmin + np.arange(n + 1) * step
+        return grid, np.interp(grid, x1, y1), np.interp(grid, x2, y2)
+
+    grid_pdd, pdd_ref_g, pdd_eval_g = resample_1d(z_ref_pos, z_ref_norm, z_eval_pos, z_eval_norm, grid_step)
+    if grid_pdd is not None:
+        pdd_rmse = float(np.sqrt(np.mean((pdd_ref_g - pdd_eval_g) ** 2)))
+        zr, yrp = grid_pdd, pdd_ref_g
+        ze, yep = grid_pdd, pdd_eval_g
     else:
-        _, z_eval_pos, z_eval_dose, _ = parse_phits_out_profile(args.eval_pdd_file)
-    z_eval_pos = z_eval_pos + args.eval_pdd_z_shift
-    z_eval_pos, z_eval_norm = normalize_pdd(z_eval_pos, z_eval_dose, args.norm_mode, args.z_ref)
+        pdd_rmse = float(np.sqrt(np.mean((np.interp(z_ref_pos, z_eval_pos, z_eval_norm) - z_ref_norm) ** 2)))
+        zr, yrp = z_ref_pos, z_ref_norm
+        ze, yep = z_eval_pos, z_eval_norm
+
+    pdd_rates, _ = compute_gamma_rates(zr, yrp, ze, yep, criteria, args.gamma_backend)
+    pdd_g1, pdd_g2 = pdd_rates[0], pdd_rates[1]
+    if args.gamma_surface and np.max(yrp) > 0:
+        ref_pdd_base = os.path.splitext(os.path.basename(args.ref_pdd_file))[0]
+        eval_pdd_base = os.path.splitext(os.path.basename(args.eval_pdd_file))[0]
+        surface_path = write_gamma_surface(
+            os.path.join(data_dir, f"PDDGammaSurface_{ref_pdd_base}_vs_{eval_pdd_base}_cut{args.cutoff:g}_{args.gamma_mode}.csv"),
+            zr, yrp, ze, yep, args.surface_dd, args.surface_dta, args.cutoff, args.gamma_mode)
+        print("PDD gamma surface saved: " + surface_path)
 
+    ref_pdd_base = os.path.splitext(os.path.basename(args.ref_pdd_file))[0]
+    eval_pdd_base = os.path.splitext(os.path.basename(args.eval_pdd_file))[0]
+    pdd_report_path = os.path.join(report_dir, f"PDDReport_{ref_pdd_base}_vs_{eval_pdd_base}_norm-{args.norm_mode}_zref-{args.z_ref:g}.txt")
+    with open(pdd_report_path, 'w', encoding='utf-8') as fp:
+        fp.write('# PDD comparison report\n\n')
+        fp.write('## Inputs\n')
+        fp.write(f"ref PDD: {args.ref_pdd_type} | {args.ref_pdd_file}\n")
+        fp.write(f"eval PDD: {args.eval_pdd_type} | {args.eval_pdd_file}\n")
+        fp.write('\n## Params\n')
+        fp.write(f"norm-mode: {args.norm_mode}, z_ref: {args.z_ref} cm\n")
+        fp.write(f"gamma-mode: {args.gamma_mode}\n")
+        fp.write(f"grid (cm): {grid_step:.6f}\n")
+        if pdd.get('registration') is not None:
+            reg = pdd['registration']
+            fp.write(f"registered eval-pdd-z-shift ({reg['metric']}): {reg['shift_cm']:+.6f} cm "
+                     f"(total {args.eval_pdd_z_shift + reg['shift_cm']:+.6f} cm), scale: {reg['scale']:.6f}\n")
+        fp.write('\n## Results\n')
+        fp.write(f"RMSE: {pdd_rmse:.6f}\n")
+        fp.write(f"Gamma 1 (DD={args.dd1:.1f}%, DTA={args.dta1:.1f}mm, Cutoff={args.cutoff:.1f}%): {pdd_g1:.2f}%\n")
+        fp.write(f"Gamma 2 (DD={args.dd2:.1f}%, DTA={args.dta2:.1f}mm, Cutoff={args.cutoff:.1f}%): {pdd_g2:.2f}%\n")
+        for c, rate in zip(criteria[2:], pdd_rates[2:]):
+            fp.write(f"Gamma ({format_criterion(c)}): {rate:.2f}%\n")
+        # Re-run command line (same as TrueReport)
+        fp.write('\n## Re-run\n')
+        fp.write(rerun_command(args, pairs) + '\n')
+    print("PDD Report saved: " + pdd_report_path)
+
+    # PDD plot
+    pdd_plot_spec_path = None
+    if args.plots != 'none':
+        try:
+            pdd_plot_path, pdd_plot_spec_path = emit_plot(args, {
+                'kind': 'pdd', 'figsize': (10, 6),
+                'path': os.path.join(plot_dir, f"PDDComp_{ref_pdd_base}_vs_{eval_pdd_base}_norm-{args.norm_mode}_zref-{args.z_ref:g}.png"),
+                'series': [{'x': z_ref_pos, 'y': z_ref_norm, 'label': (args.legend_ref or 'Reference') + ' PDD'},
+                           {'x': z_eval_pos, 'y': z_eval_norm, 'label': (args.legend_eval or 'Evaluation') + ' PDD'}],
+                'title': "PDD comparison [gamma: {}]\n".format(args.gamma_mode)
+                         + "norm={}, z_ref={} cm".format(args.norm_mode, args.z_ref),
+                'xlabel': 'z (cm)', 'ylabel': 'PDD (norm)', 'grid': {'alpha': 0.3},
+                'legend': {'title': f"gamma-mode: {args.gamma_mode}"},
+            }, out_root, render)
+            if pdd_plot_path:
+                print("PDD Plot saved: " + pdd_plot_path)
+            elif pdd_plot_spec_path:
+                print("PDD Plot deferred: " + pdd_plot_spec_path)
+        except Exception:
+            pass
+    return {
+        'pdd_rmse': pdd_rmse,
+        'pdd_gamma1_gpr_percent': pdd_g1,
+        'pdd_gamma2_gpr_percent': pdd_g2,
+        'pdd_report_path': pdd_report_path,
+        'pdd_plot_path': pdd_plot_path,
+        'pdd_plot_spec_path': pdd_plot_spec_path,
+    }
+
+
+def load_ocr_pair(args, cache: Optional[ProfileCache] = None) -> dict:
+    """Load, centre-normalise and smooth one OCR pair; depths in cm, ``axis`` is the scan axis."""
+    ref_axis = axis = None
     # OCR load & center-normalise
     def _guess_type(p: str) -> str:
         b = os.path.basename(p).lower()
@@ -258,11 +610,10 @@ def main():
             pass
         ref_ocr_type = 'phits'
     if ref_ocr_type == 'csv':
-        x_ref, ocr_ref = load_csv_profile(args.ref_ocr_file)
-        m = re.search(r"([0-9]+(?:\.[0-9]+)?)\s*cm", os.path.basename(args.ref_ocr_file), re.IGNORECASE)
-        z_depth_ref = float(m.group(1)) if m else args.z_ref
+        _, x_ref, ocr_ref, _ = load_profile('csv', args.ref_ocr_file, cache)
+        z_depth_ref = _extract_depth_cm_from_csv_filename(args.ref_ocr_file, args.z_ref)
     else:
-        axis, pos, dose, meta = parse_phits_out_profile(args.ref_ocr_file)
+        ref_axis, pos, dose, meta = load_profile('phits', args.ref_ocr_file, cache)
         z_depth_ref = meta.get('y_center_cm', None)
         if z_depth_ref is None:
             z_depth_ref = _extract_depth_cm_from_phits_filename(args.ref_ocr_file)
@@ -283,11 +634,10 @@ def main():
             pass
         eval_ocr_type = 'phits'
     if eval_ocr_type == 'csv':
-        x_eval, ocr_eval = load_csv_profile(args.eval_ocr_file)
-        m = re.search(r"([0-9]+(?:\.[0-9]+)?)\s*cm", os.path.basename(args.eval_ocr_file), re.IGNORECASE)
-        z_depth_eval = float(m.group(1)) if m else args.z_ref
+        _, x_eval, ocr_eval, _ = load_profile('csv', args.eval_ocr_file, cache)
+        z_depth_eval = _extract_depth_cm_from_csv_filename(args.eval_ocr_file, args.z_ref)
     else:
-        axis, pos, dose, meta = parse_phits_out_profile(args.eval_ocr_file)
+        axis, pos, dose, meta = load_profile('phits', args.eval_ocr_file, cache)
         z_depth_eval = meta.get('y_center_cm', None)
         if z_depth_eval is None:
             z_depth_eval = _extract_depth_cm_from_phits_filename(args.eval_ocr_file)
@@ -305,6 +655,7 @@ def main():
 
     # Optional smoothing (renormalise to peak=1 afterwards)
     if not args.no_smooth:
+        savgol_filter = _optional('scipy.signal', 'OCR smoothing (--no-smooth skips it)').savgol_filter
         try:
             w = args.smooth_window if args.smooth_window % 2 == 1 else args.smooth_window + 1
             o = args.smooth_order
@@ -319,6 +670,33 @@ def main():
         except Exception:
             pass
 
+    reg = None
+    if args.register in ('ocr', 'both'):
+        # Lateral shift of the evaluation profile after centre normalisation
+        reg = register_curves(args, x_ref, ocr_ref_rel, x_eval, ocr_eval_rel)
+        x_eval = x_eval + reg['shift_cm']
+        ocr_eval_rel = ocr_eval_rel * reg['scale']
+
+    if not axis and not ref_axis:
+        meta_name = parse_measured_name(args.ref_ocr_file) or parse_measured_name(args.eval_ocr_file) or {}
+        ref_axis = meta_name.get('axis')
+    return {
+        'x_ref': x_ref, 'ref_rel': ocr_ref_rel, 'ref_depth_cm': float(z_depth_ref),
+        'x_eval': x_eval, 'eval_rel': ocr_eval_rel, 'eval_depth_cm': float(z_depth_eval),
+        'axis': axis or ref_axis or 'x', 'registration': reg,
+    }
+
+
+def compare_ocr(args, pdd: dict, pdd_summary: dict, criteria, grid_step: float, out_root: str,
+                cache: Optional[ProfileCache] = None, ocr: Optional[dict] = None, render=None) -> dict:
+    """True-scaling comparison of one OCR pair (``args.ref_ocr_file``/``args.eval_ocr_file``)."""
+    z_ref_pos, z_ref_norm = pdd['ref_pos'], pdd['ref_norm']
+    z_eval_pos, z_eval_norm = pdd['eval_pos'], pdd['eval_norm']
+    if ocr is None:
+        ocr = load_ocr_pair(args, cache)
+    x_ref, ocr_ref_rel, z_depth_ref = ocr['x_ref'], ocr['ref_rel'], ocr['ref_depth_cm']
+    x_eval, ocr_eval_rel, z_depth_eval = ocr['x_eval'], ocr['eval_rel'], ocr['eval_depth_cm']
+
     # True series
     s_axis_ref = float(np.interp(z_depth_ref, z_ref_pos, z_ref_norm))
     s_axis_eval = float(np.interp(z_depth_eval, z_eval_pos, z_eval_norm))
@@ -326,19 +704,6 @@ def main():
     y_true_eval = s_axis_eval * ocr_eval_rel
 
     # RMSE and gamma
-    grid_step = args.grid
-    if grid_step is None:
-        cfg = configparser.ConfigParser()
-        prj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        cfg_path = os.path.join(prj_root, 'config.ini')
-        if os.path.exists(cfg_path):
-            try:
-                cfg.read(cfg_path, encoding='utf-8')
-                grid_step = float(cfg.get('Processing', 'resample_grid_cm', fallback='0.1'))
-            except Exception:
-                grid_step = 0.1
-        else:
-            grid_step = 0.1
 
     def resample(x1, y1, x2, y2, step):
         if not step or step <= 0:
@@ -360,36 +725,15 @@ def main():
         xr, yr = x_ref, y_true_ref
         xe, ye = x_eval, y_true_eval
 
-    g1 = compute_gamma(xr, yr, xe, ye, args.dd1, args.dta1, args.cutoff, args.gamma_mode)
-    g2 = compute_gamma(xr, yr, xe, ye, args.dd2, args.dta2, args.cutoff, args.gamma_mode)
+    ocr_rates, ocr_gamma = compute_gamma_rates(xr, yr, xe, ye, criteria, args.gamma_backend)
+    g1, g2 = ocr_rates[0], ocr_rates[1]
     print("RMSE: {:.6f}".format(rmse))
     print("Gamma pass (DD={:.1f}%, DTA={:.1f}mm, Cutoff={:.1f}%): {:.2f}%".format(args.dd1, args.dta1, args.cutoff, g1))
     print("Gamma pass (DD={:.1f}%, DTA={:.1f}mm, Cutoff={:.1f}%): {:.2f}%".format(args.dd2, args.dta2, args.cutoff, g2))
+    for c, rate in zip(criteria[2:], ocr_rates[2:]):
+        print("Gamma pass ({}): {:.2f}%".format(format_criterion(c), rate))
 
     # FWHM check
-    def fwhm(x, y):
-        if x.size < 3:
-            return None
-        i = int(np.argmax(y)); peak = float(y[i])
-        if peak <= 0:
-            return None
-        half = 0.5 * peak
-        L = None
-        for k in range(i, 0, -1):
-            y0, y1 = y[k - 1], y[k]
-            if (y0 <= half <= y1) or (y1 <= half <= y0):
-                x0, x1 = x[k - 1], x[k]
-                L = float(x0 if y1 == y0 else x0 + (half - y0) * (x1 - x0) / (y1 - y0))
-                break
-        R = None
-        for k in range(i, len(x) - 1):
-            y0, y1 = y[k], y[k + 1]
-            if (y0 <= half <= y1) or (y1 <= half <= y0):
-                x0, x1 = x[k], x[k + 1]
-                R = float(x1 if y1 == y0 else x0 + (half - y0) * (x1 - x0) / (y1 - y0))
-                break
-        return None if (L is None or R is None) else float(abs(R - L))
-
     f1 = fwhm(x_ref, ocr_ref_rel); f2 = fwhm(x_eval, ocr_eval_rel)
     f_delta = None
     if f1 is not None and f2 is not None:
@@ -403,46 +747,51 @@ def main():
             )
 
     # Outputs
-    prj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    out_root = args.output_dir or os.path.join(prj_root, 'output')
     plot_dir = os.path.join(out_root, 'plots')
     report_dir = os.path.join(out_root, 'reports')
     data_dir = os.path.join(out_root, 'data')
-    os.makedirs(plot_dir, exist_ok=True)
-    os.makedirs(report_dir, exist_ok=True)
-    os.makedirs(data_dir, exist_ok=True)
 
     ref_base = os.path.splitext(os.path.basename(args.ref_ocr_file))[0]
     eval_base = os.path.splitext(os.path.basename(args.eval_ocr_file))[0]
+    if args.gamma_surface and np.max(yr) > 0:
+        surface_path = write_gamma_surface(
+            os.path.join(data_dir, f"GammaSurface_{ref_base}_vs_{eval_base}_z{z_depth_ref:g}-{z_depth_eval:g}_cut{args.cutoff:g}_{args.gamma_mode}.csv"),
+            xr, yr, xe, ye, args.surface_dd, args.surface_dta, args.cutoff, args.gamma_mode)
+        print("Gamma surface saved: " + surface_path)
+    reg = ocr.get('registration')
+    ocr_registration = None
+    if reg is not None:
+        ocr_registration = write_registration(
+            os.path.join(data_dir, f"Registration_{ref_base}_vs_{eval_base}_{reg['metric']}.csv"), reg)
+        print("OCR registration ({}): lateral shift={:+.4f} cm, scale={:.4f}, RMSE(rel)={:.6f}".format(
+            reg['metric'], reg['shift_cm'], reg['scale'], reg['rmse']))
+        print("OCR registration landscape saved: " + ocr_registration['landscape_path'])
     title = (
         "True-scaling (PDD-weighted) [gamma: {}]\n".format(args.gamma_mode)
         + "norm={}, z_ref={} cm / ref_z={:.3f} cm, eval_z={:.3f} cm".format(
             args.norm_mode, args.z_ref, z_depth_ref, z_depth_eval
         )
     )
-    try:
-        import matplotlib as _mpl
-        _mpl.rcParams['font.family'] = ['DejaVu Sans', 'Arial']
-        _mpl.rcParams['axes.unicode_minus'] = False
-    except Exception:
-        pass
-
-    plt.figure(figsize=(12, 8))
-    plt.plot(x_ref, y_true_ref, label=args.legend_ref or 'Reference')
-    plt.plot(x_eval, y_true_eval, label=args.legend_eval or 'Evaluation')
-    plt.title(title)
-    plt.xlabel('x (cm)')
-    plt.ylabel('True dose (a.u.)')
-    plt.grid(True, alpha=0.3)
-    if args.ymin is not None or args.ymax is not None:
-        plt.ylim(args.ymin, args.ymax)
-    if args.xlim_symmetric:
-        xmax = max(abs(np.min(x_ref)), abs(np.max(x_ref)), abs(np.min(x_eval)), abs(np.max(x_eval)))
-        plt.xlim(-xmax, xmax)
-    plt.legend(title=f"gamma-mode: {args.gamma_mode}")
-    plot_path = os.path.join(plot_dir, f"TrueComp_{ref_base}_vs_{eval_base}_norm-{args.norm_mode}_zref-{args.z_ref:g}_z-{z_depth_ref:g}-{z_depth_eval:g}.png")
-    plt.savefig(plot_path)
-    print("Plot saved: " + plot_path)
+    plot_path = plot_spec_path = None
+    if args.plots != 'none':
+        xlim = None
+        if args.xlim_symmetric:
+            xmax = max(abs(np.min(x_ref)), abs(np.max(x_ref)), abs(np.min(x_eval)), abs(np.max(x_eval)))
+            xlim = (-xmax, xmax)
+        plot_path, plot_spec_path = emit_plot(args, {
+            'kind': 'ocr', 'figsize': (12, 8),
+            'path': os.path.join(plot_dir, f"TrueComp_{ref_base}_vs_{eval_base}_norm-{args.norm_mode}_zref-{args.z_ref:g}_z-{z_depth_ref:g}-{z_depth_eval:g}.png"),
+            'series': [{'x': x_ref, 'y': y_true_ref, 'label': args.legend_ref or 'Reference'},
+                       {'x': x_eval, 'y': y_true_eval, 'label': args.legend_eval or 'Evaluation'}],
+            'title': title, 'xlabel': 'x (cm)', 'ylabel': 'True dose (a.u.)', 'grid': {'alpha': 0.3},
+            'xlim': xlim, 'ylim': None if args.ymin is None and args.ymax is None else (args.ymin, args.ymax),
+            'legend': {'title': f"gamma-mode: {args.gamma_mode}"},
+            'rc': {'font.family': ['DejaVu Sans', 'Arial'], 'axes.unicode_minus': False},
+        }, out_root, render)
+        if plot_path:
+            print("Plot saved: " + plot_path)
+        elif plot_spec_path:
+            print("Plot deferred: " + plot_spec_path)
 
     report_path = os.path.join(report_dir, f"TrueReport_{ref_base}_vs_{eval_base}_norm-{args.norm_mode}_zref-{args.z_ref:g}_z-{z_depth_ref:g}-{z_depth_eval:g}.txt")
     with open(report_path, 'w', encoding='utf-8') as f:
@@ -458,12 +807,19 @@ def main():
         f.write(f"ref depth (cm): {z_depth_ref:.6f}, eval depth (cm): {z_depth_eval:.6f}\n")
         if args.eval_z_shift != 0 or args.eval_pdd_z_shift != 0:
             f.write(f"eval-z-shift: {args.eval_z_shift} cm, eval-pdd-z-shift: {args.eval_pdd_z_shift} cm\n")
+        if reg is not None:
+            f.write(f"registered eval lateral shift ({reg['metric']}): {reg['shift_cm']:+.6f} cm, scale: {reg['scale']:.6f}\n")
+        if pdd.get('registration') is not None:
+            f.write(f"registered eval-pdd-z-shift ({pdd['registration']['metric']}): "
+                    f"{pdd['registration']['shift_cm']:+.6f} cm\n")
         f.write(f"S_axis(ref): {s_axis_ref:.6f}, S_axis(eval): {s_axis_eval:.6f}\n")
         f.write(f"grid (cm): {grid_step:.6f}\n")
         f.write('\n## Results\n')
         f.write(f"RMSE: {rmse:.6f}\n")
         f.write(f"Gamma 1 (DD={args.dd1:.1f}%, DTA={args.dta1:.1f}mm, Cutoff={args.cutoff:.1f}%): {g1:.2f}%\n")
         f.write(f"Gamma 2 (DD={args.dd2:.1f}%, DTA={args.dta2:.1f}mm, Cutoff={args.cutoff:.1f}%): {g2:.2f}%\n")
+        for c, rate in zip(criteria[2:], ocr_rates[2:]):
+            f.write(f"Gamma ({format_criterion(c)}): {rate:.2f}%\n")
         # FWHM summary in report
         def _fmt(v):
             try:
@@ -474,63 +830,8 @@ def main():
         f.write(f"FWHM(eval) (cm): {_fmt(f2)}\n")
         f.write(f"FWHM delta (eval-ref) (cm): {_fmt(f_delta)}\n")
         # Re-run command line (for reproducibility)
-        try:
-            def _q(v: str) -> str:
-                v = str(v)
-                return '"' + v.replace('"', '\\"') + '"' if (' ' in v or '\\' in v) else v
-            argv = [
-                sys.executable,
-                os.path.join(prj_root, 'src', 'ocr_true_scaling.py'),
-                '--ref-pdd-type', args.ref_pdd_type,
-                '--ref-pdd-file', args.ref_pdd_file,
-                '--eval-pdd-type', args.eval_pdd_type,
-                '--eval-pdd-file', args.eval_pdd_file,
-                '--ref-ocr-type', args.ref_ocr_type,
-                '--ref-ocr-file', args.ref_ocr_file,
-                '--eval-ocr-type', args.eval_ocr_type,
-                '--eval-ocr-file', args.eval_ocr_file,
-                '--norm-mode', args.norm_mode,
-                '--z-ref', str(args.z_ref),
-                '--dd1', str(args.dd1), '--dta1', str(args.dta1),
-                '--dd2', str(args.dd2), '--dta2', str(args.dta2),
-                '--gamma-mode', args.gamma_mode,
-                '--cutoff', str(args.cutoff),
-                '--smooth-window', str(args.smooth_window),
-                '--smooth-order', str(args.smooth_order),
-                '--center-tol-cm', str(args.center_tol_cm),
-                '--eval-z-shift', str(args.eval_z_shift),
-                '--eval-pdd-z-shift', str(args.eval_pdd_z_shift),
-            ]
-            if args.center_interp:
-                argv.append('--center-interp')
-            if args.no_smooth:
-                argv.append('--no-smooth')
-            if args.grid is not None:
-                argv.extend(['--grid', str(args.grid)])
-            if args.ymin is not None:
-                argv.extend(['--ymin', str(args.ymin)])
-            if args.ymax is not None:
-                argv.extend(['--ymax', str(args.ymax)])
-            if args.xlim_symmetric:
-                argv.append('--xlim-symmetric')
-            if args.legend_ref:
-                argv.extend(['--legend-ref', args.legend_ref])
-            if args.legend_eval:
-                argv.extend(['--legend-eval', args.legend_eval])
-            if args.fwhm_warn_cm is not None:
-                argv.extend(['--fwhm-warn-cm', str(args.fwhm_warn_cm)])
-            if args.output_dir:
-                argv.extend(['--output-dir', args.output_dir])
-            if args.export_csv:
-                argv.append('--export-csv')
-            if args.export_gamma:
-                argv.append('--export-gamma')
-            cmd_line = ' '.join(_q(a) for a in argv)
-            prefix = '& ' if os.name == 'nt' else ''
-            f.write('\n## Re-run\n')
-            f.write(prefix + cmd_line + '\n')
-        except Exception:
-            pass
+        f.write('\n## Re-run\n')
+        f.write(rerun_command(args) + '\n')
     print("Report saved: " + report_path)
 
     # Optional JSON report for automation
@@ -551,6 +852,7 @@ def main():
                 'norm_mode': args.norm_mode,
                 'z_ref_cm': float(args.z_ref),
                 'gamma_mode': args.gamma_mode,
+                'gamma_backend': args.gamma_backend,
                 'dd1_percent': float(args.dd1),
                 'dta1_mm': float(args.dta1),
                 'dd2_percent': float(args.dd2),
@@ -565,6 +867,7 @@ def main():
                 'fwhm_warn_cm': float(args.fwhm_warn_cm),
                 'eval_z_shift': float(args.eval_z_shift),
                 'eval_pdd_z_shift': float(args.eval_pdd_z_shift),
+                'register': args.register,
             },
             'derived': {
                 'ref_depth_cm': _float(z_depth_ref),
@@ -574,12 +877,20 @@ def main():
                 'fwhm_ref_cm': _float(f1),
                 'fwhm_eval_cm': _float(f2),
                 'fwhm_delta_cm': _float(f_delta),
+                'ocr_registration': ocr_registration,
+                'pdd_registration': pdd_summary.get('pdd_registration'),
             },
             'results': {
                 'rmse': _float(rmse, 0.0),
                 'gamma1_gpr_percent': _float(g1, 0.0),
                 'gamma2_gpr_percent': _float(g2, 0.0),
+                'gamma_criteria': [
+                    {'dd_percent': c[0], 'dta_mm': c[1], 'cutoff_percent': c[2],
+                     'mode': 'local' if c[3] else 'global', 'gpr_percent': _float(rate, 0.0)}
+                    for c, rate in zip(criteria, ocr_rates)
+                ],
                 'plot_path': plot_path,
+                'plot_spec_path': plot_spec_path,
                 'report_path': report_path,
             }
         }
@@ -590,129 +901,9 @@ def main():
         except Exception as e:
             print("JSON report write failed: " + str(e), file=sys.stderr)
 
-    # PDD comparison report (always by default; can be disabled by --no-pdd-report)
-    if not args.no_pdd_report:
-        # Resample on common grid for RMSE
-        def resample_1d(x1, y1, x2, y2, step):
-            if not step or step <= 0:
-                return None, None, None
-            xmin = max(np.min(x1), np.min(x2)); xmax = min(np.max(x1), np.max(x2))
-            if xmax - xmin <= step * 2:
-                return None, None, None
-            n = int(np.floor((xmax - xmin) / step)) + 1
-            grid = xmin + np.arange(n + 1) * step
-            return grid, np.interp(grid, x1, y1), np.interp(grid, x2, y2)
-
-        grid_pdd, pdd_ref_g, pdd_eval_g = resample_1d(z_ref_pos, z_ref_norm, z_eval_pos, z_eval_norm, grid_step)
-        if grid_pdd is not None:
-            pdd_rmse = float(np.sqrt(np.mean((pdd_ref_g - pdd_eval_g) ** 2)))
-            zr, yrp = grid_pdd, pdd_ref_g
-            ze, yep = grid_pdd, pdd_eval_g
-        else:
-            pdd_rmse = float(np.sqrt(np.mean((np.interp(z_ref_pos, z_eval_pos, z_eval_norm) - z_ref_norm) ** 2)))
-            zr, yrp = z_ref_pos, z_ref_norm
-            ze, yep = z_eval_pos, z_eval_norm
-
-        pdd_g1 = compute_gamma(zr, yrp, ze, yep, args.dd1, args.dta1, args.cutoff, args.gamma_mode)
-        pdd_g2 = compute_gamma(zr, yrp, ze, yep, args.dd2, args.dta2, args.cutoff, args.gamma_mode)
-
-        ref_pdd_base = os.path.splitext(os.path.basename(args.ref_pdd_file))[0]
-        eval_pdd_base = os.path.splitext(os.path.basename(args.eval_pdd_file))[0]
-        pdd_report_path = os.path.join(report_dir, f"PDDReport_{ref_pdd_base}_vs_{eval_pdd_base}_norm-{args.norm_mode}_zref-{args.z_ref:g}.txt")
-        with open(pdd_report_path, 'w', encoding='utf-8') as f2:
-            f2.write('# PDD comparison report\n\n')
-            f2.write('## Inputs\n')
-            f2.write(f"ref PDD: {args.ref_pdd_type} | {args.ref_pdd_file}\n")
-            f2.write(f"eval PDD: {args.eval_pdd_type} | {args.eval_pdd_file}\n")
-            f2.write('\n## Params\n')
-            f2.write(f"norm-mode: {args.norm_mode}, z_ref: {args.z_ref} cm\n")
-            f2.write(f"gamma-mode: {args.gamma_mode}\n")
-            f2.write(f"grid (cm): {grid_step:.6f}\n")
-            f2.write('\n## Results\n')
-            f2.write(f"RMSE: {pdd_rmse:.6f}\n")
-            f2.write(f"Gamma 1 (DD={args.dd1:.1f}%, DTA={args.dta1:.1f}mm, Cutoff={args.cutoff:.1f}%): {pdd_g1:.2f}%\n")
-            f2.write(f"Gamma 2 (DD={args.dd2:.1f}%, DTA={args.dta2:.1f}mm, Cutoff={args.cutoff:.1f}%): {pdd_g2:.2f}%\n")
-            # Re-run command line (same as TrueReport)
-            try:
-                def _q(v: str) -> str:
-                    v = str(v)
-                    return '"' + v.replace('"', '\\"') + '"' if (' ' in v or '\\' in v) else v
-                argv = [
-                    sys.executable,
-                    os.path.join(prj_root, 'src', 'ocr_true_scaling.py'),
-                    '--ref-pdd-type', args.ref_pdd_type,
-                    '--ref-pdd-file', args.ref_pdd_file,
-                    '--eval-pdd-type', args.eval_pdd_type,
-                    '--eval-pdd-file', args.eval_pdd_file,
-                    '--ref-ocr-type', args.ref_ocr_type,
-                    '--ref-ocr-file', args.ref_ocr_file,
-                    '--eval-ocr-type', args.eval_ocr_type,
-                    '--eval-ocr-file', args.eval_ocr_file,
-                    '--norm-mode', args.norm_mode,
-                    '--z-ref', str(args.z_ref),
-                    '--dd1', str(args.dd1), '--dta1', str(args.dta1),
-                    '--dd2', str(args.dd2), '--dta2', str(args.dta2),
-                    '--gamma-mode', args.gamma_mode,
-                    '--cutoff', str(args.cutoff),
-                    '--smooth-window', str(args.smooth_window),
-                    '--smooth-order', str(args.smooth_order),
-                    '--center-tol-cm', str(args.center_tol_cm),
-                    '--eval-z-shift', str(args.eval_z_shift),
-                    '--eval-pdd-z-shift', str(args.eval_pdd_z_shift),
-                ]
-                if args.center_interp:
-                    argv.append('--center-interp')
-                if args.no_smooth:
-                    argv.append('--no-smooth')
-                if args.grid is not None:
-                    argv.extend(['--grid', str(args.grid)])
-                if args.ymin is not None:
-                    argv.extend(['--ymin', str(args.ymin)])
-                if args.ymax is not None:
-                    argv.extend(['--ymax', str(args.ymax)])
-                if args.xlim_symmetric:
-                    argv.append('--xlim-symmetric')
-                if args.legend_ref:
-                    argv.extend(['--legend-ref', args.legend_ref])
-                if args.legend_eval:
-                    argv.extend(['--legend-eval', args.legend_eval])
-                if args.fwhm_warn_cm is not None:
-                    argv.extend(['--fwhm-warn-cm', str(args.fwhm_warn_cm)])
-                if args.output_dir:
-                    argv.extend(['--output-dir', args.output_dir])
-                if args.export_csv:
-                    argv.append('--export-csv')
-                if args.export_gamma:
-                    argv.append('--export-gamma')
-                cmd_line = ' '.join(_q(a) for a in argv)
-                prefix = '& ' if os.name == 'nt' else ''
-                f2.write('\n## Re-run\n')
-                f2.write(prefix + cmd_line + '\n')
-            except Exception:
-                pass
-        print("PDD Report saved: " + pdd_report_path)
-
-        # PDD plot
-        try:
-            plt.figure(figsize=(10, 6))
-            plt.plot(z_ref_pos, z_ref_norm, label=(args.legend_ref or 'Reference') + ' PDD')
-            plt.plot(z_eval_pos, z_eval_norm, label=(args.legend_eval or 'Evaluation') + ' PDD')
-            plt.title(
-                "PDD comparison [gamma: {}]\n".format(args.gamma_mode)
-                + "norm={}, z_ref={} cm".format(args.norm_mode, args.z_ref)
-            )
-            plt.xlabel('z (cm)')
-            plt.ylabel('PDD (norm)')
-            plt.grid(True, alpha=0.3)
-            plt.legend(title=f"gamma-mode: {args.gamma_mode}")
-            pdd_plot_path = os.path.join(plot_dir, f"PDDComp_{ref_pdd_base}_vs_{eval_pdd_base}_norm-{args.norm_mode}_zref-{args.z_ref:g}.png")
-            plt.savefig(pdd_plot_path)
-            print("PDD Plot saved: " + pdd_plot_path)
-        except Exception:
-            pass
-
     # CSV exports
     if args.export_csv:
+        pd = _optional('pandas', '--export-csv')
         pd.DataFrame({'x_cm': x_ref, 'true_dose': y_true_ref}).to_csv(
             os.path.join(data_dir, f"TrueRef_{ref_base}_z{z_depth_ref:g}.csv"), index=False, encoding='utf-8'
         )
@@ -727,19 +918,235 @@ def main():
                 os.path.join(data_dir, f"TrueEvalResampled_{eval_base}_z{z_depth_eval:g}_grid{grid_step:g}.csv"), index=False, encoding='utf-8'
             )
         if args.export_gamma:
-            g = pymedphys.gamma(
-                axes_reference=(xr * 10.0,), dose_reference=yr,
-                axes_evaluation=(xe * 10.0,), dose_evaluation=np.interp(xr, xe, ye),
-                dose_percent_threshold=args.dd1,
-                distance_mm_threshold=args.dta1,
-                lower_percent_dose_cutoff=args.cutoff,
-                local_gamma=(args.gamma_mode == 'local'),
-                global_normalisation=float(np.max(yr)) if np.max(yr) > 0 else 1.0,
-            )
+            if grid is not None and ocr_gamma is not None:
+                g = ocr_gamma[0]  # evaluation already sits on the reference grid
+            else:
+                g = gamma_array(xr, yr, xr, np.interp(xr, xe, ye), args.dd1, args.dta1, args.cutoff,
+                                args.gamma_mode, args.gamma_backend)
             pd.DataFrame({'x_cm': xr, 'true_ref': yr, 'true_eval_interp': np.interp(xr, xe, ye), 'gamma': g}).to_csv(
                 os.path.join(data_dir, f"Gamma_{ref_base}_vs_{eval_base}_z{z_depth_ref:g}-{z_depth_eval:g}.csv"), index=False, encoding='utf-8'
             )
 
+    result = {
+        'ref_ocr_file': args.ref_ocr_file,
+        'eval_ocr_file': args.eval_ocr_file,
+        'ref_depth_cm': float(z_depth_ref),
+        'eval_depth_cm': float(z_depth_eval),
+        'S_axis_ref': float(s_axis_ref),
+        'S_axis_eval': float(s_axis_eval),
+        'rmse': rmse,
+        'gamma1_gpr_percent': g1,
+        'gamma2_gpr_percent': g2,
+        'gamma_criteria': [
+            {'dd_percent': c[0], 'dta_mm': c[1], 'cutoff_percent': c[2],
+             'mode': 'local' if c[3] else 'global', 'gpr_percent': rate}
+            for c, rate in zip(criteria, ocr_rates)
+        ],
+        'fwhm_ref_cm': None if f1 is None else float(f1),
+        'fwhm_eval_cm': None if f2 is None else float(f2),
+        'fwhm_delta_cm': None if f_delta is None else float(f_delta),
+        'ocr_registration': ocr_registration,
+        'plot_path': plot_path,
+        'plot_spec_path': plot_spec_path,
+        'report_path': report_path,
+    }
+    result.update(pdd_summary)
+    return result
+
+
+def write_dose_maps(args, pdd: dict, ocrs: list, criteria, grid_step: float, out_root: str) -> list:
+    """Reference/evaluation dose maps D(z, x) per scan axis, their 2D gamma, npz/CSV exports and a report."""
+    ref_pdd_base = os.path.splitext(os.path.basename(args.ref_pdd_file))[0]
+    eval_pdd_base = os.path.splitext(os.path.basename(args.eval_pdd_file))[0]
+    step = args.map_dz or grid_step or 0.1
+    summaries = []
+    for axis in sorted({o['axis'] for o in ocrs}):
+        group = [o for o in ocrs if o['axis'] == axis]
+        ref_depths = sorted({round(o['ref_depth_cm'], 6) for o in group})
+        eval_depths = sorted({round(o['eval_depth_cm'], 6) for o in group})
+        if len(ref_depths) < 2 or len(eval_depths) < 2:
+            print(f"Warning: dose map for axis {axis} needs OCRs at two or more depths; skipped", file=sys.stderr)
+            continue
+        try:
+            x_grid = uniform_grid([o['x_ref'] for o in group] + [o['x_eval'] for o in group], grid_step or 0.1)
+        except ValueError as e:
+            print(f"Warning: dose map for axis {axis}: {e}; skipped", file=sys.stderr)
+            continue
+        ref_model = build_dose_map(pdd['ref_pos'], pdd['ref_norm'], [o['ref_depth_cm'] for o in group],
+                                   [(o['x_ref'], o['ref_rel']) for o in group], x_grid, args.ssd)
+        eval_model = build_dose_map(pdd['eval_pos'], pdd['eval_norm'], [o['eval_depth_cm'] for o in group],
+                                    [(o['x_eval'], o['eval_rel']) for o in group], x_grid, args.ssd)
+        z_lo, z_hi = max(ref_depths[0], eval_depths[0]), min(ref_depths[-1], eval_depths[-1])
+        z_grid = z_lo + np.arange(int(np.floor((z_hi - z_lo) / step + 1e-9)) + 1) * step
+        ref_map, eval_map = dose_at(ref_model, z_grid), dose_at(eval_model, z_grid)
+        norm = float(np.nanmax(ref_map))
+        gammas = np.stack([gamma_map(z_grid, x_grid, ref_map, eval_map, c[0], c[1], c[2], c[3], norm) for c in criteria])
+        rates = [pass_rate(g) for g in gammas]
+        diff = eval_map - ref_map
+        rmse = float(np.sqrt(np.nanmean(diff ** 2)))
+
+        stem = f"{ref_pdd_base}_vs_{eval_pdd_base}_{axis}"
+        map_path = os.path.join(out_root, 'data', f"DoseMap_{stem}.npz")
+        np.savez_compressed(map_path, z_cm=z_grid, x_cm=x_grid, ref=ref_map, eval=eval_map, gamma=gammas,
+                            ref_depths_cm=ref_model['depths'], eval_depths_cm=eval_model['depths'])
+        print("Dose map saved: " + map_path)
+        profiles_path = None
+        if args.map_depths:
+            cols = {'x_cm': x_grid}
+            ref_q, eval_q = dose_at(ref_model, args.map_depths), dose_at(eval_model, args.map_depths)
+            for d, r, e in zip(args.map_depths, ref_q, eval_q):
+                cols[f"ref_z{d:g}"] = r
+                cols[f"eval_z{d:g}"] = e
+            profiles_path = os.path.join(out_root, 'data', f"DoseMapProfiles_{stem}.csv")
+            _optional('pandas', '--map-depths').DataFrame(cols).to_csv(profiles_path, index=False, encoding='utf-8')
+            print("Dose map profiles saved: " + profiles_path)
+
+        report_path = os.path.join(out_root, 'reports', f"DoseMapReport_{stem}.txt")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write('# Dose map report\n\n')
+            f.write('## Inputs\n')
+            f.write(f"ref PDD: {args.ref_pdd_type} | {args.ref_pdd_file}\n")
+            f.write(f"eval PDD: {args.eval_pdd_type} | {args.eval_pdd_file}\n")
+            f.write(f"axis: {axis}\n")
+            f.write(f"ref depths (cm): {', '.join(f'{d:g}' for d in ref_model['depths'])}\n")
+            f.write(f"eval depths (cm): {', '.join(f'{d:g}' for d in eval_model['depths'])}\n")
+            f.write('\n## Params\n')
+            f.write(f"map z (cm): {z_grid[0]:g} .. {z_grid[-1]:g} step {step:g}\n")
+            f.write(f"map x (cm): {x_grid[0]:g} .. {x_grid[-1]:g} step {grid_step or 0.1:g}\n")
+            f.write(f"SSD (cm): {args.ssd if args.ssd else 'none (no divergence correction)'}\n")
+            f.write('\n## Results\n')
+            f.write(f"RMSE: {rmse:.6f}\n")
+            for c, rate in zip(criteria, rates):
+                f.write(f"Gamma 2D ({format_criterion(c)}): {rate:.2f}%\n")
+            f.write('\n## Re-run\n')
+            f.write(rerun_command(args, ocr_pairs(args)) + '\n')
+        print("Dose map report saved: " + report_path)
+        print("Dose map {}: RMSE={:.6f} G1={:.2f}% G2={:.2f}%".format(axis, rmse, rates[0], rates[1]))
+        summaries.append({'axis': axis, 'rmse': rmse, 'gamma_gpr_percent': rates, 'map_path': map_path,
+                          'profiles_path': profiles_path, 'report_path': report_path})
+    return summaries
+
+
+def _pair_args(args, ref_file: str, eval_file: str, n_pairs: int):
+    # Per-pair copy of args with scalar OCR files (and a per-pair JSON report name)
+    a = argparse.Namespace(**vars(args))
+    a.ref_ocr_file, a.eval_ocr_file, a.pairs = ref_file, eval_file, None
+    if args.report_json and n_pairs > 1:
+        stem, ext = os.path.splitext(args.report_json)
+        ref_base = os.path.splitext(os.path.basename(ref_file))[0]
+        eval_base = os.path.splitext(os.path.basename(eval_file))[0]
+        a.report_json = f"{stem}_{ref_base}_vs_{eval_base}{ext or '.json'}"
+    return a
+
+
+def run_pairs(args, cache=None) -> list:
+    """Compare every OCR pair of ``args`` against one PDD pair; one result dict per pair.
+
+    The PDDs are loaded, normalised and reported once, then each OCR pair is
+    scaled from the shared PDD stage. All configuration comes from ``args``
+    (``config.ini`` is consulted only for the grid step when ``--grid`` is not
+    given), so runs can go side by side in one process or a process pool.
+    With ``--incremental`` only pairs whose stamp is stale are recomputed; the
+    PDD stage is skipped when every pair is up to date. ``cache`` (anything
+    with ``ProfileCache.load``, e.g. a long-lived ``MemoryProfileCache``)
+    replaces the cache that ``--cache`` would open.
+    """
+    criteria = gamma_criteria(args)
+    pairs = ocr_pairs(args)
+
+    prj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out_root = args.output_dir or os.path.join(prj_root, 'output')
+    if cache is None and (args.cache or args.cache_dir):
+        cache = ProfileCache(args.cache_dir or os.path.join(out_root, 'cache', 'profiles'),
+                             max_bytes=int(args.cache_max_mb * 1024 * 1024))
+        if args.clear_cache:
+            cache.invalidate()
+    grid_step = resolve_grid_step(args)
+
+    jobs = [_pair_args(args, ref_file, eval_file, len(pairs)) for ref_file, eval_file in pairs]
+    results = [None] * len(jobs)
+    stamps = {}
+    if args.incremental:
+        for i, a in enumerate(jobs):
+            inputs = [a.ref_pdd_file, a.eval_pdd_file, a.ref_ocr_file, a.eval_ocr_file]
+            stamp_file = incremental.stamp_path(out_root, inputs)
+            stamp = incremental.read_stamp(stamp_file)
+            digests = incremental.input_digests(inputs, stamp)
+            key = incremental.case_key(digests, effective_params(a, grid_step))
+            if incremental.up_to_date(stamp, key):
+                print("Up to date, skipped: " + (stamp['result'].get('report_path') or a.eval_ocr_file))
+                results[i] = dict(stamp['result'], skipped=True)
+            else:
+                stamps[i] = (stamp_file, key, digests)
+    dirty = [i for i, r in enumerate(results) if r is None]
+    if not dirty and not args.dose_map:
+        return results
+
+    for sub in ('plots', 'reports', 'data'):
+        os.makedirs(os.path.join(out_root, sub), exist_ok=True)
+    if dirty and args.plots == 'eager':
+        _optional('matplotlib', 'plotting (--plots deferred/none skip it)')
+    pdd = load_pdd_stage(args, cache)
+    pdd_summary = {'pdd_rmse': None, 'pdd_gamma1_gpr_percent': None, 'pdd_gamma2_gpr_percent': None,
+                   'pdd_report_path': None, 'pdd_plot_path': None, 'pdd_plot_spec_path': None}
+    render, pool = plot_render.renderer(args.render_workers if args.plots == 'eager' else 0)
+    loaded = {}
+    done = []
+    # RenderPool.__exit__ waits for every plot (so it is on disk before the stamps record it) or,
+    # when a stage raises, cancels the pending renders; either way the pool is shut down
+    with pool if pool is not None else contextlib.nullcontext():
+        if dirty and not args.no_pdd_report:
+            pdd_summary = write_pdd_report(args, pdd, criteria, grid_step, out_root, pairs, render)
+        pdd_summary.update(report_pdd_registration(args, pdd, out_root))
+        for i in dirty:
+            a = jobs[i]
+            if len(jobs) > 1:
+                print(f"[{i + 1}/{len(jobs)}] {os.path.basename(a.ref_ocr_file)} vs {os.path.basename(a.eval_ocr_file)}")
+            loaded[i] = load_ocr_pair(a, cache)
+            results[i] = dict(compare_ocr(a, pdd, pdd_summary, criteria, grid_step, out_root, cache, loaded[i],
+                                          render), skipped=False)
+            done.append(i)
+    if args.incremental:
+        for i in done:
+            stamp_file, key, digests = stamps[i]
+            r = results[i]
+            outputs = [r['plot_path'], r['plot_spec_path'], r['report_path'], r['pdd_report_path'], r['pdd_plot_path'],
+                       r['pdd_plot_spec_path'], jobs[i].report_json]
+            incremental.write_stamp(stamp_file, key, digests, {k: v for k, v in r.items() if k != 'skipped'}, outputs)
+    if args.dose_map:
+        ocrs = [loaded[i] if i in loaded else load_ocr_pair(a, cache) for i, a in enumerate(jobs)]
+        write_dose_maps(args, pdd, ocrs, criteria, grid_step, out_root)
+    return results
+
+
+def run(args, cache=None) -> dict:
+    """Run a single OCR comparison for parsed ``args``; returns the headline results and artifact paths."""
+    if len(ocr_pairs(args)) != 1:
+        raise ValueError("run() compares one OCR pair; use run_pairs() for several")
+    return run_pairs(args, cache)[0]
+
+
+def main(argv=None):
+    ap = build_parser()
+    args = ap.parse_args(argv)
+    try:
+        gamma_criteria(args)
+        ocr_pairs(args)
+    except (OSError, ValueError) as e:
+        ap.error(str(e))
+    try:
+        results = run_pairs(args)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if len(results) > 1:
+        print("\n# Summary")
+        for r in results:
+            state = ' (up to date)' if r.get('skipped') else ''
+            print("{} vs {}: RMSE={:.6f} G1={:.2f}% G2={:.2f}%{}".format(
+                os.path.basename(r['ref_ocr_file']), os.path.basename(r['eval_ocr_file']),
+                r['rmse'], r['gamma1_gpr_percent'], r['gamma2_gpr_percent'], state))
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,268 @@
+"""Headless, leak-free rendering of the comparison plots.
+
+A plot is described by a small dict (``spec``) of plain values and arrays, so
+it can be rendered here, on a worker process, or later from stored results:
+
+    {"kind": "ocr", "path": ".../TrueComp_....png", "figsize": [12, 8],
+     "title": "...", "xlabel": "x (cm)", "ylabel": "True dose (a.u.)",
+     "series": [{"x": [...], "y": [...], "label": "Reference"},
+                {"x": [...], "y": [...], "label": "PHITS", "type": "scatter", "style": {"s": 20}}],
+     "legend": {"title": "gamma-mode: global"}, "grid": {"alpha": 0.3},
+     "xlim": null, "ylim": null, "rc": {"axes.unicode_minus": false}}
+
+Figures are drawn with the object-oriented Matplotlib API on Agg canvases:
+no pyplot state machine, no GUI backend, nothing registered with pyplot (so
+nothing for ``plt.show()`` to pop up). One figure per plot kind and size is
+kept and cleared between renders, so a campaign does not allocate a figure per
+case; ``close_all()`` drops them. ``RenderPool`` renders on worker processes so
+the numerics do not wait for PNG encoding. Matplotlib is imported on first use.
+
+Deferred plots (``ocr_true_scaling.py --plots deferred``) store their spec as
+``<output>/cache/plots/<png stem>.npz`` (arrays + JSON metadata, like the
+profile cache); this module's command line renders selected or all of them
+later, in parallel, to the PNG path the run would have written.
+
+Usage:
+    python src/plot_render.py <output_dir|spec.npz> [...] [--match 'TrueComp_*10cm*'] [--missing] [--workers N]
+"""
+import argparse
+import fnmatch
+import glob
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_FIGURES: Dict[Tuple, tuple] = {}
+SPEC_DIR = os.path.join('cache', 'plots')
+_META_KEY = '__meta__'
+
+
+def use_agg() -> None:
+    """Select the non-interactive Agg backend for any pyplot code in this process."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _figure(kind: str, figsize, dpi):
+    # (figure, axes) reused per kind and size; Figure + FigureCanvasAgg never touches pyplot
+    key = (kind, tuple(figsize), dpi)
+    if key not in _FIGURES:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=tuple(figsize), dpi=dpi)
+        FigureCanvasAgg(fig)
+        _FIGURES[key] = (fig, fig.add_subplot())
+    return _FIGURES[key]
+
+
+def draw(ax, spec: dict) -> None:
+    """Draw the series, labels and limits of ``spec`` on ``ax`` (axes of any figure)."""
+    for s in spec.get('series', []):
+        style = dict(s.get('style') or {})
+        if s.get('type') == 'scatter':
+            ax.scatter(s['x'], s['y'], label=s.get('label'), **style)
+        else:
+            ax.plot(s['x'], s['y'], label=s.get('label'), **style)
+    if spec.get('title'):
+        ax.set_title(spec['title'], **(spec.get('title_style') or {}))
+    ax.set_xlabel(spec.get('xlabel', ''), **(spec.get('label_style') or {}))
+    ax.set_ylabel(spec.get('ylabel', ''), **(spec.get('label_style') or {}))
+    if spec.get('grid') is not None:
+        ax.grid(True, **spec['grid'])
+    if spec.get('xlim') is not None:
+        ax.set_xlim(*spec['xlim'])
+    if spec.get('ylim') is not None:
+        ax.set_ylim(*spec['ylim'])
+    if spec.get('legend') is not None:
+        ax.legend(**spec['legend'])
+
+
+def render(spec: dict) -> str:
+    """Write ``spec`` to ``spec['path']`` (format from the extension); returns the path."""
+    import matplotlib
+    with matplotlib.rc_context(spec.get('rc') or {}):
+        fig, ax = _figure(spec.get('kind', 'plot'), spec.get('figsize', (10, 6)), spec.get('dpi'))
+        ax.clear()
+        try:
+            draw(ax, spec)
+            fig.savefig(spec['path'])
+        finally:
+            ax.clear()  # drop the artists (and their arrays) until the next render
+    return spec['path']
+
+
+def close_all() -> int:
+    """Release every cached figure; returns how many were open."""
+    n = len(_FIGURES)
+    for fig, _ in _FIGURES.values():
+        fig.clear()
+    _FIGURES.clear()
+    return n
+
+
+def open_figures() -> int:
+    return len(_FIGURES)
+
+
+def _init_renderer() -> None:
+    use_agg()
+    import matplotlib.figure  # noqa: F401
+
+
+def _executor(workers: Optional[int]) -> ProcessPoolExecutor:
+    # spawn (the only method on Windows) everywhere: forking a process that already runs
+    # numba/pymedphys threads can leave the pool unable to shut down
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_renderer,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+class RenderPool:
+    """Render specs on ``workers`` processes; ``close()`` waits and re-raises the first failure."""
+
+    def __init__(self, workers: Optional[int] = None):
+        self._pool = _executor(workers)
+        self._futures = []
+
+    def submit(self, spec: dict) -> str:
+        self._futures.append(self._pool.submit(render, spec))
+        return spec['path']
+
+    def close(self) -> List[str]:
+        try:
+            return [f.result() for f in self._futures]
+        finally:
+            self._futures = []
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self._pool.shutdown(cancel_futures=True)
+
+
+def renderer(workers: int = 0) -> Tuple[Callable[[dict], str], Optional[RenderPool]]:
+    """``(render, pool)``: ``render`` in this process for ``workers`` <= 0, else ``pool.submit``."""
+    if workers and workers > 0:
+        pool = RenderPool(workers)
+        return pool.submit, pool
+    return render, None
+
+
+def render_many(specs: List[dict], workers: int = 1) -> List[str]:
+    """Render every spec, in this process (``workers`` 1) or on a pool; returns the paths in order."""
+    if workers == 1 or len(specs) <= 1:
+        return [render(s) for s in specs]
+    with RenderPool(workers) as pool:
+        for s in specs:
+            pool.submit(s)
+        return pool.close()
+
+
+# --- deferred plots -------------------------------------------------------
+def spec_dir(out_root: str) -> str:
+    return os.path.join(out_root, SPEC_DIR)
+
+
+def _plain(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"not JSON serialisable: {type(obj).__name__}")
+
+
+def save_spec(spec: dict, store_dir: str) -> str:
+    """Store ``spec`` as ``<store_dir>/<png stem>.npz``; the target path is kept relative to the store."""
+    os.makedirs(store_dir, exist_ok=True)
+    entry = os.path.join(store_dir, os.path.splitext(os.path.basename(spec['path']))[0] + '.npz')
+    arrays, series = {}, []
+    for i, s in enumerate(spec.get('series', [])):
+        arrays[f's{i}_x'], arrays[f's{i}_y'] = np.asarray(s['x']), np.asarray(s['y'])
+        series.append({k: v for k, v in s.items() if k not in ('x', 'y')})
+    try:
+        path = os.path.relpath(os.path.abspath(spec['path']), os.path.abspath(store_dir))
+    except ValueError:  # other drive (Windows)
+        path = os.path.abspath(spec['path'])
+    meta = dict(spec, series=series, path=path)
+    tmp = f"{entry}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **arrays, **{_META_KEY: np.array(json.dumps(meta, default=_plain))})
+    os.replace(tmp, entry)
+    return entry
+
+
+def load_spec(entry: str) -> dict:
+    """Inverse of ``save_spec``; ``path`` is absolute again."""
+    with np.load(entry, allow_pickle=False) as z:
+        spec = json.loads(str(z[_META_KEY]))
+        for i, s in enumerate(spec.get('series', [])):
+            s['x'], s['y'] = z[f's{i}_x'], z[f's{i}_y']
+    spec['path'] = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(entry)), spec['path']))
+    return spec
+
+
+def find_specs(targets: List[str], match: Optional[str] = None) -> List[str]:
+    """Stored specs of output folders (their ``cache/plots``), spec folders or files; ``match`` globs the name."""
+    found = []
+    for t in targets:
+        if os.path.isdir(t):
+            d = spec_dir(t) if os.path.isdir(spec_dir(t)) else t
+            found.extend(sorted(glob.glob(os.path.join(d, '*.npz'))))
+        elif os.path.exists(t):
+            found.append(t)
+        else:
+            raise ValueError(f"not found: {t}")
+    if match:
+        found = [p for p in found if fnmatch.fnmatch(os.path.splitext(os.path.basename(p))[0], match)]
+    return found
+
+
+def _render_entry(entry: str) -> str:
+    spec = load_spec(entry)
+    os.makedirs(os.path.dirname(spec['path']), exist_ok=True)
+    return render(spec)
+
+
+def render_stored(entries: List[str], workers: int = 1) -> List[str]:
+    """Render stored specs to their PNG paths (``workers`` > 1: on a process pool)."""
+    if workers <= 1 or len(entries) <= 1:
+        return [_render_entry(e) for e in entries]
+    with _executor(workers) as pool:
+        return list(pool.map(_render_entry, entries, chunksize=max(1, len(entries) // (workers * 4))))
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Render plots stored by ocr_true_scaling --plots deferred')
+    ap.add_argument('targets', nargs='+', help='output folders (their cache/plots), spec folders or .npz specs')
+    ap.add_argument('--match', type=str, default=None, help="glob on the plot name, e.g. 'TrueComp_*10cm*'")
+    ap.add_argument('--missing', action='store_true', help='only plots whose PNG does not exist yet')
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='render processes (default: CPU count)')
+    args = ap.parse_args()
+
+    try:
+        entries = find_specs(args.targets, args.match)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if args.missing:
+        entries = [e for e in entries if not os.path.exists(load_spec(e)['path'])]
+    if not entries:
+        print("No stored plots to render")
+        return
+    use_agg()
+    paths = render_stored(entries, args.workers)
+    for p in paths:
+        print("Plot saved: " + p)
+    print(f"Rendered {len(paths)} plots")
+
+
+if __name__ == '__main__':
+    main()
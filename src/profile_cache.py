@@ -0,0 +1,229 @@
+"""Persistent on-disk cache of parsed profiles.
+
+Entries are keyed by file content (SHA-256) and stored as uncompressed `.npz`
+files (arrays + JSON metadata). A small per-path stat memo (path, size,
+mtime) avoids rehashing files that have not changed. The cache directory is
+size bounded; least recently used entries are evicted first.
+
+Usage (maintenance):
+    python src/profile_cache.py <cache_dir> --stats
+    python src/profile_cache.py <cache_dir> --invalidate data/measured_csv/10x10mPDD-zZver.csv
+    python src/profile_cache.py <cache_dir> --clear
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+# Bump when a parser changes its output so stale entries are ignored
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_META_KEY = "__meta__"
+
+
+def sha256_file(path: str) -> str:
+    """Hex SHA-256 of a file's contents, read in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _atomic_write_bytes(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ProfileCache:
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._stat_dir = os.path.join(root, "stat")
+        os.makedirs(self._stat_dir, exist_ok=True)
+
+    # --- keys -------------------------------------------------------------
+    def _stat_path(self, path: str) -> str:
+        key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+        return os.path.join(self._stat_dir, key + ".json")
+
+    def file_digest(self, path: str) -> str:
+        """Content hash of ``path``; reuses the memo while size and mtime match."""
+        st = os.stat(path)
+        memo_path = self._stat_path(path)
+        try:
+            with open(memo_path, "r", encoding="utf-8") as f:
+                memo = json.load(f)
+            if memo.get("size") == st.st_size and memo.get("mtime_ns") == st.st_mtime_ns:
+                return memo["sha256"]
+        except (OSError, ValueError, KeyError):
+            pass
+        digest = sha256_file(path)
+        memo = {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        try:
+            _atomic_write_bytes(memo_path, json.dumps(memo).encode("utf-8"))
+        except OSError:
+            pass
+        return digest
+
+    def _entry_path(self, digest: str, kind: str) -> str:
+        return os.path.join(self.root, f"{digest}-{kind}-v{CACHE_VERSION}.npz")
+
+    # --- get/put ----------------------------------------------------------
+    def get(self, path: str, kind: str) -> Optional[Tuple[dict, dict]]:
+        entry = self._entry_path(self.file_digest(path), kind)
+        try:
+            with np.load(entry, allow_pickle=False) as z:
+                arrays = {k: z[k] for k in z.files if k != _META_KEY}
+                meta = json.loads(str(z[_META_KEY])) if _META_KEY in z.files else {}
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(entry)  # LRU: last use = mtime
+        except OSError:
+            pass
+        return arrays, meta
+
+    def put(self, path: str, kind: str, arrays: dict, meta: dict) -> str:
+        entry = self._entry_path(self.file_digest(path), kind)
+        tmp = f"{entry}.{os.getpid()}.tmp.npz"
+        payload = {k: np.asarray(v) for k, v in arrays.items()}
+        payload[_META_KEY] = np.array(json.dumps(meta))
+        np.savez(tmp, **payload)
+        os.replace(tmp, entry)
+        self.evict()
+        return entry
+
+    def load(self, path: str, kind: str, loader: Callable[[str], Tuple[dict, dict]]) -> Tuple[dict, dict]:
+        """Return cached ``(arrays, meta)`` for ``path`` or parse it with ``loader`` and store."""
+        hit = self.get(path, kind)
+        if hit is not None:
+            return hit
+        arrays, meta = loader(path)
+        try:
+            self.put(path, kind, arrays, meta)
+        except OSError as e:
+            print(f"Warning: profile cache write failed: {e}", file=sys.stderr)
+        return arrays, meta
+
+    # --- maintenance ------------------------------------------------------
+    def entries(self):
+        files = glob.glob(os.path.join(self.root, "*.npz"))
+        out = []
+        for p in files:
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, p))
+        return sorted(out)
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(p)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def invalidate(self, path: Optional[str] = None) -> int:
+        """Drop entries for ``path`` (all entries when ``None``); returns the count removed."""
+        if path is None:
+            targets = [p for _, _, p in self.entries()] + glob.glob(os.path.join(self._stat_dir, "*.json"))
+        else:
+            targets = [self._stat_path(path)]
+            if os.path.exists(path):
+                targets += glob.glob(os.path.join(self.root, f"{sha256_file(path)}-*.npz"))
+        removed = 0
+        for p in targets:
+            try:
+                os.remove(p)
+                removed += p.endswith(".npz")
+            except OSError:
+                pass
+        return removed
+
+
+class MemoryProfileCache:
+    """In-process LRU of parsed profiles for long-lived callers (see worker_daemon.py).
+
+    Entries are keyed by path, size and mtime, so an edited file is parsed
+    again. Arrays are handed out read-only because every caller shares them.
+    A miss falls through to ``backing`` (a ProfileCache) when one is given.
+    """
+
+    def __init__(self, max_entries: int = 256, backing: Optional[ProfileCache] = None):
+        self.max_entries = int(max_entries)
+        self.backing = backing
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def load(self, path: str, kind: str, loader: Callable[[str], Tuple[dict, dict]]) -> Tuple[dict, dict]:
+        """Same contract as ``ProfileCache.load``."""
+        st = os.stat(path)
+        key = (os.path.abspath(path), kind, st.st_size, st.st_mtime_ns)
+        hit = self._entries.get(key)
+        if hit is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return hit
+        self.misses += 1
+        arrays, meta = self.backing.load(path, kind, loader) if self.backing is not None else loader(path)
+        for v in arrays.values():
+            if isinstance(v, np.ndarray):
+                v.setflags(write=False)
+        self._entries[key] = (arrays, meta)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return arrays, meta
+
+    def invalidate(self, path: Optional[str] = None) -> int:
+        """Drop in-memory entries for ``path`` (all when ``None``); the backing cache is untouched."""
+        target = None if path is None else os.path.abspath(path)
+        keys = [k for k in self._entries if target is None or k[0] == target]
+        for k in keys:
+            del self._entries[k]
+        return len(keys)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Inspect or invalidate the parsed-profile cache')
+    ap.add_argument('cache_dir')
+    ap.add_argument('--invalidate', nargs='+', default=None, metavar='FILE', help='drop entries for these input files')
+    ap.add_argument('--clear', action='store_true', help='drop every entry')
+    ap.add_argument('--stats', action='store_true', help='print entry count and size')
+    args = ap.parse_args()
+
+    cache = ProfileCache(args.cache_dir)
+    if args.clear:
+        print(f"Removed {cache.invalidate()} entries")
+    for p in args.invalidate or []:
+        print(f"Removed {cache.invalidate(p)} entries for {p}")
+    if args.stats or not (args.clear or args.invalidate):
+        entries = cache.entries()
+        size = sum(s for _, s, _ in entries)
+        print(f"{len(entries)} entries, {size / 1024:.1f} KiB (limit {cache.max_bytes / 1024 / 1024:.0f} MiB): {args.cache_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""Shared readers for PHITS `.out` tallies and measured profiles.
+
+All entry points (`ocr_true_scaling.py`, `scripts/*.py`) go through this module
+so that a PHITS table is parsed the same way everywhere.
+"""
+import io
+import mmap
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# `#  x-lower  x-upper  all  r.err` style table header (PHITS 1D output)
+_TABLE_HEADER_RE = re.compile(rb"^[ \t]*#  ([xyz])-lower[^\n]*\n", re.IGNORECASE | re.MULTILINE)
+# End of the numeric block: first blank line or comment line
+_TABLE_END_RE = re.compile(rb"^[ \t]*(?:#|\r?$)", re.MULTILINE)
+_AXIS_RE = re.compile(rb"^[ \t]*axis[ \t]*=[ \t]*([^#\r\n]*)", re.IGNORECASE | re.MULTILINE)
+_FLOAT = rb"([\-\+]?\d+(?:\.\d*)?(?:[Ee][\-\+]?\d+)?)"
+# `#   y = (   9.8500E+00  -   1.0150E+01  )` slab of a 1D output
+_Y_SLAB_RE = re.compile(rb"^[ \t]*#[ \t]*y[ \t]*=[ \t]*\([ \t]*" + _FLOAT + rb"[ \t]*-[ \t]*" + _FLOAT,
+                        re.IGNORECASE | re.MULTILINE)
+
+
+# `[ T-Deposit ]`, `[ T - T r a c k ]`, `[ T i t l e ]` ... section headers
+_SECTION_RE = re.compile(rb"^[ \t]*\[([^\]\r\n]*)\]", re.MULTILINE)
+_PARAM_RE = re.compile(rb"^[ \t]*([A-Za-z][\w\-]*)[ \t]*=[ \t]*([^#\r\n]*)", re.MULTILINE)
+_NEWPAGE_RE = re.compile(rb"^#newpage:", re.MULTILINE)
+_INT_PARAMS = ("nx", "ny", "nz", "ne", "nr", "nt", "na")
+_FLOAT_PARAMS = ("xmin", "xmax", "ymin", "ymax", "zmin", "zmax", "emin", "emax", "rmin", "rmax")
+# Measured CSV delimiters in sniffing order; None = whitespace
+_CSV_DELIMITERS = (",", "\t", ";")
+_CSV_SNIFF_LINES = 64
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _table_columns(block: bytes) -> np.ndarray:
+    # Fast path: the whole block is a rectangular numeric matrix. Every non-empty
+    # row must have the first row's width: a total that is merely a multiple of it
+    # (e.g. a 3- and a 5-value row among 4-value rows) would shift the columns.
+    first = block.split(b"\n", 1)[0].split()
+    ncol = len(first)
+    if ncol >= 3 and {len(line.split()) for line in block.splitlines()} - {0} == {ncol}:
+        try:
+            return np.array(block.split(), dtype=float).reshape(-1, ncol)
+        except ValueError:
+            pass
+    # Slow path: tolerate ragged or partially non-numeric rows (skip them)
+    rows = []
+    for line in block.splitlines():
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        try:
+            rows.append([float(p) for p in parts[:4]] + [np.nan] * (4 - min(len(parts), 4)))
+        except ValueError:
+            continue
+    return np.asarray(rows, float).reshape(-1, 4)
+
+
+def parse_phits_table(data: bytes, start: int = 0, end: Optional[int] = None, source: str = "") -> dict:
+    """Parse the first 1D table in ``data[start:end]``.
+
+    Returns a dict with ``lower``, ``upper``, ``value`` and ``rel_err`` arrays,
+    the tally ``axis`` (``""`` if absent), the bin ``centers`` and ``meta``.
+    """
+    end = len(data) if end is None else end
+    m = _TABLE_HEADER_RE.search(data, start, end)
+    if m is None:
+        raise ValueError(f"Could not find PHITS data table header: {source}")
+    header = data[start:m.start()]
+    body_start = m.end()
+    e = _TABLE_END_RE.search(data, body_start, end)
+    body_end = e.start() if e is not None else end
+    table = _table_columns(data[body_start:body_end])
+
+    axis = ""
+    for am in _AXIS_RE.finditer(header):
+        axis = am.group(1).decode("ascii", "ignore").strip()
+    meta = {"table_axis": m.group(1).decode("ascii").lower(), "table_offset": body_start}
+    ym = None
+    for ym in _Y_SLAB_RE.finditer(header):
+        pass
+    if ym is not None:
+        meta["y_center_cm"] = 0.5 * (float(ym.group(1)) + float(ym.group(2)))
+
+    lower = table[:, 0].copy()
+    upper = table[:, 1].copy()
+    return {
+        "lower": lower,
+        "upper": upper,
+        "value": table[:, 2].copy(),
+        "rel_err": table[:, 3].copy() if table.shape[1] >= 4 else np.full(len(table), np.nan),
+        "centers": 0.5 * (lower + upper),
+        "axis": axis,
+        "meta": meta,
+    }
+
+
+def read_phits_table(path: str) -> dict:
+    """Read the first 1D table of a PHITS `.out` file (see `parse_phits_table`)."""
+    return parse_phits_table(_read_bytes(path), source=path)
+
+
+def load_phits_profile(path: str):
+    """Return ``(axis, pos_cm, dose_norm, meta)`` with dose normalised to peak=1."""
+    t = read_phits_table(path)
+    dose = t["value"]
+    if dose.size == 0:
+        raise ValueError(f"PHITS data is empty: {path}")
+    dmax = float(np.max(dose))
+    if dmax <= 0:
+        raise ValueError(f"PHITS dose max <= 0: {path}")
+    meta = {k: v for k, v in t["meta"].items() if k == "y_center_cm"}
+    meta["rel_err"] = t["rel_err"]
+    return t["axis"], t["centers"], dose / dmax, meta
+
+
+def _is_number(field: str) -> bool:
+    try:
+        float(field)
+    except ValueError:
+        return False
+    return True
+
+
+def _sniff_csv(lines: List[str]) -> Tuple[Optional[str], int, Optional[List[str]]]:
+    # -> (delimiter, index of the first numeric row, header labels or None)
+    probe = [ln for ln in lines[:_CSV_SNIFF_LINES] if ln.strip()]
+    delim = next((d for d in _CSV_DELIMITERS if any(d in ln for ln in probe)), None)
+    header = None
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        fields = [f.strip().strip('"') for f in (line.split(delim) if delim else line.split())]
+        if len(fields) >= 2 and _is_number(fields[0]) and _is_number(fields[1]):
+            return delim, i, header
+        header = fields
+    return delim, len(lines), header
+
+
+def _csv_columns_fast(lines: List[str], delim: Optional[str]) -> Optional[np.ndarray]:
+    # Rows holding only delimiters (`,` padding exported by the tank software) carry no data
+    rows = [ln for ln in lines if (ln.replace(delim, "") if delim else ln).strip()]
+    if not rows:
+        return None
+    text = "\n".join(rows)
+    if delim:
+        text = text.replace(delim, " ")
+    text = text.replace('"', " ")
+    ncol = len(rows[0].split(delim) if delim else rows[0].split())
+    try:
+        flat = np.array(text.split(), dtype=float)
+    except ValueError:
+        return None
+    if ncol < 2 or flat.size != ncol * len(rows):
+        return None
+    return flat.reshape(-1, ncol)
+
+
+def _csv_columns_pandas(lines: List[str], delim: Optional[str]) -> np.ndarray:
+    import pandas as pd
+    buf = io.StringIO("\n".join(lines))
+    if delim:
+        df = pd.read_csv(buf, header=None, sep=delim, on_bad_lines="skip", skip_blank_lines=True)
+    else:
+        df = pd.read_csv(buf, header=None, sep=r"\s+", engine="python", on_bad_lines="skip")
+    if df.shape[1] < 2:
+        raise ValueError("CSV has fewer than two columns")
+    return np.column_stack([pd.to_numeric(df.iloc[:, k], errors="coerce").to_numpy(float) for k in (0, 1)])
+
+
+def read_measured_csv(path: str) -> dict:
+    """Read a measured profile CSV once: ``pos``/``dose`` in file order plus the sniffed layout.
+
+    The delimiter (comma, tab, semicolon or whitespace) and an optional header
+    row (e.g. ``X (cm),Measured``) are detected from the leading lines; the
+    numeric block is converted in one NumPy call, with pandas only as a
+    fallback for irregular rows. Non-finite rows are dropped.
+    """
+    text = _read_bytes(path).decode("utf-8-sig", errors="replace")
+    lines = text.splitlines()
+    delim, first, header = _sniff_csv(lines)
+    body = lines[first:]
+    table = _csv_columns_fast(body, delim)
+    if table is None:
+        table = _csv_columns_pandas(body, delim) if body else np.empty((0, 2))
+    pos, dose = table[:, 0], table[:, 1]
+    m = np.isfinite(pos) & np.isfinite(dose)
+    return {"pos": pos[m], "dose": dose[m], "header": header, "delimiter": delim}
+
+
+def load_csv_profile(path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Return ``(pos_cm, dose_norm)`` sorted by position with dose normalised to peak=1."""
+    return csv_profile(read_measured_csv(path), path)
+
+
+def csv_profile(t: dict, path: str = "") -> Tuple[np.ndarray, np.ndarray]:
+    """``(pos_cm, dose_norm)`` of an already read `read_measured_csv` result (see `load_csv_profile`)."""
+    order = np.argsort(t["pos"])
+    pos, dose = t["pos"][order], t["dose"][order]
+    if dose.size == 0:
+        raise ValueError(f"CSV has no valid numeric data: {path}")
+    dmax = float(np.max(dose))
+    if dmax <= 0:
+        raise ValueError(f"CSV dose max <= 0: {path}")
+    return pos, dose / dmax
+
+
+def _mesh_params(buf, start: int, end: int) -> dict:
+    params = {}
+    for m in _PARAM_RE.finditer(buf, start, end):
+        key = m.group(1).decode("ascii", "ignore").lower()
+        if key in params:
+            continue  # first definition is the tally header; later ones are ANGEL/page text
+        val = m.group(2).decode("utf-8", "ignore").strip()
+        try:
+            if key in _INT_PARAMS:
+                params[key] = int(val.split()[0])
+                continue
+            if key in _FLOAT_PARAMS:
+                params[key] = float(val.split()[0])
+                continue
+        except (ValueError, IndexError):
+            pass
+        params[key] = val
+    return params
+
+
+def index_tallies(path: str) -> List[dict]:
+    """Index every tally block of a PHITS output file in one forward scan.
+
+    The file is memory-mapped, so this stays cheap for multi-gigabyte outputs.
+    Each entry holds ``name`` (e.g. ``"T-Deposit"``), byte offsets ``start``/
+    ``end``, ``pages`` (offsets of ``#newpage:`` lines), ``table_start``
+    (offset of the first 1D ``#  x-lower`` header or ``None``) and ``params``
+    (``mesh``, ``nx/ny/nz``, ``xmin/xmax``..., ``axis``, ``unit``, ``part``,
+    ``file`` ... as written in the block header).
+    """
+    with open(path, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return []
+        try:
+            sections = [(m.start(), re.sub(rb"\s+", b"", m.group(1)).decode("ascii", "ignore"))
+                        for m in _SECTION_RE.finditer(buf)]
+            size = len(buf)
+            blocks = []
+            for k, (start, name) in enumerate(sections):
+                if not name.upper().startswith("T-"):
+                    continue
+                end = sections[k + 1][0] if k + 1 < len(sections) else size
+                pages = [m.start() for m in _NEWPAGE_RE.finditer(buf, start, end)]
+                header_end = pages[0] if pages else end
+                tm = _TABLE_HEADER_RE.search(buf, start, end)
+                blocks.append({
+                    "index": len(blocks),
+                    "name": name,
+                    "start": start,
+                    "end": end,
+                    "pages": pages,
+                    "table_start": tm.start() if tm else None,
+                    "params": _mesh_params(buf, start, header_end),
+                })
+            return blocks
+        finally:
+            buf.close()
+
+
+def find_tally(blocks: List[dict], name: str = "T-Deposit", which: int = -1) -> Optional[dict]:
+    """Pick a block by (case-insensitive) tally name; ``which=-1`` is the last one."""
+    hits = [b for b in blocks if b["name"].lower() == name.lower()]
+    if not hits:
+        return None
+    try:
+        return hits[which]
+    except IndexError:
+        return None
+
+
+def read_tally_block(path: str, block: dict) -> bytes:
+    """Seek straight to an indexed block and return its raw bytes."""
+    with open(path, "rb") as f:
+        f.seek(block["start"])
+        return f.read(block["end"] - block["start"])
+
+
+def read_tally_table(path: str, block: dict) -> dict:
+    """Parse the 1D table of an indexed block (see `parse_phits_table`)."""
+    return parse_phits_table(read_tally_block(path, block), source=f"{path}#{block['index']}")
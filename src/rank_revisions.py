@@ -0,0 +1,308 @@
+"""Rank beam-model revisions (PHITS output folders) against one measured set.
+
+Every revision folder below a root directory (one folder per head-model
+revision, e.g. ``Rev60-5x5-c8-0.49n``) becomes a scenario of one
+`batch_engine` campaign: the measured store is opened once, all cases share one
+profile cache, and the whole campaign runs on a process pool sized to the CPU
+count. The per-case rows are then aggregated per revision and per revision x
+depth and ranked within each field size.
+
+The field size of a folder is taken from an ``NxM`` token in its name
+(``5x5`` -> ``05x05``), else from a measured field name it contains (``I150``),
+else from ``--size``.
+
+Outputs under ``--output-root`` (default ``output/ranking``):
+
+    batch_summary.csv/.json   one row per case (see batch_engine)
+    ranking.csv               one row per revision, ranked within its field size
+    ranking_by_depth.csv      one row per revision x depth, ranked within field size and depth
+    plots/Campaign_<size>.png with --figures: the --top revisions of a field size overlaid per depth x axis
+                              (legend in ranking order; the per-case plots are stored, not rendered)
+
+Revisions with failed cases or ``missing`` ones (a PHITS OCR tally or measured
+profile absent, so the case was never run) rank after every complete revision
+of their field size, whatever their mean score.
+
+Usage:
+    python src/rank_revisions.py <revisions_dir> [--measured-dir DIR] [--match GLOB] [--size 10x10]
+        [--depths 5 10 20] [--axes x z] [--workers N] [--output-root DIR] [--sort gamma1|gamma2|rmse|fwhm]
+        [--top N] [--figures] [--incremental] [--dry-run]
+"""
+import argparse
+import csv
+import fnmatch
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from batch_engine import REPO_ROOT, expand_cases, run_batch, write_summary
+from measured_store import MeasuredStore
+
+# --sort key -> (aggregate column, higher is better)
+RANK_KEYS = {
+    'gamma1': ('mean_gamma1_gpr_percent', True),
+    'gamma2': ('mean_gamma2_gpr_percent', True),
+    'rmse': ('mean_rmse', False),
+    'fwhm': ('mean_abs_fwhm_delta_cm', False),
+}
+RANKING_FIELDS = [
+    'rank', 'name', 'size', 'cases', 'failed', 'missing',
+    'mean_gamma1_gpr_percent', 'min_gamma1_gpr_percent', 'mean_gamma2_gpr_percent', 'min_gamma2_gpr_percent',
+    'mean_rmse', 'max_rmse', 'mean_abs_fwhm_delta_cm', 'max_abs_fwhm_delta_cm',
+    'pdd_rmse', 'pdd_gamma1_gpr_percent', 'pdd_gamma2_gpr_percent', 'folder',
+]
+DEPTH_FIELDS = [
+    'rank', 'name', 'size', 'depth_cm', 'cases', 'failed', 'missing',
+    'mean_gamma1_gpr_percent', 'mean_gamma2_gpr_percent', 'mean_rmse', 'mean_abs_fwhm_delta_cm',
+]
+# Ranking campaigns only need the reports; per-case CSV exports are off unless requested
+RANK_PARAMS = {'export_csv': False, 'export_gamma': False}
+_SIZE_RE = re.compile(r"(?<![\d.])(\d+(?:\.\d+)?)x(\d+(?:\.\d+)?)(?![\d.])", re.IGNORECASE)
+
+
+def revision_field(folder_name: str, fields: Sequence[str] = (), default: Optional[str] = None) -> Optional[str]:
+    """Field size of a revision folder: ``NxM`` token, else a contained measured field name, else ``default``."""
+    m = _SIZE_RE.search(folder_name)
+    if m:
+        a, b = (float(v) for v in m.groups())
+        if a.is_integer() and b.is_integer():
+            return f"{int(a):02d}x{int(b):02d}"
+        return f"{a:g}x{b:g}"
+    tokens = set(re.split(r"[^0-9a-z]+", folder_name.lower()))
+    named = [f for f in fields if f.lower() in tokens]
+    if named:
+        return max(named, key=len)
+    return default
+
+
+def discover_revisions(root: str, match: str = '*', pdd_name: str = 'deposit-z-water.out') -> List[str]:
+    """Sub-folders of ``root`` matching ``match`` that contain the PHITS PDD file, sorted by name."""
+    found = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if entry.is_dir() and fnmatch.fnmatch(entry.name, match) and os.path.exists(os.path.join(entry.path, pdd_name)):
+            found.append(entry.path)
+    return found
+
+
+def build_manifest(revisions: Sequence[str], store: MeasuredStore, measured_dir: str, output_root: str,
+                   depths: Sequence[float], axes: Sequence[str], params: Optional[dict] = None,
+                   size: Optional[str] = None, log: Callable[[str], None] = print, **patterns) -> dict:
+    """batch_engine manifest with one scenario per revision folder (folders without a field size are skipped)."""
+    fields = sorted({rec['field'] for rec in store.records})
+    scenarios = []
+    for folder in revisions:
+        name = os.path.basename(os.path.normpath(folder))
+        field = revision_field(name, fields, size)
+        if field is None:
+            log(f"[SKIP] {name}: no field size in the folder name (use --size)")
+            continue
+        scenarios.append({'folder': folder, 'size': field, 'name': name})
+    manifest = {
+        'measured_dir': measured_dir,
+        'output_root': output_root,
+        'depths': list(depths),
+        'axes': list(axes),
+        'params': dict(RANK_PARAMS, **(params or {})),
+        'scenarios': scenarios,
+        'base_dir': REPO_ROOT,
+    }
+    manifest.update({k: v for k, v in patterns.items() if v})
+    return manifest
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def expected_cases(manifest: dict) -> Dict[tuple, Set[tuple]]:
+    """``(name, size) -> {(depth_cm, axis)}`` every scenario of ``manifest`` should produce.
+
+    Cases that `expand_cases` skips (missing PHITS or measured input) have no
+    batch row; comparing against this set is what reveals them.
+    """
+    expected = {}
+    for sc in manifest['scenarios']:
+        name = sc.get('name') or os.path.basename(os.path.normpath(sc['folder']))
+        depths = [float(d) for d in sc.get('depths', manifest['depths'])]
+        axes = list(sc.get('axes', manifest['axes']))
+        expected[(name, str(sc['size']).rstrip('m'))] = {(d, a) for d in depths for a in axes}
+    return expected
+
+
+def _stats(rows: List[dict], missing: int = 0) -> dict:
+    ok = [r for r in rows if r.get('status') in ('ok', 'skipped')]
+
+    def col(key, absolute=False):
+        vals = [r.get(key) for r in ok if r.get(key) is not None]
+        return [abs(v) for v in vals] if absolute else vals
+
+    g1, g2, rmse, fw = col('gamma1_gpr_percent'), col('gamma2_gpr_percent'), col('rmse'), col('fwhm_delta_cm', True)
+    return {
+        'cases': len(rows),
+        'failed': len(rows) - len(ok),
+        'missing': missing,
+        'mean_gamma1_gpr_percent': _mean(g1),
+        'min_gamma1_gpr_percent': min(g1) if g1 else None,
+        'mean_gamma2_gpr_percent': _mean(g2),
+        'min_gamma2_gpr_percent': min(g2) if g2 else None,
+        'mean_rmse': _mean(rmse),
+        'max_rmse': max(rmse) if rmse else None,
+        'mean_abs_fwhm_delta_cm': _mean(fw),
+        'max_abs_fwhm_delta_cm': max(fw) if fw else None,
+        # One PDD pair per revision: every case carries the same values
+        'pdd_rmse': next((r['pdd_rmse'] for r in ok if r.get('pdd_rmse') is not None), None),
+        'pdd_gamma1_gpr_percent': next((r['pdd_gamma1_gpr_percent'] for r in ok
+                                        if r.get('pdd_gamma1_gpr_percent') is not None), None),
+        'pdd_gamma2_gpr_percent': next((r['pdd_gamma2_gpr_percent'] for r in ok
+                                        if r.get('pdd_gamma2_gpr_percent') is not None), None),
+    }
+
+
+def _rank(table: List[dict], group_keys: Sequence[str], sort: str) -> List[dict]:
+    # Rank within each group: incomplete rows (failed or missing cases) after complete ones, then by
+    # score (missing scores last); mean RMSE breaks ties
+    column, higher = RANK_KEYS[sort]
+
+    def key(row):
+        v = row.get(column)
+        tie = row.get('mean_rmse')
+        return (tuple(row[k] for k in group_keys), bool(row['failed'] or row['missing']),
+                v is None, 0.0 if v is None else (-v if higher else v),
+                tie is None, 0.0 if tie is None else tie, row['name'])
+
+    table.sort(key=key)
+    group, n = None, 0
+    for row in table:
+        g = tuple(row[k] for k in group_keys)
+        n = n + 1 if g == group else 1
+        group = g
+        row['rank'] = n
+    return table
+
+
+def aggregate(rows: List[dict], sort: str = 'gamma1', folders: Optional[Dict[str, str]] = None,
+              expected: Optional[Dict[tuple, Set[tuple]]] = None):
+    """``(per_revision, per_revision_depth)`` tables from batch rows, ranked within size (and depth).
+
+    ``expected`` (see `expected_cases`) adds the cases without a row as ``missing``;
+    a revision with failed or missing cases ranks after every complete one.
+    """
+    by_rev: Dict[tuple, List[dict]] = {key: [] for key in (expected or {})}
+    by_depth: Dict[tuple, List[dict]] = {}
+    for r in rows:
+        by_rev.setdefault((r['name'], r['size']), []).append(r)
+        by_depth.setdefault((r['name'], r['size'], r['depth_cm']), []).append(r)
+    absent: Dict[tuple, List[tuple]] = {}
+    for (n, s), cases in (expected or {}).items():
+        seen = {(float(r['depth_cm']), r['axis']) for r in by_rev[(n, s)]}
+        absent[(n, s)] = sorted(c for c in cases if c not in seen)
+        for d, _ in absent[(n, s)]:
+            by_depth.setdefault((n, s, d), [])
+    revisions = [dict(name=n, size=s, folder=(folders or {}).get(n), **_stats(rs, len(absent.get((n, s), []))))
+                 for (n, s), rs in by_rev.items()]
+    depths = []
+    for (n, s, d), rs in by_depth.items():
+        st = _stats(rs, sum(1 for dd, _ in absent.get((n, s), []) if dd == d))
+        row = {'name': n, 'size': s, 'depth_cm': d}
+        row.update({k: st[k] for k in DEPTH_FIELDS if k in st})
+        depths.append(row)
+    return _rank(revisions, ('size',), sort), _rank(depths, ('size', 'depth_cm'), sort)
+
+
+def write_table(rows: List[dict], fields: Sequence[str], path: str) -> str:
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=list(fields), extrasaction='ignore')
+        w.writeheader()
+        for row in rows:
+            w.writerow({k: ('' if row.get(k) is None else row.get(k)) for k in fields})
+    return path
+
+
+def _fmt(v, spec: str) -> str:
+    return 'n/a' if v is None else format(v, spec)
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Rank beam-model revision folders against one measured set')
+    ap.add_argument('revisions_dir', help='directory holding one PHITS output folder per revision')
+    ap.add_argument('--measured-dir', default=os.path.join(REPO_ROOT, 'data', 'measured_csv'))
+    ap.add_argument('--match', default='*', help='glob on revision folder names (default: all)')
+    ap.add_argument('--size', default=None, help='field size for folders whose name carries none, e.g. 10x10')
+    ap.add_argument('--depths', type=float, nargs='+', default=[5.0, 10.0, 20.0])
+    ap.add_argument('--axes', nargs='+', default=['x', 'z'])
+    ap.add_argument('--ocr-pattern', default=None,
+                    help='PHITS OCR file name pattern (default deposit-y-water-{depth_tag}{axis}.out; '
+                         'fields: depth_tag, depth, depth_mm, axis)')
+    ap.add_argument('--pdd-file', default='deposit-z-water.out', help='PHITS PDD file name inside each revision')
+    ap.add_argument('--grid', type=float, default=0.1)
+    ap.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    ap.add_argument('--output-root', default=os.path.join(REPO_ROOT, 'output', 'ranking'))
+    ap.add_argument('--sort', choices=sorted(RANK_KEYS), default='gamma1', help='ranking metric (default: gamma1)')
+    ap.add_argument('--top', type=int, default=10, help='revisions per field size printed (0 = all)')
+    ap.add_argument('--figures', action='store_true',
+                    help='one multi-panel figure per field size (the --top revisions) instead of a PNG per case')
+    ap.add_argument('--incremental', action='store_true', help='skip cases whose inputs and parameters are unchanged')
+    ap.add_argument('--dry-run', action='store_true', help='list the revisions and cases and exit')
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.revisions_dir):
+        print(f"Error: not a directory: {args.revisions_dir}", file=sys.stderr)
+        sys.exit(1)
+    revisions = discover_revisions(args.revisions_dir, args.match, args.pdd_file)
+    if not revisions:
+        print(f"Error: no revision folders with {args.pdd_file} under {args.revisions_dir}", file=sys.stderr)
+        sys.exit(1)
+    out_root = os.path.abspath(args.output_root)
+    measured_dir = os.path.abspath(args.measured_dir)
+    # Measured data is indexed once for the whole campaign
+    store = MeasuredStore.open(os.path.join(out_root, 'cache', 'measured_store.npz'), measured_dir)
+    params = {'grid': args.grid, 'incremental': args.incremental}
+    if args.figures:
+        params['plots'] = 'deferred'
+    manifest = build_manifest(revisions, store, measured_dir, out_root, args.depths, args.axes, params,
+                              args.size, phits_ocr_pattern=args.ocr_pattern, phits_pdd_file=args.pdd_file)
+    cases = expand_cases(manifest, store)
+    folders = {sc['name']: sc['folder'] for sc in manifest['scenarios']}
+    expected = expected_cases(manifest)
+    missing = sum(len(v) for v in expected.values()) - len(cases)
+    print(f"{len(manifest['scenarios'])} revisions, {len(cases)} cases" + (f" ({missing} missing)" if missing else ''))
+    if args.dry_run:
+        for c in cases:
+            print(f"{c['name']} {c['size']} d={c['depth_cm']:g} ax={c['axis']}")
+        return
+    if not cases:
+        print("Error: no runnable cases (check --size/--depths/--axes and the measured set)", file=sys.stderr)
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    rows = run_batch(cases, args.workers)
+    write_summary(rows, os.path.join(out_root, 'batch_summary.csv'))
+    revs, depths = aggregate(rows, args.sort, folders, expected)
+    ranking = write_table(revs, RANKING_FIELDS, os.path.join(out_root, 'ranking.csv'))
+    write_table(depths, DEPTH_FIELDS, os.path.join(out_root, 'ranking_by_depth.csv'))
+
+    column = RANK_KEYS[args.sort][0]
+    for size in sorted({r['size'] for r in revs}):
+        print(f"\n# {size} (by {column})")
+        shown = [r for r in revs if r['size'] == size]
+        for r in shown[:args.top or None]:
+            print("{:>3}. {}: G1={}% G2={}% RMSE={} |dFWHM|={} cm PDD RMSE={}{}".format(
+                r['rank'], r['name'], _fmt(r['mean_gamma1_gpr_percent'], '.2f'),
+                _fmt(r['mean_gamma2_gpr_percent'], '.2f'), _fmt(r['mean_rmse'], '.6f'),
+                _fmt(r['mean_abs_fwhm_delta_cm'], '.3f'), _fmt(r['pdd_rmse'], '.6f'),
+                ''.join(f" ({r[k]} {k})" for k in ('failed', 'missing') if r[k])))
+    if args.figures:
+        import campaign_figure
+        order = {r['name']: r['rank'] for r in revs}
+        ranked = sorted(rows, key=lambda r: order.get(r['name']) or len(order) + 1)
+        # The --top revisions only: hundreds of overlaid curves are unreadable
+        for p in campaign_figure.render_campaign(ranked, os.path.join(out_root, 'plots'), by='size',
+                                                 max_overlays=args.top or None):
+            print("Campaign figure saved: " + p)
+    print(f"\n{len(rows)} cases in {time.perf_counter() - t0:.1f}s. Ranking: {ranking}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Shift (and optional scale) registration of an evaluation curve onto a reference.
+
+Replaces hand-tuning of ``--eval-z-shift``/``--eval-pdd-z-shift`` by trial runs.
+The evaluation curve is moved by ``s`` (``x_eval + s``, the same sign as the
+CLI shifts) and optionally scaled by ``k``:
+
+1. coarse: both curves are resampled on one fine grid (``step_cm``) and the
+   lag of the maximum FFT cross-correlation of their gradients (within
+   ``+-max_shift_cm``) gives the starting shift;
+2. local: RMSE over the overlap, and with ``metric='gamma'`` the pass rate of
+   one criterion, is evaluated for every grid shift within ``+-refine_cm`` of
+   the start (all shifts in one vectorised interpolation). With ``scale`` the
+   least-squares factor is solved per shift in closed form;
+3. RMSE optima are refined below the grid step by a parabola through the three
+   best points.
+
+The returned dict holds the optimum and the whole landscape (``shifts_cm``,
+``landscape_rmse``, ``landscape_scale`` and, for the gamma metric,
+``landscape_gamma_percent``).
+
+Usage:
+    from shift_registration import register_shift
+    r = register_shift(z_ref, pdd_ref, z_eval, pdd_eval, metric='gamma', criterion=(2, 2, 10, False))
+    r['shift_cm'], r['scale'], r['rmse'], r['gamma_percent']
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from gamma1d import Criterion, gamma_1d, pass_rate
+
+METRICS = ('rmse', 'gamma')
+
+
+def _prepare(x, y) -> Tuple[np.ndarray, np.ndarray]:
+    x = np.asarray(x, float)
+    y = np.asarray(y, float)
+    ok = np.isfinite(x) & np.isfinite(y)
+    order = np.argsort(x[ok], kind='stable')
+    return x[ok][order], y[ok][order]
+
+
+def xcorr_shift(x_ref, y_ref, x_eval, y_eval, step_cm: float, max_shift_cm: float) -> float:
+    """Shift (multiple of ``step_cm``) maximising the cross-correlation of ``y_ref'(x)`` and ``y_eval'(x - s)``."""
+    xr, yr = _prepare(x_ref, y_ref)
+    xe, ye = _prepare(x_eval, y_eval)
+    lo, hi = min(xr[0], xe[0]), max(xr[-1], xe[-1])
+    grid = lo + np.arange(int(np.floor((hi - lo) / step_cm)) + 1) * step_cm
+    # Gradients of the curves (held at their end values outside their range): plateaus and truncated tails would
+    # otherwise pull the correlation peak towards zero lag
+    a = np.gradient(np.interp(grid, xr, yr))
+    b = np.gradient(np.interp(grid, xe, ye))
+    a = a - a.mean()
+    b = b - b.mean()
+    n = grid.size
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    c = np.fft.irfft(np.fft.rfft(a, size) * np.conj(np.fft.rfft(b, size)), size)
+    max_lag = min(int(np.floor(max_shift_cm / step_cm + 1e-9)), n - 1)
+    lags = np.arange(-max_lag, max_lag + 1)
+    k = lags[int(np.argmax(c[lags % size]))]
+    return float(k * step_cm)
+
+
+def shift_landscape(x_ref, y_ref, x_eval, y_eval, shifts_cm: Sequence[float], scale: bool = False,
+                    min_overlap: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """RMSE and scale factor for every shift, evaluated at the reference samples inside the shifted evaluation range."""
+    xr, yr = _prepare(x_ref, y_ref)
+    xe, ye = _prepare(x_eval, y_eval)
+    s = np.asarray(shifts_cm, float)
+    q = xr[None, :] - s[:, None]
+    e = np.interp(q, xe, ye)
+    inside = (q >= xe[0]) & (q <= xe[-1])
+    r = np.broadcast_to(yr, e.shape)
+    e0 = np.where(inside, e, 0.0)
+    r0 = np.where(inside, r, 0.0)
+    if scale:
+        den = np.sum(e0 * e0, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            k = np.where(den > 0, np.sum(r0 * e0, axis=1) / den, np.nan)
+    else:
+        k = np.ones(s.size)
+    count = inside.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rmse = np.sqrt(np.sum((r0 - k[:, None] * e0) ** 2, axis=1) / count)
+    rmse = np.where(count >= min_overlap, rmse, np.nan)
+    return rmse, k
+
+
+def register_shift(x_ref, y_ref, x_eval, y_eval, metric: str = 'rmse', criterion: Optional[Criterion] = None,
+                   scale: bool = False, step_cm: float = 0.01, max_shift_cm: float = 1.0,
+                   refine_cm: float = 0.2) -> dict:
+    """Best shift of the evaluation curve (cm, added to ``x_eval``) and optional scale; see the module docstring.
+
+    ``criterion`` is ``(dd_percent, dta_mm, cutoff_percent, local)`` and is
+    required for ``metric='gamma'`` (positions in cm, gamma in mm).
+    """
+    if metric not in METRICS:
+        raise ValueError(f"unknown registration metric: {metric} (use {' or '.join(METRICS)})")
+    if metric == 'gamma' and criterion is None:
+        raise ValueError("gamma registration needs a criterion")
+    if step_cm <= 0 or max_shift_cm < 0 or refine_cm < 0:
+        raise ValueError("registration step must be > 0 and shift ranges >= 0")
+    xr, yr = _prepare(x_ref, y_ref)
+    xe, ye = _prepare(x_eval, y_eval)
+    if xr.size < 3 or xe.size < 3:
+        raise ValueError("registration needs at least three samples per curve")
+
+    coarse = xcorr_shift(xr, yr, xe, ye, step_cm, max_shift_cm)
+    n = int(np.floor(refine_cm / step_cm + 1e-9))
+    shifts = coarse + np.arange(-n, n + 1) * step_cm
+    shifts = shifts[np.abs(shifts) <= max_shift_cm + 1e-9]
+    rmse, k = shift_landscape(xr, yr, xe, ye, shifts, scale)
+    if not np.isfinite(rmse).any():
+        raise ValueError("curves do not overlap for any shift in range")
+
+    gamma_pct = None
+    if metric == 'gamma':
+        dd, dta, cut, local = criterion
+        gamma_pct = np.full(shifts.size, np.nan)
+        norm = float(np.max(yr))
+        for i, (s, f) in enumerate(zip(shifts, k)):
+            if np.isfinite(rmse[i]):
+                g = gamma_1d(xr * 10.0, yr, (xe + s) * 10.0, ye * f, dd, dta, cut, local, norm)
+                gamma_pct[i] = pass_rate(g)
+        # Highest pass rate; RMSE breaks ties
+        best = int(np.lexsort((np.nan_to_num(rmse, nan=np.inf), -np.nan_to_num(gamma_pct, nan=-1.0)))[0])
+        shift = float(shifts[best])
+    else:
+        best = int(np.nanargmin(rmse))
+        shift = float(shifts[best])
+        if 0 < best < shifts.size - 1 and np.isfinite(rmse[best - 1:best + 2]).all():
+            y0, y1, y2 = rmse[best - 1:best + 2] ** 2
+            den = y0 - 2.0 * y1 + y2
+            if den > 0:
+                shift += 0.5 * (y0 - y2) / den * step_cm
+
+    final_rmse, final_k = shift_landscape(xr, yr, xe, ye, [shift], scale)
+    return {
+        'metric': metric,
+        'shift_cm': shift,
+        'scale': float(final_k[0]),
+        'rmse': float(final_rmse[0]),
+        'coarse_shift_cm': coarse,
+        'gamma_percent': None if gamma_pct is None else float(gamma_pct[best]),
+        'shifts_cm': shifts,
+        'landscape_rmse': rmse,
+        'landscape_scale': k,
+        'landscape_gamma_percent': gamma_pct,
+    }
@@ -0,0 +1,246 @@
+"""Long-lived `ocr_true_scaling` worker speaking JSON lines on stdin/stdout.
+
+The GUI (and any batch caller) starts one worker and sends one job per line
+instead of launching a fresh interpreter per analysis: numpy/scipy/matplotlib
+are imported once at start-up and parsed profiles stay in an in-memory cache
+(keyed by path, size and mtime), so re-running with another ``dd``/``dta``/
+``smooth_window`` only redoes the analysis.
+
+A job uses the parameter names of ``config/true_gui_defaults.json`` plus the
+four input files; keys that are missing are taken from that file (``--defaults``)
+and then from the ``ocr_true_scaling`` defaults:
+
+    {"id": 1, "ref_pdd_type": "csv", "ref_pdd_file": "...", "eval_pdd_type": "phits",
+     "eval_pdd_file": "...", "ref_ocr_type": "csv", "ref_ocr_file": "...",
+     "eval_ocr_type": "phits", "eval_ocr_file": "...", "dd1": 2.5, "smooth_window": 7}
+
+Every reply is one JSON line carrying the job ``id``:
+
+    {"event": "ready", "version": "...", "elapsed_s": 1.2}             once, after warm-up
+    {"event": "log", "id": 1, "line": "RMSE (...): ..."}             console output, streamed
+    {"event": "result", "id": 1, "status": "ok", "results": [...], "outputs": [...], "elapsed_s": 0.4}
+    {"event": "result", "id": 1, "status": "error", "error": "..."}
+
+Control messages: ``{"cmd": "ping"}``, ``{"cmd": "stats"}``,
+``{"cmd": "clear_cache"}`` and ``{"cmd": "shutdown"}`` (end of input also stops
+the worker).
+
+Usage:
+    python src/worker_daemon.py [--defaults config/true_gui_defaults.json] [--cache-dir DIR] [--no-warm-up]
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Callable, List, Optional
+
+import numpy as np
+
+import ocr_true_scaling
+import plot_render
+from profile_cache import MemoryProfileCache, ProfileCache
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULTS_PATH = os.path.join(REPO_ROOT, 'config', 'true_gui_defaults.json')
+# GUI settings that only remember dialog folders
+GUI_ONLY_KEYS = ('last_ref_pdd_dir', 'last_eval_pdd_dir', 'last_ref_ocr_dir', 'last_eval_ocr_dir')
+# Options given once per OCR pair (a list in a job repeats the flag)
+_APPEND_KEYS = ('ref_ocr_file', 'eval_ocr_file')
+
+
+def load_defaults(path: Optional[str]) -> dict:
+    """GUI defaults JSON without the dialog-folder keys ({} when ``path`` is None or missing)."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        cfg = json.load(f)
+    return {k: v for k, v in cfg.items() if k not in GUI_ONLY_KEYS}
+
+
+def job_argv(params: dict) -> List[str]:
+    """``ocr_true_scaling`` argument list for a job dict (GUI JSON names, ``_`` for ``-``)."""
+    valid = {opt[2:].replace('-', '_') for a in ocr_true_scaling.build_parser()._actions
+             for opt in a.option_strings if opt.startswith('--')}
+    unknown = sorted(k for k in params if k not in valid and k not in GUI_ONLY_KEYS)
+    if unknown:
+        raise ValueError(f"unknown job parameter(s): {', '.join(unknown)}")
+    argv = []
+    for key, value in params.items():
+        if key in GUI_ONLY_KEYS or value is None:
+            continue
+        flag = '--' + key.replace('_', '-')
+        if isinstance(value, bool):
+            if value:
+                argv.append(flag)
+        elif isinstance(value, (list, tuple)):
+            if key in _APPEND_KEYS:
+                for v in value:
+                    argv.extend([flag, str(v)])
+            else:
+                argv.append(flag)
+                argv.extend(str(v) for v in value)
+        else:
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)  # GUI spin boxes save 5.0 for integer options
+            argv.extend([flag, str(value)])
+    return argv
+
+
+def _outputs(results: List[dict]) -> List[str]:
+    paths = []
+    for r in results:
+        for k, v in r.items():
+            if k.endswith('_path') and isinstance(v, str) and v not in paths:
+                paths.append(v)
+    return paths
+
+
+def _jsonable(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+class _LineStream:
+    """File-like object that forwards every complete line to ``emit``."""
+
+    def __init__(self, emit: Callable[[str], None]):
+        self._emit = emit
+        self._buf = ''
+
+    def write(self, text: str) -> int:
+        self._buf += text
+        while '\n' in self._buf:
+            line, self._buf = self._buf.split('\n', 1)
+            self._emit(line)
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buf:
+            self._emit(self._buf)
+            self._buf = ''
+
+
+class Worker:
+    """Runs jobs in this process with a shared profile cache; ``send`` receives every reply dict."""
+
+    def __init__(self, send: Callable[[dict], None], defaults: Optional[dict] = None,
+                 cache: Optional[MemoryProfileCache] = None):
+        self.send = send
+        self.defaults = dict(defaults or {})
+        self.cache = cache if cache is not None else MemoryProfileCache()
+        self.jobs_done = 0
+
+    def warm_up(self) -> None:
+        # Pay the plotting and smoothing imports before the first job
+        plot_render.use_agg()
+        import matplotlib.backends.backend_agg  # noqa: F401
+        import matplotlib.figure  # noqa: F401
+        import scipy.signal  # noqa: F401
+
+    def run_job(self, job: dict) -> dict:
+        """Run one analysis job; never raises, the reply is also returned."""
+        job_id = job.get('id')
+        params = dict(self.defaults, **{k: v for k, v in job.items() if k not in ('id', 'cmd')})
+        t0 = time.perf_counter()
+
+        def log(line, stream='stdout'):
+            self.send({'event': 'log', 'id': job_id, 'stream': stream, 'line': line})
+
+        out, err = _LineStream(log), _LineStream(lambda line: log(line, 'stderr'))
+        reply = {'event': 'result', 'id': job_id}
+        try:
+            argv = job_argv(params)
+            with contextlib.redirect_stderr(err):
+                args = ocr_true_scaling.build_parser().parse_args(argv)
+            ocr_true_scaling.gamma_criteria(args)
+            ocr_true_scaling.ocr_pairs(args)
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                results = ocr_true_scaling.run_pairs(args, self.cache)
+            reply.update(status='ok', results=results, outputs=_outputs(results))
+        except SystemExit as e:  # argparse errors (message already streamed)
+            reply.update(status='error', error=f"invalid arguments (exit {e.code})")
+        except Exception as e:
+            reply.update(status='error', error=f"{type(e).__name__}: {e}")
+        finally:
+            out.flush()
+            err.flush()
+        reply['elapsed_s'] = round(time.perf_counter() - t0, 3)
+        self.jobs_done += 1
+        self.send(reply)
+        return reply
+
+    def handle(self, msg: dict) -> bool:
+        """Dispatch one request; returns False once the worker should stop."""
+        cmd = msg.get('cmd', 'run')
+        if cmd == 'run':
+            self.run_job(msg)
+        elif cmd == 'ping':
+            self.send({'event': 'pong', 'id': msg.get('id')})
+        elif cmd == 'stats':
+            self.send(dict(self.cache.stats(), event='stats', id=msg.get('id'), jobs=self.jobs_done))
+        elif cmd == 'clear_cache':
+            self.send({'event': 'cleared', 'id': msg.get('id'), 'entries': self.cache.invalidate()})
+        elif cmd == 'shutdown':
+            self.send({'event': 'bye', 'id': msg.get('id')})
+            return False
+        else:
+            self.send({'event': 'result', 'id': msg.get('id'), 'status': 'error', 'error': f"unknown cmd: {cmd}"})
+        return True
+
+    def serve(self, lines) -> None:
+        """Handle JSON requests from an iterable of lines until ``shutdown`` or end of input."""
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                msg = json.loads(line)
+                if not isinstance(msg, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                self.send({'event': 'result', 'id': None, 'status': 'error', 'error': f"bad request: {e}"})
+                continue
+            if not self.handle(msg):
+                break
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Warm ocr_true_scaling worker (JSON lines on stdin/stdout)')
+    ap.add_argument('--defaults', type=str, default=DEFAULTS_PATH,
+                    help='GUI defaults JSON applied under every job (default: config/true_gui_defaults.json)')
+    ap.add_argument('--no-defaults', action='store_true', help='start jobs from the ocr_true_scaling defaults only')
+    ap.add_argument('--cache-dir', type=str, default=None,
+                    help='also keep parsed profiles on disk (ProfileCache) behind the in-memory cache')
+    ap.add_argument('--no-warm-up', action='store_true', help='import matplotlib/scipy on the first job instead')
+    args = ap.parse_args()
+
+    # Protocol lines are ASCII JSON; the job log goes through them, never straight to stdout
+    out = sys.stdout
+    sys.stdin.reconfigure(encoding='utf-8')
+
+    def send(msg: dict) -> None:
+        out.write(json.dumps(msg, default=_jsonable) + '\n')
+        out.flush()
+
+    t0 = time.perf_counter()
+    try:
+        defaults = {} if args.no_defaults else load_defaults(args.defaults)
+    except (OSError, ValueError) as e:
+        print(f"Error: cannot read defaults {args.defaults}: {e}", file=sys.stderr)
+        sys.exit(1)
+    backing = ProfileCache(args.cache_dir) if args.cache_dir else None
+    worker = Worker(send, defaults, MemoryProfileCache(backing=backing))
+    if not args.no_warm_up:
+        worker.warm_up()
+    send({'event': 'ready', 'version': ocr_true_scaling.__version__,
+          'elapsed_s': round(time.perf_counter() - t0, 3)})
+    worker.serve(sys.stdin)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("scipy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import batch_engine as mod  # type: ignore
+    return mod
+
+
+def test_expand_cases_builds_explicit_argv(tmp_path):
+    mod = _import_module()
+    manifest_path = tmp_path / "campaign.json"
+    manifest_path.write_text(json.dumps({
+        "measured_dir": os.path.abspath(os.path.join("tests", "data", "measured_csv")),
+        "output_root": "out",
+        "axes": ["x"],
+        "params": {"cutoff": 20, "grid": 0.2},
+        "scenarios": [
+            {"folder": os.path.abspath(os.path.join("tests", "data", "PHITS")), "size": "05x05m", "name": "rev"},
+            {"folder": str(tmp_path / "missing"), "size": "05x05", "depths": "10"},
+        ],
+    }), encoding="utf-8")
+    cases = mod.expand_cases(mod.load_manifest(str(manifest_path)), log=lambda msg: None)
+    assert [(c["depth_cm"], c["axis"]) for c in cases] == [(5.0, "x"), (10.0, "x"), (20.0, "x")]
+    argv = cases[1]["argv"]
+    assert argv[argv.index("--ref-ocr-file") + 1].endswith("05x05m10cm-xXlat.csv")
+    assert argv[argv.index("--eval-ocr-file") + 1].endswith("deposit-y-water-100x.out")
+    assert argv[argv.index("--output-dir") + 1] == str(tmp_path / "out" / "rev")
+    assert argv[argv.index("--cutoff") + 1] == "20" and argv[argv.index("--grid") + 1] == "0.2"
+
+
+def test_run_batch_in_process_matches_cli(tmp_path):
+    mod = _import_module()
+    manifest = {
+        "measured_dir": os.path.abspath(os.path.join("tests", "data", "measured_csv")),
+        "output_root": str(tmp_path),
+        "depths": [10, 20],
+        "axes": ["x"],
+        "scenarios": [{"folder": os.path.abspath(os.path.join("tests", "data", "PHITS")), "size": "05x05"}],
+    }
+    cases = mod.expand_cases(manifest, log=lambda msg: None)
+    cases.append(dict(cases[0], argv=cases[0]["argv"] + ["--criteria", "bad"]))
+    jobs = mod.group_cases(cases)
+    assert [len(j["cases"]) for j in jobs] == [2, 1]  # one run_pairs job per scenario and parameter set
+    assert jobs[0]["argv"].count("--ref-ocr-file") == 2 and jobs[0]["argv"].count("--ref-pdd-file") == 1
+    rows = mod.run_batch(cases, workers=1, log=lambda msg: None)
+    assert rows[0]["status"] == "ok" and rows[0]["depth_cm"] == 10
+    assert rows[0]["rmse"] == pytest.approx(0.024224, abs=1e-6)
+    assert rows[0]["gamma1_gpr_percent"] == pytest.approx(81.82, abs=0.01)
+    assert rows[1]["status"] == "ok" and rows[1]["rmse"] != rows[0]["rmse"]
+    assert rows[1]["pdd_rmse"] == rows[0]["pdd_rmse"]
+    assert len([f for f in os.listdir(os.path.dirname(rows[0]["report_path"])) if f.startswith("PDDReport_")]) == 1
+    assert rows[2]["status"] == "error" and "invalid gamma criterion" in rows[2]["error"]
+    assert os.path.exists(rows[0]["report_path"]) and rows[1]["report_path"] != rows[0]["report_path"]
+    assert mod.run_case(cases[1])["rmse"] == rows[1]["rmse"]
+
+    junk = tmp_path / "deposit-junk.out"
+    junk.write_text("not a tally\n", encoding="utf-8")
+    argv = list(cases[0]["argv"])
+    argv[argv.index("--eval-ocr-file") + 1] = str(junk)
+    bad = mod.run_batch([cases[0], dict(cases[0], depth_cm=5.0, argv=argv)], workers=1, log=lambda msg: None)
+    assert bad[0]["status"] == "ok" and bad[0]["rmse"] == rows[0]["rmse"]  # only the bad pair fails
+    assert bad[1]["status"] == "error" and bad[1]["depth_cm"] == 5.0
+
+    summary = mod.write_summary(rows, str(tmp_path / "batch_summary.csv"))
+    with open(summary, encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 4
+    with open(str(tmp_path / "batch_summary.json"), encoding="utf-8") as f:
+        assert json.load(f)[0]["status"] == "ok"
@@ -0,0 +1,66 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("scipy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import campaign_figure as mod  # type: ignore
+    return mod
+
+
+def test_campaign_figures_from_deferred_plots(tmp_path):
+    mod = _import_module()
+    import batch_engine  # type: ignore
+    from matplotlib.figure import Figure
+
+    phits = os.path.abspath(os.path.join("tests", "data", "PHITS"))
+    manifest = {
+        "measured_dir": os.path.abspath(os.path.join("tests", "data", "measured_csv")),
+        "output_root": str(tmp_path),
+        "depths": [5, 10],
+        "axes": ["x"],
+        "params": {"plots": "deferred", "export_csv": False, "export_gamma": False},
+        "scenarios": [{"folder": phits, "size": "05x05", "name": "revA"},
+                      {"folder": phits, "size": "05x05", "name": "revB", "params": {"dd1": 1}}],
+    }
+    rows = batch_engine.run_batch(batch_engine.expand_cases(manifest, log=lambda msg: None), workers=1,
+                                  log=lambda msg: None)
+    assert all(r["status"] == "ok" and r["plot_path"] is None and os.path.exists(r["plot_spec_path"]) for r in rows)
+    assert not os.listdir(tmp_path / "revA" / "plots")  # no per-case PNGs
+
+    fig = Figure()
+    mod.draw_group(fig, mod.group_rows(rows, "size")["05x05"], "size")
+    assert len(fig.axes) == 3  # PDD column + 2 depths x 1 axis
+    assert [t.get_text() for t in fig.legends[0].get_texts()] == ["Reference", "revA", "revB"]
+    ocr = [ax for ax in fig.axes if ax.get_title().startswith("d = ")]
+    assert ocr[0].get_shared_y_axes().joined(*ocr) and len(ocr[0].lines) == 3
+
+    fig = Figure()
+    mod.draw_group(fig, mod.group_rows(rows, "size")["05x05"], "size", max_overlays=1)
+    assert [t.get_text() for t in fig.legends[0].get_texts()] == ["Reference", "revA"]
+    assert "first 1 of 2" in fig.get_suptitle()
+    styles = mod._styles([str(i) for i in range(12)])
+    assert len({(s["color"], s.get("linestyle", "-")) for s in styles.values()}) == 12  # no repeats past 10 colours
+
+    # revA lacks its 5 cm case and its PDD plot: revB keeps its colour in every panel
+    from matplotlib.colors import to_hex
+    incomplete = [dict(r, pdd_plot_spec_path=None) if r["name"] == "revA" else r for r in rows[1:]]
+    fig = Figure()
+    mod.draw_group(fig, incomplete, "size")
+    colors = {ax.get_title(): [to_hex(line.get_color()) for line in ax.lines[1:]] for ax in fig.axes}
+    assert colors == {"PDD": [to_hex("C1")], "d = 5 cm, x": [to_hex("C1")],
+                      "d = 10 cm, x": [to_hex("C0"), to_hex("C1")]}
+
+    out = tmp_path / "campaign"
+    paths = mod.render_campaign(rows, str(out), "name")
+    assert [os.path.basename(p) for p in paths] == ["Campaign_revA.png", "Campaign_revB.png"]
+    pdf = mod.render_campaign(rows, str(out), "size", "pdf")
+    assert pdf == [str(out / "Campaign_by-size.pdf")] and os.path.getsize(pdf[0]) > 0
+    assert mod.render_campaign([dict(rows[0], plot_spec_path=None)], str(out)) == []
+    with pytest.raises(ValueError):
+        mod.group_rows(rows, "depth")
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("scipy")
+    pytest.importorskip("pymedphys")
+    sys.path.insert(0, os.path.abspath("src"))
+    import Comp_measured_phits_v10 as mod  # type: ignore
+    return mod
+
+
+def test_session_lines_from_header_and_name(tmp_path):
+    mod = _import_module()
+    args = argparse.Namespace(axis=None, depth_axis="y", cx=0.0, cy=0.0, cz=0.5,
+                              measured_file=["10x10m10cm-xXlat.csv"], measured_glob=["I150-*.csv", "*PDD*"])
+
+    measured = os.path.join("tests", "data", "measured_csv")
+    df, tank_axis = mod.load_measured_data(os.path.join(measured, "05x05m10cm-zYlng.csv"))
+    assert tank_axis == "y" and df["pos"].is_monotonic_increasing
+    # Tank Y (longitudinal) -> PHITS z at the depth from the name; tank Z -> PDD along the depth axis
+    assert mod.profile_line("05x05m10cm-zYlng.csv", tank_axis, args) == ("z", (0.0, 10.0, 0.5))
+    assert mod.profile_line("I150-20.0.csv", "x", args) == ("x", (0.0, 20.0, 0.5))
+    assert mod.profile_line("10x10mPDD-zZver.csv", "z", args) == ("y", (0.0, 0.0, 0.5))
+    with pytest.raises(ValueError):
+        mod.profile_line("scan.csv", "x", args)  # no depth in the name
+    args.axis = "x"  # explicit --axis keeps the legacy section coordinates
+    assert mod.profile_line("05x05m10cm-zYlng.csv", tank_axis, args) == ("x", (0.0, 0.0, 0.5))
+
+    for name in ("I150-10.0.csv", "I150-5.0.csv", "05x05mPDD-zZver.csv"):
+        (tmp_path / name).write_text("X (cm),Measured\n0,1\n")
+    assert mod.measured_files(args, str(tmp_path)) == [
+        "10x10m10cm-xXlat.csv", "I150-10.0.csv", "I150-5.0.csv", "05x05mPDD-zZver.csv"]
+
+
+def test_parse_uses_bin_centres_like_the_cube_reader(tmp_path):
+    mod = _import_module()
+    import dose_cube  # type: ignore
+    import numpy as np
+
+    lines = ["[ T - Deposit ]", "     mesh =  xyz",
+             "       nx =    4", "        x =  -2.0  2.0",
+             "       ny =    3", "        y =   0.0  3.0",
+             "       nz =    2", "        z =  -1.0  1.0",
+             "     axis =  xyz", "#newpage:", "#   x  y  z  all  r.err"]
+    lines += [f"  {i} {j} {k} {100 * k + 10 * j + i:.4E}  0.01" for k in range(2) for j in range(3) for i in range(4)]
+    legacy = tmp_path / "legacy.out"
+    legacy.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    data = mod.parse_phits_3d_tally(str(legacy))
+    assert data["x"].tolist() == [-1.5, -0.5, 0.5, 1.5] and data["y"].tolist() == [0.5, 1.5, 2.5]
+
+    mesh = tmp_path / "mesh.out"
+    mesh.write_text("\n".join(line.replace("x =  -2.0  2.0", "xmin = -2.0\n     xmax = 2.0")
+                              .replace("y =   0.0  3.0", "ymin = 0.0\n     ymax = 3.0")
+                              .replace("z =  -1.0  1.0", "zmin = -1.0\n     zmax = 1.0") for line in lines) + "\n",
+                    encoding="utf-8")
+    cube = dose_cube.read_xyz_cube(str(mesh))
+    data = mod.parse_phits_3d_tally(str(mesh))
+    for ax in "xyz":
+        assert np.allclose(data[ax], cube[ax])
+    assert float(data["dose"][3, 2, 1]) == 123.0
@@ -0,0 +1,126 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import dose_cube as mod  # type: ignore
+    return mod
+
+
+def _write_xyz_tally(path, nx=4, ny=3, nz=2, scale=1.0):
+    # Minimal PHITS-like [ T-Deposit ] xyz block; dose = 100*iz + 10*iy + ix (x fastest)
+    lines = [
+        "[ T - Deposit ]",
+        "     mesh =  xyz",
+        "     xmin =  -2.0", "     xmax =   2.0", f"       nx =    {nx}",
+        "     ymin =   0.0", "     ymax =   3.0", f"       ny =    {ny}",
+        "     zmin =  -1.0", "     zmax =   1.0", f"       nz =    {nz}",
+        "     axis =  xyz",
+        "#newpage:",
+        "#   x  y  z  all  r.err",
+    ]
+    for k in range(nz):
+        for j in range(ny):
+            for i in range(nx):
+                lines.append(f"  {i} {j} {k} {scale * (100 * k + 10 * j + i):.4E}  0.0{k + 1}")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_convert_and_memmap_cube_preserves_orientation(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    src = tmp_path / "dose3d.out"
+    _write_xyz_tally(src, scale=1.0)
+    _write_xyz_tally(src, scale=2.0)  # last block wins
+    cube = mod.open_cube(str(src), str(tmp_path / "cubes"))
+    assert isinstance(cube["dose"], np.memmap) or isinstance(cube["dose"].base, np.memmap)
+    assert cube["dose"].shape == (4, 3, 2)
+    assert float(cube["dose"][1, 2, 1]) == 2.0 * 121
+    assert float(cube["err"][0, 0, 1]) == 0.02
+    assert np.allclose(cube["x"], [-1.5, -0.5, 0.5, 1.5])
+    assert np.allclose(cube["z"], [-0.5, 0.5])
+
+    # Reopen: no reconversion while the source is unchanged
+    meta_mtime = os.path.getmtime(os.path.join(mod.default_cube_dir(str(src), str(tmp_path / "cubes")), "meta.json"))
+    again = mod.open_cube(str(src), str(tmp_path / "cubes"))
+    assert os.path.getmtime(os.path.join(mod.default_cube_dir(str(src), str(tmp_path / "cubes")), "meta.json")) == meta_mtime
+    assert np.array_equal(np.asarray(again["dose"]), np.asarray(cube["dose"]))
+
+
+def test_float32_cube_halves_storage(tmp_path):
+    mod = _import_module()
+    src = tmp_path / "dose3d.out"
+    _write_xyz_tally(src)
+    c64 = mod.convert_tally_to_cube(str(src), str(tmp_path / "c64"))
+    c32 = mod.convert_tally_to_cube(str(src), str(tmp_path / "c32"), dtype="float32")
+    assert mod.load_cube(c32)["dose"].dtype.name == "float32"
+    s64 = os.path.getsize(os.path.join(c64, "dose.npy"))
+    s32 = os.path.getsize(os.path.join(c32, "dose.npy"))
+    assert s32 < s64
+
+
+def test_stream_small_chunks_matches_cube_and_reports_progress(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    src = tmp_path / "dose3d.out"
+    _write_xyz_tally(src, nx=5, ny=4, nz=3)
+    with open(src, "a", encoding="utf-8") as f:
+        f.write("\n[ T - Track ]\n    mesh =  reg\n")
+    seen = []
+    cube = mod.read_xyz_cube(str(src), chunk_bytes=64, progress=lambda d, t: seen.append((d, t)))
+    assert cube["dose"].shape == (5, 4, 3)
+    assert float(cube["dose"][3, 2, 1]) == 123.0
+    assert float(cube["err"][0, 0, 2]) == 0.03
+    assert len(seen) > 1 and seen[-1] == (60, 60)
+    assert all(a[0] <= b[0] for a, b in zip(seen, seen[1:]))
+    mapped = mod.load_cube(mod.convert_tally_to_cube(str(src), str(tmp_path / "c"), chunk_bytes=64))
+    assert np.array_equal(np.asarray(mapped["dose"]), cube["dose"])
+    # Ragged rows whose total is a multiple of the width are dropped, not shifted
+    rows = mod._chunk_rows(b"1 2 3 4\n5 6\n7 8 9 10 11 12\n13 14 15 16\n", 4)
+    assert rows.tolist() == [[1, 2, 3, 4], [13, 14, 15, 16]]
+
+
+def test_profiles_interpolate_trilinearly_in_one_gather(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    src = tmp_path / "dose3d.out"
+    _write_xyz_tally(src, nx=5, ny=4, nz=3)
+    cube = mod.load_cube(mod.convert_tally_to_cube(str(src), str(tmp_path / "c")))
+    # Bin centres x=-1.6..1.6 (0.8), y=0.375..2.625 (0.75), z=-2/3..2/3: dose is linear in x, y, z
+    def exact(x, y, z):
+        return (x + 1.6) / 0.8 + 10 * (y - 0.375) / 0.75 + 100 * (z + 2.0 / 3.0) / (2.0 / 3.0)
+
+    pts = np.array([[0.1, 1.0, 0.2], [-1.6, 0.375, -2.0 / 3.0], [1.7, 1.0, 0.0]])
+    got = mod.sample_cube(cube, pts)
+    assert np.allclose(got[:2], [exact(*p) for p in pts[:2]]) and np.isnan(got[2])
+    # nearest == the legacy argmin snap (clamped to the mesh)
+    assert np.allclose(mod.sample_cube(cube, pts, method="nearest"), [112.0, 0.0, 114.0])
+
+    # PDD along y plus OCRs along x and z at two depths from one call
+    profiles = mod.extract_profiles(cube, ["y", "x", "z", "x"],
+                                    [[0.1, 0, 0.2], [0, 1.0, 0.2], [0.3, 2.0, 0], [0, 9.0, 0]])
+    assert [p["axis"] for p in profiles] == ["y", "x", "z", "x"]
+    assert np.allclose(profiles[0]["pos"], cube["y"])
+    assert np.allclose(profiles[0]["dose"], exact(0.1, cube["y"], 0.2))
+    assert np.allclose(profiles[1]["dose"], exact(cube["x"], 1.0, 0.2))
+    assert np.allclose(profiles[2]["dose"], exact(0.3, 2.0, cube["z"]))
+    assert np.all(np.isnan(profiles[3]["dose"]))  # depth outside the mesh
+
+    lines = mod.extract_lines(cube, [[-1.6, 0.375, 0.0], [0, 0.5, -0.5]], [[1.6, 2.625, 0.0], [0, 2.5, 0.5]], num=9)
+    assert lines["dose"].shape == (2, 9) and np.allclose(lines["pos"][1, -1], np.hypot(2.0, 1.0))
+    assert np.allclose(lines["dose"], exact(*np.moveaxis(lines["points"], -1, 0)))
+    grid = [np.linspace(-2.0, 2.0, 7), np.array([0.4, 1.9]), np.linspace(-0.7, 0.7, 4)]
+    mesh = np.stack(np.meshgrid(*grid, indexing="ij"), axis=-1)
+    for method in mod.INTERP_METHODS:
+        assert np.allclose(mod.sample_grid(cube, *grid, method=method), mod.sample_cube(cube, mesh, method=method),
+                           equal_nan=True)
+    with pytest.raises(ValueError):
+        mod.extract_profiles(cube, "w", [[0, 0, 0]])
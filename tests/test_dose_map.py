@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import dose_map as mod  # type: ignore
+    return mod
+
+
+def _field(x, half_width, penumbra=0.3):
+    import numpy as np
+    return 1.0 / (1.0 + np.exp((np.abs(x) - half_width) / penumbra))
+
+
+def test_dose_at_scales_by_pdd_and_follows_divergence():
+    mod = _import_module()
+    import numpy as np
+
+    x = np.arange(-10.0, 10.0001, 0.1)
+    z_pdd = np.linspace(0.0, 30.0, 301)
+    pdd = np.exp(-0.05 * z_pdd)
+    ssd = 100.0
+    depths = [5.0, 20.0]
+    # Field edge grows with (SSD + z): 5 cm at the surface
+    profiles = [(x, _field(x, 5.0 * (ssd + d) / ssd)) for d in depths]
+    flat = mod.build_dose_map(z_pdd, pdd, depths, profiles, x)
+    div = mod.build_dose_map(z_pdd, pdd, depths, profiles, x, ssd_cm=ssd)
+
+    at = div["rel"]
+    assert np.allclose(mod.dose_at(flat, depths), np.exp(-0.05 * np.array(depths))[:, None] * at, equal_nan=True)
+    expected = np.exp(-0.05 * 10.0) * _field(x, 5.0 * (ssd + 10.0) / ssd)
+    inner = np.abs(x) < 7.0
+    assert np.max(np.abs(mod.dose_at(div, 10.0)[0][inner] - expected[inner])) < 0.01
+    # Without divergence correction the penumbra is blurred by the linear blend
+    assert np.max(np.abs(mod.dose_at(flat, 10.0)[0][inner] - expected[inner])) > 0.02
+    assert np.isnan(mod.dose_at(div, [4.0, 21.0])).all()
+
+
+def test_gamma_map_matches_1d_and_identity():
+    mod = _import_module()
+    import numpy as np
+    from gamma1d import gamma_1d  # type: ignore
+
+    x = np.arange(-10.0, 10.0001, 0.1)
+    ref = _field(x, 5.0)[None, :]
+    evl = (1.01 * _field(x - 0.15, 5.0))[None, :]
+    g2d = mod.gamma_map([10.0], x, ref, evl, 2.0, 2.0, upsample=10)[0]
+    g1d = np.minimum(gamma_1d(x * 10, ref[0], x * 10, evl[0], 2.0, 2.0), 2.0)
+    assert np.nanmax(np.abs(g2d - g1d)) < 0.03
+    assert np.array_equal(np.isnan(g2d), np.isnan(g1d))
+
+    z = np.arange(5.0, 8.0001, 0.5)
+    ref_map = np.outer(np.exp(-0.05 * z), _field(x, 5.0))
+    g = mod.gamma_map(z, x, ref_map, ref_map.copy(), 3.0, 3.0)
+    assert np.nanmax(g) == 0.0
+    # A pure depth shift is found through the z offsets
+    shifted = np.outer(np.exp(-0.05 * (z - 0.1)), _field(x, 5.0))
+    g = mod.gamma_map(z, x, ref_map, shifted, 0.1, 2.0, upsample=10)
+    assert np.nanmax(g[:-1]) < 1.0 and np.nanmax(g[-1]) > 1.0  # last row has no deeper evaluation data
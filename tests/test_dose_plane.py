@@ -0,0 +1,105 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import dose_plane as mod  # type: ignore
+    return mod
+
+
+def _write_yz_map(path, values, y_from=1.5, y_to=-1.5, dy=1.0, z_from=-1.0, z_to=1.0, dz=1.0):
+    # Minimal ANGEL page as written by PHITS for axis = yz: rows run down the plot (y descending)
+    lines = [
+        "[ T - T r a c k ]",
+        "     mesh =  xyz", "       nx =    1", "     axis =   yz",
+        "     file = plane.out",
+        "#newpage:",
+        "#   x = (  -2.0000E+00  -   2.0000E+00  )",
+        "x: z [cm]",
+        "y: y [cm]",
+        "# ( ( data(z,y), z = 1, nz ), y = ny, 1, -1 )",
+        "",
+        f"hc:  y =   {y_from}     to  {y_to}     by  {dy}     ; x =  {z_from}     to   {z_to}     by  {dz}     ;",
+    ]
+    flat = [f"{v:.4E}" for row in values for v in row]
+    lines += ["  " + "  ".join(flat[i:i + 10]) for i in range(0, len(flat), 10)]
+    lines += ["", "hc: y= 0.005 to 0.995 by 0.01 ; x= 0.5 to 0.5 by 1 ;", " 1  2  3", "y: Flux [1/cm^2/source]"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_plane_tally_orientation_error_map_and_gamma(tmp_path):
+    mod = _import_module()
+    import numpy as np
+    import dose_map  # type: ignore
+
+    rows = [[10 * r + c for c in range(3)] for r in range(4)]  # file row r = y descending
+    _write_yz_map(tmp_path / "plane.out", rows)
+    _write_yz_map(tmp_path / "plane_err.out", [[0.01 * (r + 1)] * 3 for r in range(4)])
+    plane = mod.read_plane_tally(str(tmp_path / "plane.out"))
+    assert plane["plane"] == ("y", "z") and plane["slab_axis"] == "x"
+    assert plane["dose"].shape == (1, 4, 3) and np.allclose(plane["x"], [0.0])
+    assert np.allclose(plane["y"], [-1.5, -0.5, 0.5, 1.5]) and np.allclose(plane["z"], [-1.0, 0.0, 1.0])
+    assert float(plane["dose"][0, 3, 0]) == 0.0 and float(plane["dose"][0, 0, 2]) == 32.0
+    assert float(plane["err"][0, 0, 1]) == 0.04
+    assert np.array_equal(mod.plane_map(plane), plane["dose"][0])
+
+    # Real I600 maps: 80x80 xz at y = 0 and 100x40 yz, both with their _err maps
+    xz = mod.read_plane_tally(os.path.join("data", "phits_output", "I600", "track-xz-water.out"))
+    assert xz["dose"].shape == (80, 1, 80) and xz["err"].shape == (80, 1, 80)
+    assert float(xz["dose"][-1, 0, 0]) == 2.269e-05 and np.allclose(xz["slab"], [[-0.1, 0.1]])
+    yz = mod.read_plane_tally(os.path.join("data", "phits_output", "I600", "track-yz-water.out"))
+    assert yz["plane"] == ("y", "z") and yz["dose"].shape == (1, 100, 40) and yz["y"][0] < yz["y"][-1]
+
+    # Same grid: identical to dose_map.gamma_map; the difference map is in % of the reference maximum
+    ev = dict(xz, dose=np.roll(xz["dose"], 1, axis=2) * 1.02, err=None)
+    res = mod.compare_planes(xz, ev, 2.0, 2.0, norm="none", upsample=3)
+    ref2d = dose_map.gamma_map(xz["x"], xz["z"], mod.plane_map(xz), mod.plane_map(ev), 2.0, 2.0, upsample=3)
+    assert np.allclose(mod.plane_map(xz, res["gamma"]), ref2d, atol=1e-6, equal_nan=True)
+    assert res["evaluated"] == int(np.count_nonzero(~np.isnan(ref2d)))
+    assert np.allclose(res["diff"], (ev["dose"] - xz["dose"]) / xz["dose"].max() * 100.0)
+    same = mod.compare_planes(xz, xz, 2.0, 2.0, max_err=0.01)
+    assert same["pass_rate"] == 100.0 and same["max_abs_diff"] == 0.0
+    assert same["evaluated"] < mod.compare_planes(xz, xz, 2.0, 2.0)["evaluated"]
+    with pytest.raises(ValueError):
+        mod.compare_planes(xz, yz, 2.0, 2.0)
+
+
+def test_measured_profiles_in_the_plane(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    # yz plane: depth y 0..20 cm, lateral z -5..5 cm; dose = PDD(y) * OCR(z)
+    y = np.arange(20.0, -0.5, -1.0)
+    z = np.arange(-5.0, 5.01, 0.5)
+    pdd = np.exp(-0.05 * y)
+    ocr = 1.0 / (1.0 + np.exp((np.abs(z) - 3.0) / 0.3))
+    _write_yz_map(tmp_path / "plane.out", np.outer(pdd, ocr), y_from=20.0, y_to=0.0, z_from=-5.0, z_to=5.0, dz=0.5)
+    plane = mod.read_plane_tally(str(tmp_path / "plane.out"))
+
+    pdd_csv = tmp_path / "10x10mPDD-zZver.csv"
+    np.savetxt(pdd_csv, np.c_[np.arange(0.0, 20.0, 0.25), np.exp(-0.05 * np.arange(0.0, 20.0, 0.25))],
+               delimiter=",", header="Z (cm),Dose", comments="")
+    lat_csv = tmp_path / "10x10m10cm-zYlng.csv"
+    zs = np.linspace(-4.5, 4.5, 37)
+    np.savetxt(lat_csv, np.c_[zs, 1.0 / (1.0 + np.exp((np.abs(zs) - 3.0) / 0.3))], delimiter=",",
+               header="Y (cm),Dose", comments="")
+    profiles = []
+    for path in (pdd_csv, lat_csv):
+        t = mod.read_measured_csv(str(path))
+        axis, centre = mod.measured_line(str(path), t["header"])
+        profiles.append({"axis": axis, "centre": centre, "pos": t["pos"], "dose": t["dose"]})
+    axis, centre = mod.measured_line("10x10m10cm-xXlat.csv", ["X (cm)"])
+    profiles.append({"axis": axis, "centre": centre, "pos": zs, "dose": np.ones_like(zs)})
+    assert [p["axis"] for p in profiles] == ["y", "z", "x"] and profiles[1]["centre"] == (0.0, 10.0, 0.0)
+
+    out = mod.compare_plane_profiles(plane, profiles, 2.0, 2.0)
+    assert out[0]["gamma_pass_percent"] == 100.0 and out[0]["rmse_percent"] < 0.5
+    assert out[1]["gamma_pass_percent"] == 100.0 and out[1]["points"] > 20
+    assert "does not lie" in out[2]["error"]
+    profiles[1]["centre"] = (3.0, 10.0, 0.0)  # outside the x slab -2..2 cm
+    assert "outside the tallied slab" in mod.compare_plane_profiles(plane, profiles[1:2], 2.0, 2.0)[0]["error"]
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import gamma3d as mod  # type: ignore
+    return mod
+
+
+def _field(x, y, z, shift=0.0):
+    import numpy as np
+    X, Y, Z = np.meshgrid(x, y, z, indexing="ij")
+    edge = lambda u: 1.0 / (1.0 + np.exp((np.abs(u) - 3.0) / 0.3))  # noqa: E731
+    return np.exp(-Y / 10.0) * edge(X - shift) * edge(Z)
+
+
+def test_single_slab_matches_2d_gamma_map_and_tiling():
+    mod = _import_module()
+    import numpy as np
+    import dose_map  # type: ignore
+
+    x = np.arange(-5.0, 5.01, 0.25)
+    y = np.arange(0.0, 8.01, 0.25)
+    ref = {"x": x, "y": y, "z": np.array([0.0]), "dose": _field(x, y, [0.0])}
+    evl = {"x": x, "y": y, "z": np.array([0.0]), "dose": 1.01 * _field(x, y, [0.0], shift=0.13)}
+    g = mod.gamma_3d(ref, evl, 2.0, 2.0, upsample=3, tile=7)
+    g2 = dose_map.gamma_map(y, x, ref["dose"][:, :, 0].T, evl["dose"][:, :, 0].T, 2.0, 2.0, upsample=3)
+    assert np.array_equal(np.isnan(g[:, :, 0]), np.isnan(g2.T))
+    assert np.nanmax(np.abs(g[:, :, 0] - g2.T)) < 1e-6
+    assert np.array_equal(mod.gamma_3d(ref, evl, 2.0, 2.0, upsample=3, tile=64, workers=2), g, equal_nan=True)
+
+
+def test_volume_on_other_grid_and_loader(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    x = np.arange(-5.0, 5.01, 0.3)
+    ref = {"x": x, "y": x + 5.0, "z": x, "dose": _field(x, x + 5.0, x)}
+    xe = np.arange(-6.0, 6.01, 0.2)
+    # Evaluation grid stored with a decreasing y axis, shifted laterally by 1 mm
+    np.savez(tmp_path / "eval.npz", x=xe, y=(xe + 5.0)[::-1], z=xe, dose=_field(xe, xe + 5.0, xe, 0.1)[:, ::-1, :])
+    evl = mod.load_dose_grid(str(tmp_path / "eval.npz"))
+    assert evl["y"][0] < evl["y"][-1]
+    g = mod.gamma_3d(ref, evl, 2.0, 2.0, upsample=3, workers=2)
+    assert mod.pass_rate(g) > 99.0 and np.isnan(g[0, -1, 0])  # corner is below the cutoff
+
+    # Brute force over the same 1 mm lattice inside the 4 mm search sphere
+    import dose_cube  # type: ignore
+    steps = np.arange(-4, 5) * 0.1
+    off = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+    off = off[np.sum(off ** 2, axis=1) <= 0.4 ** 2 + 1e-12]
+    norm = ref["dose"].max()
+    rng = np.random.default_rng(3)
+    for i, j, k in np.argwhere(~np.isnan(g))[rng.choice(np.count_nonzero(~np.isnan(g)), 25)]:
+        p = np.array([x[i], x[j] + 5.0, x[k]])
+        e = dose_cube.sample_cube(evl, p + off)
+        g2 = ((e - ref["dose"][i, j, k]) / (0.02 * norm)) ** 2 + np.sum(off ** 2, axis=1) / 0.2 ** 2
+        assert abs(g[i, j, k] - min(np.sqrt(np.nanmin(g2)), 2.0)) < 1e-5
+    with pytest.raises(ValueError):
+        mod.gamma_3d(dict(ref, x=np.r_[x[:-1], 10.0]), evl, 2.0, 2.0)
@@ -0,0 +1,53 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("scipy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import ocr_true_scaling as mod  # type: ignore
+    return mod
+
+
+def test_incremental_skips_unchanged_and_reruns_dirty(tmp_path):
+    mod = _import_module()
+    data = os.path.join("tests", "data")
+    eval_ocr = tmp_path / "deposit-y-water-100x.out"
+    shutil.copy(os.path.join(data, "PHITS", "deposit-y-water-100x.out"), eval_ocr)
+    argv = [
+        "--ref-pdd-type", "csv", "--ref-pdd-file", os.path.join(data, "measured_csv", "05x05mPDD-zZver.csv"),
+        "--eval-pdd-type", "phits", "--eval-pdd-file", os.path.join(data, "PHITS", "deposit-z-water.out"),
+        "--ref-ocr-type", "csv", "--ref-ocr-file", os.path.join(data, "measured_csv", "05x05m10cm-xXlat.csv"),
+        "--eval-ocr-type", "phits", "--eval-ocr-file", str(eval_ocr),
+        "--grid", "0.1", "--output-dir", str(tmp_path / "out"), "--incremental",
+    ]
+    first = mod.run(mod.build_parser().parse_args(argv))
+    assert first["skipped"] is False
+
+    second = mod.run(mod.build_parser().parse_args(argv))
+    assert second["skipped"] is True and second["rmse"] == first["rmse"]
+
+    # Parameter change -> dirty
+    assert mod.run(mod.build_parser().parse_args(argv + ["--cutoff", "20"]))["skipped"] is False
+    # Content change -> dirty (same path)
+    with open(eval_ocr, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert mod.run(mod.build_parser().parse_args(argv + ["--cutoff", "20"]))["skipped"] is False
+    # Deleted artifact -> rebuilt
+    again = mod.run(mod.build_parser().parse_args(argv + ["--cutoff", "20"]))
+    assert again["skipped"] is True
+    os.remove(again["report_path"])
+    rebuilt = mod.run(mod.build_parser().parse_args(argv + ["--cutoff", "20"]))
+    assert rebuilt["skipped"] is False and os.path.exists(rebuilt["report_path"])
+
+    # Dose-map options leave the pair results alone; the re-run line keeps them
+    dose_map = ["--cutoff", "20", "--dose-map", "--map-dz", "0.5", "--map-depths", "7.5", "--ssd", "100"]
+    assert mod.run(mod.build_parser().parse_args(argv + dose_map))["skipped"] is True
+    assert mod.rerun_command(mod.build_parser().parse_args(argv + dose_map)).endswith(
+        "--dose-map --map-dz 0.5 --map-depths 7.5 --ssd 100")
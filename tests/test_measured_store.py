@@ -0,0 +1,67 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import measured_store as mod  # type: ignore
+    return mod
+
+
+def test_parse_measured_name_schemes():
+    mod = _import_module()
+    m = mod.parse_measured_name("data/measured_csv/05x05m10cm-xXlat.csv")
+    assert m["field"] == "05x05" and m["field_cm"] == 5.0
+    assert m["scan"] == "ocr" and m["depth_cm"] == 10.0 and m["axis"] == "x"
+    m = mod.parse_measured_name("30x30mPDD-zZver.csv")
+    assert m["scan"] == "pdd" and m["depth_cm"] is None and m["axis"] == "z"
+    m = mod.parse_measured_name("I150-10.0.csv")
+    assert m["field"] == "I150" and m["depth_cm"] == 10.0
+    assert mod.parse_measured_name("notes.csv") is None
+
+
+def test_ingest_query_and_reload(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    src = os.path.join("data", "measured_csv")
+    meas = tmp_path / "meas"
+    meas.mkdir()
+    for name in ("10x10m10cm-xXlat.csv", "10x10m10cm-zYlng.csv", "10x10mPDD-zZver.csv", "I150-10.0.csv"):
+        shutil.copy(os.path.join(src, name), meas / name)
+    (meas / "README.csv").write_text("not,a profile\n", encoding="utf-8")
+    with open(os.path.join(src, "I150-10.0.csv"), encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    (meas / "I150-20.0.csv").write_text("\n".join(["Y (cm),Measured"] + lines[1:]) + "\n", encoding="utf-8")
+
+    store_path = str(tmp_path / "store.npz")
+    store = mod.MeasuredStore.open(store_path, str(meas))
+    assert len(store) == 5
+    ocrs = store.query(field="10x10", scan="ocr", depth_cm=10)
+    assert sorted(r["axis"] for r in ocrs) == ["x", "z"]
+    assert store.get("I150", "ocr", 10.0, "x")["file"] == "I150-10.0.csv"  # axis from the CSV header
+    assert store.get("I150", "ocr", 20.0, "z")["file"] == "I150-20.0.csv"  # tank Y is PHITS z
+    rec = store.get("10x10", "pdd")
+    pos, dose = store.arrays(rec)
+    assert pos.size == rec["n"] and float(dose.max()) == 1.0
+
+    again = mod.MeasuredStore.open(store_path, str(meas))
+    assert again.ingest(str(meas)) == 0  # unchanged files are not reparsed
+    assert np.array_equal(again.arrays(again.get("10x10", "pdd"))[1], dose)
+
+
+def test_duplicate_keys_warn_and_keep_the_first_file(tmp_path, capsys):
+    mod = _import_module()
+    meas = tmp_path / "meas"
+    meas.mkdir()
+    shutil.copy(os.path.join("data", "measured_csv", "I150-10.0.csv"), meas / "I150-10.0.csv")
+    shutil.copy(os.path.join("data", "measured_csv", "I150-10.0.csv"), meas / "I150-10.csv")
+    store = mod.MeasuredStore()
+    assert store.ingest(str(meas)) == 2
+    assert store.get("I150", "ocr", 10, "x")["file"] == "I150-10.0.csv"
+    assert [(a["file"], b["file"]) for a, b in store.duplicates()] == [("I150-10.0.csv", "I150-10.csv")]
+    assert "I150-10.csv has the same field/depth/axis as I150-10.0.csv" in capsys.readouterr().err
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("scipy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import ocr_true_scaling as mod  # type: ignore
+    return mod
+
+
+def test_many_ocr_pairs_share_one_pdd_stage(tmp_path):
+    mod = _import_module()
+    data = os.path.abspath(os.path.join("tests", "data"))
+    pairs_file = tmp_path / "pairs.txt"
+    pairs_file.write_text(
+        "# ref, eval\n"
+        f"{data}/measured_csv/05x05m05cm-xXlat.csv, {data}/PHITS/deposit-y-water-050x.out\n"
+        f"{data}/measured_csv/05x05m20cm-zYlng.csv {data}/PHITS/deposit-y-water-200z.out\n",
+        encoding="utf-8")
+    common = [
+        "--ref-pdd-type", "csv", "--ref-pdd-file", os.path.join(data, "measured_csv", "05x05mPDD-zZver.csv"),
+        "--eval-pdd-type", "phits", "--eval-pdd-file", os.path.join(data, "PHITS", "deposit-z-water.out"),
+        "--ref-ocr-type", "csv", "--eval-ocr-type", "phits", "--grid", "0.1",
+    ]
+    first = ["--ref-ocr-file", os.path.join(data, "measured_csv", "05x05m10cm-xXlat.csv"),
+             "--eval-ocr-file", os.path.join(data, "PHITS", "deposit-y-water-100x.out")]
+    args = mod.build_parser().parse_args(common + first + ["--pairs", str(pairs_file), "--output-dir", str(tmp_path / "multi")])
+    results = mod.run_pairs(args)
+    assert [os.path.basename(r["eval_ocr_file"]) for r in results] == [
+        "deposit-y-water-100x.out", "deposit-y-water-050x.out", "deposit-y-water-200z.out"]
+    assert len(os.listdir(tmp_path / "multi" / "reports")) == 4  # 3 OCR reports + 1 PDD report
+    assert len({r["pdd_report_path"] for r in results}) == 1
+    with pytest.raises(ValueError):
+        mod.run(args)
+
+    single = mod.run(mod.build_parser().parse_args(common + first + ["--output-dir", str(tmp_path / "single")]))
+    assert results[0]["rmse"] == single["rmse"]
+    assert results[0]["gamma1_gpr_percent"] == single["gamma1_gpr_percent"]
+    assert results[0]["pdd_rmse"] == single["pdd_rmse"]
+
+
+def test_unbalanced_ocr_pairs_are_rejected():
+    mod = _import_module()
+    args = mod.build_parser().parse_args([
+        "--ref-pdd-type", "csv", "--ref-pdd-file", "a.csv", "--eval-pdd-type", "phits", "--eval-pdd-file", "b.out",
+        "--ref-ocr-type", "csv", "--eval-ocr-type", "phits",
+        "--ref-ocr-file", "r1.csv", "--ref-ocr-file", "r2.csv", "--eval-ocr-file", "e1.out",
+    ])
+    with pytest.raises(ValueError):
+        mod.ocr_pairs(args)
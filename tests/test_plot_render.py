@@ -0,0 +1,106 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("matplotlib")
+    sys.path.insert(0, os.path.abspath("src"))
+    import plot_render as mod  # type: ignore
+    return mod
+
+
+def _spec(path, kind="ocr", shift=0.0):
+    import numpy as np
+    x = np.linspace(-5, 5, 201)
+    return {"kind": kind, "path": str(path), "figsize": (6, 4), "title": f"shift {shift}",
+            "xlabel": "x (cm)", "ylabel": "dose", "grid": {"alpha": 0.3}, "legend": {"title": "gamma-mode: global"},
+            "series": [{"x": x, "y": np.exp(-x ** 2), "label": "ref"},
+                       {"x": x, "y": np.exp(-(x - shift) ** 2), "label": "eval", "type": "scatter", "style": {"s": 4}}]}
+
+
+def test_render_reuses_one_figure_per_kind_and_never_touches_pyplot(tmp_path):
+    mod = _import_module()
+    import matplotlib.image
+
+    mod.close_all()
+    paths = [mod.render(_spec(tmp_path / f"ocr{i}.png", shift=0.1 * i)) for i in range(20)]
+    paths.append(mod.render(_spec(tmp_path / "pdd.png", kind="pdd")))
+    assert all(os.path.getsize(p) > 0 for p in paths)
+    assert mod.open_figures() == 2  # one per kind, not one per plot
+    fig, ax = next(iter(mod._FIGURES.values()))
+    assert not ax.lines and not ax.collections  # artists dropped after each render
+    if "matplotlib.pyplot" in sys.modules:
+        assert sys.modules["matplotlib.pyplot"].get_fignums() == []
+    # A reused figure gives the same image as a fresh one
+    again = mod.render(_spec(tmp_path / "again.png", shift=0.5))
+    mod.close_all()
+    fresh = mod.render(_spec(tmp_path / "fresh.png", shift=0.5))
+    assert (matplotlib.image.imread(again) == matplotlib.image.imread(fresh)).all()
+    assert mod.close_all() == 1 and mod.open_figures() == 0
+
+    specs = [_spec(tmp_path / f"pool{i}.png", shift=0.2 * i) for i in range(4)]
+    assert mod.render_many(specs, workers=2) == [s["path"] for s in specs]
+    assert all(os.path.exists(s["path"]) for s in specs)
+    render, pool = mod.renderer(0)
+    assert render is mod.render and pool is None
+
+
+def test_deferred_plots_are_stored_and_rendered_later(tmp_path):
+    mod = _import_module()
+    pytest.importorskip("scipy")
+    import matplotlib.image
+    import ocr_true_scaling  # type: ignore
+
+    data = os.path.join("tests", "data")
+    argv = ["--ref-pdd-type", "csv", "--ref-pdd-file", os.path.join(data, "measured_csv", "05x05mPDD-zZver.csv"),
+            "--eval-pdd-type", "phits", "--eval-pdd-file", os.path.join(data, "PHITS", "deposit-z-water.out"),
+            "--ref-ocr-type", "csv", "--ref-ocr-file", os.path.join(data, "measured_csv", "05x05m10cm-xXlat.csv"),
+            "--eval-ocr-type", "phits", "--eval-ocr-file", os.path.join(data, "PHITS", "deposit-y-water-100x.out")]
+    parser = ocr_true_scaling.build_parser()
+    assert parser.parse_args(argv + ["--no-plot"]).plots == "none"
+    eager = ocr_true_scaling.run(parser.parse_args(argv + ["--output-dir", str(tmp_path / "eager")]))
+    out = tmp_path / "deferred"
+    res = ocr_true_scaling.run(parser.parse_args(argv + ["--output-dir", str(out), "--plots", "deferred"]))
+    assert res["plot_path"] is None and res["pdd_plot_path"] is None
+    assert res["rmse"] == eager["rmse"] and res["gamma1_gpr_percent"] == eager["gamma1_gpr_percent"]
+    assert os.path.exists(res["plot_spec_path"]) and not os.listdir(out / "plots")
+    none = ocr_true_scaling.run(parser.parse_args(argv + ["--output-dir", str(tmp_path / "none"), "--plots", "none"]))
+    assert none["plot_spec_path"] is None and none["pdd_plot_spec_path"] is None
+
+    entries = mod.find_specs([str(out)])
+    assert len(entries) == 2 and mod.find_specs([str(out)], match="PDD*") == [res["pdd_plot_spec_path"]]
+    spec = mod.load_spec(res["plot_spec_path"])
+    assert spec["path"] == os.path.abspath(eager["plot_path"]).replace(str(tmp_path / "eager"), str(out))
+    paths = mod.render_stored(entries)
+    assert sorted(os.path.basename(p) for p in paths) == sorted(os.listdir(out / "plots"))
+    # Rendering later gives the same image as the eager run
+    png = [p for p in paths if os.path.basename(p) == os.path.basename(eager["plot_path"])][0]
+    assert (matplotlib.image.imread(png) == matplotlib.image.imread(eager["plot_path"])).all()
+
+
+def test_render_pool_is_shut_down_when_a_pair_fails(tmp_path, monkeypatch):
+    mod = _import_module()
+    pytest.importorskip("scipy")
+    import ocr_true_scaling  # type: ignore
+
+    pools = []
+    real = mod.renderer
+
+    def spy(workers=0):
+        render, pool = real(workers)
+        pools.append(pool)
+        return render, pool
+
+    monkeypatch.setattr(mod, "renderer", spy)
+    data = os.path.join("tests", "data")
+    argv = ["--ref-pdd-type", "csv", "--ref-pdd-file", os.path.join(data, "measured_csv", "05x05mPDD-zZver.csv"),
+            "--eval-pdd-type", "phits", "--eval-pdd-file", os.path.join(data, "PHITS", "deposit-z-water.out"),
+            "--ref-ocr-type", "csv", "--ref-ocr-file", os.path.join(data, "measured_csv", "05x05m10cm-xXlat.csv"),
+            "--eval-ocr-type", "phits", "--eval-ocr-file", str(tmp_path / "missing.out"),
+            "--output-dir", str(tmp_path / "out"), "--render-workers", "1"]
+    with pytest.raises((OSError, ValueError)):
+        ocr_true_scaling.run(ocr_true_scaling.build_parser().parse_args(argv))
+    assert pools[0] is not None and pools[0]._pool._shutdown_thread
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import profile_cache as mod  # type: ignore
+    return mod
+
+
+def test_profile_cache_hits_without_calling_loader(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    src = tmp_path / "pdd.csv"
+    src.write_text("Z (cm),Measured\n0,0.5\n1,1.0\n", encoding="utf-8")
+    cache = mod.ProfileCache(str(tmp_path / "cache"))
+    calls = []
+
+    def loader(p):
+        calls.append(p)
+        return {"pos": np.array([0.0, 1.0]), "dose": np.array([0.5, 1.0])}, {"axis": "z"}
+
+    a1, m1 = cache.load(str(src), "csv", loader)
+    a2, m2 = cache.load(str(src), "csv", loader)
+    assert len(calls) == 1
+    assert m2 == {"axis": "z"}
+    assert np.array_equal(a1["dose"], a2["dose"])
+
+    # Content change -> new key -> reparse
+    src.write_text("Z (cm),Measured\n0,0.25\n1,1.0\n", encoding="utf-8")
+    os.utime(src, ns=(1, 1))
+    cache.load(str(src), "csv", loader)
+    assert len(calls) == 2
+
+    assert cache.invalidate(str(src)) == 1
+    cache.load(str(src), "csv", loader)
+    assert len(calls) == 3
+
+
+def test_profile_cache_evicts_least_recently_used(tmp_path):
+    mod = _import_module()
+    import numpy as np
+
+    cache = mod.ProfileCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    paths = []
+    for i in range(3):
+        p = tmp_path / f"f{i}.csv"
+        p.write_text(f"{i}\n", encoding="utf-8")
+        cache.put(str(p), "csv", {"dose": np.zeros(1000) + i}, {})
+        paths.append(str(p))
+    entries = cache.entries()
+    os.utime(cache._entry_path(cache.file_digest(paths[0]), "csv"), (1, 1))  # least recently used
+    cache.max_bytes = sum(size for _, size, _ in entries) - 1
+    assert cache.evict() == 1
+    assert cache.get(paths[0], "csv") is None
+    assert cache.get(paths[2], "csv") is not None
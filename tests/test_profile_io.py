@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import profile_io as mod  # type: ignore
+    return mod
+
+
+def test_read_phits_table_returns_column_arrays():
+    mod = _import_module()
+    path = os.path.join("tests", "data", "PHITS", "deposit-y-water-100x.out")
+    t = mod.read_phits_table(path)
+    n = len(t["value"])
+    assert n == 75
+    assert len(t["lower"]) == len(t["upper"]) == len(t["rel_err"]) == n
+    assert abs(float(t["lower"][0]) + 7.5) < 1e-12
+    assert abs(float(t["rel_err"][0]) - 0.0820) < 1e-12
+    assert t["axis"] == "x"
+    # depth slab centre from "#   y = ( 9.85 - 10.15 )"
+    assert abs(t["meta"]["y_center_cm"] - 10.0) < 1e-9
+
+
+def test_parse_phits_table_handles_crlf_and_ragged_rows():
+    mod = _import_module()
+    data = (
+        b"     axis =     z           # axis of output\r\n"
+        b"#  z-lower      z-upper      all         r.err \r\n"
+        b"   0.0000E+00   1.0000E+00   1.0000E-14  0.0100\r\n"
+        b"   1.0000E+00   2.0000E+00   3.0000E-14\r\n"
+        b"\r\n"
+        b"#   sum over    2.0000E+00   4.0000E-14  0.0050\r\n"
+    )
+    t = mod.parse_phits_table(data)
+    assert t["axis"] == "z"
+    assert list(t["centers"]) == [0.5, 1.5]
+    assert list(t["value"]) == [1e-14, 3e-14]
+    assert float(t["rel_err"][0]) == 0.01
+    # A 3- and a 5-value row among 4-value rows: the token count is still a multiple of 4
+    shifted = (
+        b"#  z-lower      z-upper      all         r.err \n"
+        b"   0.0000E+00   1.0000E+00   1.0000E-14  0.0100\n"
+        b"   1.0000E+00   2.0000E+00   3.0000E-14\n"
+        b"   2.0000E+00   3.0000E+00   5.0000E-14  0.0300  9.9\n"
+        b"   3.0000E+00   4.0000E+00   7.0000E-14  0.0400\n"
+    )
+    t = mod.parse_phits_table(shifted)
+    assert list(t["centers"]) == [0.5, 1.5, 2.5, 3.5]
+    assert list(t["value"]) == [1e-14, 3e-14, 5e-14, 7e-14]
+
+
+def test_index_tallies_records_every_block_and_seeks_directly(tmp_path):
+    mod = _import_module()
+    src = os.path.join("tests", "data", "PHITS", "deposit-y-water-100x.out")
+    with open(src, "rb") as f:
+        one = f.read()
+    path = tmp_path / "multi.out"
+    path.write_bytes(b"[ T i t l e ]\n  demo\n" + one + one.replace(b"axis =     x", b"axis =     y"))
+    blocks = mod.index_tallies(str(path))
+    assert [b["name"] for b in blocks] == ["T-Deposit", "T-Deposit"]
+    assert blocks[0]["end"] == blocks[1]["start"]
+    p = blocks[1]["params"]
+    assert p["mesh"] == "xyz" and p["nx"] == 75 and p["ny"] == 1 and p["nz"] == 1
+    assert p["xmin"] == -7.5 and p["xmax"] == 7.5
+    assert p["axis"] == "y" and p["part"] == "all"
+    last = mod.find_tally(blocks, "t-deposit")
+    t = mod.read_tally_table(str(path), last)
+    assert t["axis"] == "y" and len(t["value"]) == 75
+
+
+def test_read_measured_csv_sniffs_header_and_delimiter(tmp_path):
+    mod = _import_module()
+    comma = tmp_path / "a.csv"
+    comma.write_bytes("﻿X (cm),Measured\n0.1,2.0\n-0.1,4.0\n0.0,nan\n".encode("utf-8"))
+    t = mod.read_measured_csv(str(comma))
+    assert t["header"] == ["X (cm)", "Measured"] and t["delimiter"] == ","
+    assert list(t["pos"]) == [0.1, -0.1]
+    pos, dose = mod.load_csv_profile(str(comma))
+    assert list(pos) == [-0.1, 0.1] and list(dose) == [1.0, 0.5]
+
+    ws = tmp_path / "b.csv"
+    ws.write_text("depth dose\n1.0   5.0\n2.0 10.0\n", encoding="utf-8")
+    t = mod.read_measured_csv(str(ws))
+    assert t["delimiter"] is None and list(t["dose"]) == [5.0, 10.0]
+
+    # Irregular rows go through the pandas fallback
+    ragged = tmp_path / "c.csv"
+    ragged.write_text("Z (cm);Measured\n1;5\n2;oops\n3;6;extra\n4;8\n", encoding="utf-8")
+    t = mod.read_measured_csv(str(ragged))
+    assert t["delimiter"] == ";" and list(t["pos"]) == [1.0, 4.0]
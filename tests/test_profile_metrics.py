@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import profile_metrics as mod  # type: ignore
+    return mod
+
+
+def test_stack_metrics_of_known_trapezoids():
+    mod = _import_module()
+    import numpy as np
+
+    def trapezoid(x, half_width, ramp, tilt=0.0, shift=0.0):
+        u = x - shift
+        y = np.clip((half_width + ramp / 2 - np.abs(u)) / ramp, 0.0, 1.0)
+        return y * (1.0 + tilt * u)
+
+    x1 = np.arange(-10.0, 10.0001, 0.1)
+    x2 = np.arange(-8.0, 7.9, 0.25)  # different grid and range
+    profiles = [
+        (x1, trapezoid(x1, 5.0, 1.0)),
+        (x2, trapezoid(x2, 3.0, 0.5, shift=0.5)),
+        (x1, trapezoid(x1, 4.0, 1.0, tilt=0.01)),
+        (x1, np.zeros_like(x1)),
+    ]
+    m = mod.metrics_for_profiles(profiles)
+
+    assert np.allclose(m["fwhm_cm"][:2], [10.0, 6.0])
+    assert np.allclose(m["center_cm"][:2], [0.0, 0.5])
+    assert np.allclose(m["left_50_cm"][1], -2.5) and np.allclose(m["right_50_cm"][1], 3.5)
+    assert np.allclose(m["penumbra_80_20_cm"][:2], [0.6, 0.3])
+    assert np.allclose(m["penumbra_90_10_left_cm"][:2], [0.8, 0.4])
+    assert np.allclose(m["flatness_percent"][:2], 0.0) and np.allclose(m["symmetry_percent"][:2], 0.0)
+    assert m["flatness_percent"][2] > 1.0 and m["symmetry_percent"][2] > 1.0
+    assert np.isnan(m["fwhm_cm"][3]) and np.isnan(m["peak"][3])
+
+    # A uniform grid gives the same answers where the kinks sit on the grid
+    u = mod.metrics_for_profiles(profiles[:1], step=0.05)
+    assert np.allclose(u["fwhm_cm"], 10.0) and np.allclose(u["penumbra_80_20_cm"], 0.6)
+
+
+def test_fwhm_matches_peak_walk_on_measured_and_phits_profiles():
+    mod = _import_module()
+    import numpy as np
+    sys.path.insert(0, os.path.abspath("scripts"))
+    from fwhm_batch import collect_profiles, load_profile  # type: ignore
+
+    def walk(x, y):
+        i = int(np.argmax(y)); half = 0.5 * y[i]
+        L = R = None
+        for k in range(i, 0, -1):
+            y0, y1 = y[k - 1], y[k]
+            if (y0 <= half <= y1) or (y1 <= half <= y0):
+                L = x[k - 1] if y1 == y0 else x[k - 1] + (half - y0) * (x[k] - x[k - 1]) / (y1 - y0)
+                break
+        for k in range(i, len(x) - 1):
+            y0, y1 = y[k], y[k + 1]
+            if (y0 <= half <= y1) or (y1 <= half <= y0):
+                R = x[k + 1] if y1 == y0 else x[k] + (half - y0) * (x[k + 1] - x[k]) / (y1 - y0)
+                break
+        return abs(R - L)
+
+    files = [(t, p) for t, p in collect_profiles([os.path.join("tests", "data")])
+             if "PDD" not in p and "deposit-z" not in p]
+    assert len(files) == 12
+    profiles = [load_profile(t, p) for t, p in files]
+    m = mod.metrics_for_profiles(profiles)
+    expected = np.array([walk(x, y) for x, y in profiles])
+    assert np.allclose(m["fwhm_cm"], expected, rtol=0, atol=1e-9)
+    assert [mod.fwhm(x, y) for x, y in profiles] == list(expected)
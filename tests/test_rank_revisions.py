@@ -0,0 +1,80 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("pandas")
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("scipy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import rank_revisions as mod  # type: ignore
+    return mod
+
+
+def test_revisions_become_one_campaign(tmp_path):
+    mod = _import_module()
+    from measured_store import MeasuredStore  # type: ignore
+
+    assert mod.revision_field("Rev60-5x5-c8-0.49n") == "05x05"
+    assert mod.revision_field("Rev50-30x30--c8-0.49n") == "30x30"
+    assert mod.revision_field("I150", ["I150", "I15"]) == "I150"
+    assert mod.revision_field("Rev47-c8-0.49n", ["10x10"], default="10x10") == "10x10"
+    assert mod.revision_field("Rev47-c8-0.49n") is None
+
+    phits = os.path.join("tests", "data", "PHITS")
+    for name in ("Rev02-5x5", "Rev01-5x5", "Rev03-nosize"):
+        shutil.copytree(phits, tmp_path / "revs" / name)
+    (tmp_path / "revs" / "notes").mkdir()
+    revisions = mod.discover_revisions(str(tmp_path / "revs"))
+    assert [os.path.basename(r) for r in revisions] == ["Rev01-5x5", "Rev02-5x5", "Rev03-nosize"]
+
+    measured = os.path.abspath(os.path.join("tests", "data", "measured_csv"))
+    store = MeasuredStore.open(str(tmp_path / "store.npz"), measured)
+    manifest = mod.build_manifest(revisions, store, measured, str(tmp_path / "out"), [10], ["x", "z"],
+                                  {"grid": 0.1}, log=lambda msg: None)
+    assert [sc["name"] for sc in manifest["scenarios"]] == ["Rev01-5x5", "Rev02-5x5"]
+    cases = mod.expand_cases(manifest, store, log=lambda msg: None)
+    assert len(cases) == 4
+    assert all("--export-csv" not in c["argv"] for c in cases)
+
+
+def test_aggregate_ranks_within_size_and_depth():
+    mod = _import_module()
+
+    def row(name, depth, g1, rmse, status="ok"):
+        return {"name": name, "size": "10x10", "depth_cm": depth, "axis": "x", "status": status,
+                "gamma1_gpr_percent": g1, "gamma2_gpr_percent": g1, "rmse": rmse, "fwhm_delta_cm": -0.1,
+                "pdd_rmse": 0.01}
+
+    rows = [row("A", 5, 90.0, 0.02), row("A", 10, 70.0, 0.03),
+            row("B", 5, 95.0, 0.01), row("B", 10, 80.0, 0.02),
+            row("C", 5, None, None, "error"),
+            dict(row("D", 5, 50.0, 0.05), size="30x30")]
+    revs, depths = mod.aggregate(rows)
+    ten = [(r["rank"], r["name"]) for r in revs if r["size"] == "10x10"]
+    assert ten == [(1, "B"), (2, "A"), (3, "C")]
+    assert [r["rank"] for r in revs if r["size"] == "30x30"] == [1]
+    b = next(r for r in revs if r["name"] == "B")
+    assert b["mean_gamma1_gpr_percent"] == 87.5 and b["min_gamma1_gpr_percent"] == 80.0
+    assert b["mean_abs_fwhm_delta_cm"] == pytest.approx(0.1)
+    assert next(r for r in revs if r["name"] == "C")["failed"] == 1
+
+    revs, _ = mod.aggregate(rows, sort="rmse")
+    assert [r["name"] for r in revs if r["size"] == "10x10"] == ["B", "A", "C"]
+    at10 = [(r["rank"], r["name"]) for r in depths if r["size"] == "10x10" and r["depth_cm"] == 10]
+    assert at10 == [(1, "B"), (2, "A")]
+
+    # A revision without its deep cases (never expanded) ranks after the complete ones
+    rows.append(row("E", 5, 99.0, 0.001))
+    expected = {(n, "10x10"): {(5.0, "x"), (10.0, "x")} for n in "ABCE"}
+    expected[("F", "10x10")] = {(5.0, "x")}
+    expected[("D", "30x30")] = {(5.0, "x")}
+    revs, depths = mod.aggregate(rows, expected=expected)
+    assert [(r["name"], r["failed"], r["missing"]) for r in revs if r["size"] == "10x10"] == [
+        ("B", 0, 0), ("A", 0, 0), ("E", 0, 1), ("C", 1, 1), ("F", 0, 1)]  # E's 99 % does not lift it
+    assert [r["name"] for r in depths if r["size"] == "10x10" and r["depth_cm"] == 10] == ["B", "A", "C", "E"]
+    assert next(r for r in depths if r["name"] == "E" and r["depth_cm"] == 10)["missing"] == 1
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import shift_registration as mod  # type: ignore
+    return mod
+
+
+def _field(x, center=0.0, scale=1.0):
+    import numpy as np
+    return scale / (1.0 + np.exp((np.abs(x - center) - 5.0) / 0.3))
+
+
+def test_register_shift_recovers_offset_and_scale():
+    mod = _import_module()
+    import numpy as np
+
+    x = np.arange(-10.0, 10.0001, 0.1)
+    xe = np.arange(-9.87, 10.0, 0.13)  # different sampling
+    r = mod.register_shift(x, _field(x), xe, _field(xe, 0.237, 0.97), scale=True)
+    assert abs(r["shift_cm"] + 0.237) < 0.002
+    assert abs(r["scale"] - 1.0 / 0.97) < 0.002
+    assert r["rmse"] < 0.002
+    assert np.nanargmin(r["landscape_rmse"]) == np.argmin(np.abs(r["shifts_cm"] - r["shift_cm"]))
+
+    g = mod.register_shift(x, _field(x), xe, _field(xe, -0.4), metric="gamma", criterion=(1.0, 1.0, 10.0, False))
+    assert g["gamma_percent"] == 100.0 and abs(g["shift_cm"] - 0.4) <= 0.1
+    with pytest.raises(ValueError):
+        mod.register_shift(x, _field(x), xe, _field(xe), metric="gamma")
+
+
+def test_register_option_aligns_pdd_and_reports_landscape(tmp_path):
+    pytest.importorskip("pandas")
+    pytest.importorskip("matplotlib")
+    pytest.importorskip("scipy")
+    _import_module()
+    import ocr_true_scaling as ots  # type: ignore
+
+    data = os.path.join("tests", "data")
+    argv = [
+        "--ref-pdd-type", "csv", "--ref-pdd-file", os.path.join(data, "measured_csv", "05x05mPDD-zZver.csv"),
+        "--eval-pdd-type", "phits", "--eval-pdd-file", os.path.join(data, "PHITS", "deposit-z-water.out"),
+        "--ref-ocr-type", "csv", "--ref-ocr-file", os.path.join(data, "measured_csv", "05x05m10cm-xXlat.csv"),
+        "--eval-ocr-type", "phits", "--eval-ocr-file", os.path.join(data, "PHITS", "deposit-y-water-100x.out"),
+        "--grid", "0.1", "--eval-pdd-z-shift", "0.5",
+    ]
+    plain = ots.run(ots.build_parser().parse_args(argv + ["--output-dir", str(tmp_path / "plain")]))
+    reg = ots.run(ots.build_parser().parse_args(argv + ["--output-dir", str(tmp_path / "reg"), "--register", "pdd"]))
+    summary = reg["pdd_registration"]
+    # The hand-set 0.5 cm is undone: total shift lands near the optimum found without it
+    assert abs(summary["eval_pdd_z_shift_total_cm"] + 0.05) < 0.01
+    assert reg["pdd_rmse"] < plain["pdd_rmse"]
+    assert os.path.exists(summary["landscape_path"]) and reg["ocr_registration"] is None
+
+    # With --register-scale the factor fits the curve re-normalised at the registered shift
+    scaled = ots.build_parser().parse_args(argv + ["--register", "pdd", "--register-scale", "--norm-mode", "z_ref"])
+    pdd = ots.load_pdd_stage(scaled)
+    _, k = _import_module().shift_landscape(pdd["ref_pos"], pdd["ref_norm"], pdd["eval_pos"], pdd["eval_norm"],
+                                            [0.0], scale=True)
+    assert k[0] == pytest.approx(1.0, abs=1e-9)
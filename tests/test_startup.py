@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("scipy")  # the --no-plot run still smooths
+    sys.path.insert(0, os.path.abspath("scripts"))
+    import bench_startup as mod  # type: ignore
+    return mod
+
+
+def test_cli_cold_start_without_heavy_imports():
+    mod = _import_module()
+    rows = mod.run_benchmarks(repeat=1, scale=float(os.environ.get("STARTUP_BUDGET_SCALE", "1.0")))
+    assert [r["name"] for r in rows][0] == "ocr_true_scaling -V"
+    for r in rows:
+        assert r["returncode"] == 0, (r["name"], r["stderr"])
+        assert not r["forbidden_loaded"], (r["name"], r["forbidden_loaded"])
+    assert "matplotlib" not in rows[-2]["modules"]  # no-plot run never touches pyplot
+    assert rows[-1]["name"].endswith("--plots deferred run") and "matplotlib" not in rows[-1]["modules"]
+    # Wall-clock budgets depend on the machine: opt in with STARTUP_BUDGET_CHECK=1
+    # (scripts/bench_startup.py always checks them)
+    if os.environ.get("STARTUP_BUDGET_CHECK") == "1":
+        for r in rows:
+            assert r["seconds"] <= r["budget_s"], (r["name"], r["seconds"], r["budget_s"])
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+def _import_module():
+    pytest.importorskip("numpy")
+    pytest.importorskip("scipy")
+    sys.path.insert(0, os.path.abspath("src"))
+    import worker_daemon as mod  # type: ignore
+    return mod
+
+
+def _job(tmp_path, **params):
+    data = os.path.abspath(os.path.join("tests", "data"))
+    job = {
+        "ref_pdd_type": "csv", "ref_pdd_file": os.path.join(data, "measured_csv", "05x05mPDD-zZver.csv"),
+        "eval_pdd_type": "phits", "eval_pdd_file": os.path.join(data, "PHITS", "deposit-z-water.out"),
+        "ref_ocr_type": "csv", "ref_ocr_file": os.path.join(data, "measured_csv", "05x05m10cm-xXlat.csv"),
+        "eval_ocr_type": "phits", "eval_ocr_file": os.path.join(data, "PHITS", "deposit-y-water-100x.out"),
+        "output_dir": str(tmp_path / "out"), "no_plot": True, "export_csv": False, "export_gamma": False,
+    }
+    job.update(params)
+    return job
+
+
+def test_worker_runs_gui_jobs_with_warm_profile_cache(tmp_path):
+    mod = _import_module()
+
+    defaults = mod.load_defaults(mod.DEFAULTS_PATH)
+    assert "dd1" in defaults and "last_ref_pdd_dir" not in defaults
+    argv = mod.job_argv({"smooth_window": 7.0, "dd1": 2.5, "xlim_symmetric": True, "no_smooth": False,
+                         "ref_ocr_file": ["a.csv", "b.csv"], "last_ref_ocr_dir": "C:/tmp"})
+    assert argv == ["--smooth-window", "7", "--dd1", "2.5", "--xlim-symmetric",
+                    "--ref-ocr-file", "a.csv", "--ref-ocr-file", "b.csv"]
+    with pytest.raises(ValueError):
+        mod.job_argv({"dd": 2})
+
+    sent = []
+    worker = mod.Worker(sent.append, defaults)
+    lines = [json.dumps(_job(tmp_path, id=1)), json.dumps(_job(tmp_path, id=2, dd1=1.0, dta1=1.0)),
+             "not json", json.dumps(_job(tmp_path, id=3, bogus=1)), json.dumps({"cmd": "stats", "id": 4}),
+             json.dumps({"cmd": "shutdown"}), json.dumps(_job(tmp_path, id=5))]
+    worker.serve(lines)
+
+    results = {m["id"]: m for m in sent if m["event"] == "result"}
+    assert results[1]["status"] == "ok" and results[2]["status"] == "ok"
+    r1, r2 = results[1]["results"][0], results[2]["results"][0]
+    assert r2["gamma1_gpr_percent"] < r1["gamma1_gpr_percent"]
+    assert r2["gamma2_gpr_percent"] == r1["gamma2_gpr_percent"]
+    assert r1["report_path"] in results[1]["outputs"] and all(os.path.exists(p) for p in results[1]["outputs"])
+    assert any(m["event"] == "log" and m["id"] == 1 and m["line"].startswith("RMSE") for m in sent)
+    assert "bad request" in results[None]["error"] and "bogus" in results[3]["error"]
+    stats = next(m for m in sent if m["event"] == "stats")
+    assert (stats["misses"], stats["hits"], stats["jobs"]) == (4, 4, 3)  # second job parses nothing
+    assert sent[-1]["event"] == "bye" and 5 not in results
+    json.dumps(sent)  # every reply is plain JSON
+
+
+def test_worker_stdin_stdout_protocol():
+    _import_module()
+    proc = subprocess.run(
+        [sys.executable, os.path.join("src", "worker_daemon.py"), "--no-warm-up", "--no-defaults"],
+        input='{"cmd": "ping", "id": "a"}\n{"id": "b", "dd1": 2}\n', capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    msgs = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert msgs[0]["event"] == "ready" and msgs[1] == {"event": "pong", "id": "a"}
+    assert msgs[-1]["id"] == "b" and msgs[-1]["status"] == "error"  # missing input files: argparse error
+    assert any(m["event"] == "log" and m["stream"] == "stderr" and "required" in m["line"] for m in msgs)